@@ -11,16 +11,13 @@ Can be used programmatically too, example usage:
 import contextlib
 import enum
 import logging
-import multiprocessing
 import os
 import pathlib
 import re
 from typing import ClassVar, List
 
 import runez
-from runez.http import RestClient
 from runez.pyenv import PythonSpec
-from runez.render import Header, PrettyTable
 
 from portable_python.versions import PPG
 
@@ -197,7 +194,7 @@ class BuildSetup:
     # Internal, used to ensure files under {logs}/ folder sort alphabetically in the same order they were compiled
     log_counter = 0
 
-    def __init__(self, python_spec=None, modules=None, prefix=None):
+    def __init__(self, python_spec=None, modules=None, prefix=None, cpu_level=None):
         """
         Parameters
         ----------
@@ -207,7 +204,12 @@ class BuildSetup:
             Modules to build (default: from config)
         prefix : str | None
             --prefix to use
+        cpu_level : str | None
+            Microarchitecture level to build for (default: 1st configured 'cpu-level', see `portable_python.cpu_level`)
         """
+        from portable_python.compression import canonical_extension, compressed_basename, Compressor
+        from portable_python.cpu_level import configured_levels, CpuLevel
+
         if not python_spec or python_spec == "latest":
             python_spec = PPG.cpython.latest
 
@@ -226,17 +228,20 @@ class BuildSetup:
         prefix = self.folders.formatted(prefix)
         self.prefix = prefix
         self.x_debug = os.environ.get("PP_X_DEBUG")
+        self.cpu_level = CpuLevel.from_name(cpu_level or configured_levels()[0])
         configured_ext = PPG.config.get_value("ext")
-        ext = runez.SYS_INFO.platform_id.canonical_compress_extension(configured_ext, short_form=True)
+        ext = canonical_extension(configured_ext, short_form=True)
         if not ext:
             runez.abort("Invalid extension '%s'" % runez.red(configured_ext))
 
+        self.compressor = Compressor.from_config(ext)
         if prefix:
             dest = prefix.strip("/").replace("/", "-")
-            self.tarball_name = PPG.target.composed_basename(dest, extension=ext)
+            self.tarball_name = compressed_basename(PPG.target, dest, extension=ext, cpu_level=self.cpu_level)
 
         else:
-            self.tarball_name = PPG.target.composed_basename(python_spec.family, python_spec.version, extension=ext)
+            version = python_spec.version
+            self.tarball_name = compressed_basename(PPG.target, python_spec.family, version, extension=ext, cpu_level=self.cpu_level)
 
         builder = PPG.family(python_spec.family).get_builder()
         self.python_builder = builder(self)  # type: PythonBuilder
@@ -268,6 +273,8 @@ class BuildSetup:
     @runez.log.timeit("Overall compilation")
     def compile(self):
         """Compile selected python family and version"""
+        from portable_python.dist_split import DistSplit
+
         self.ensure_clean_folder(self.folders.build_folder)
         if self.folders.logs:
             self.ensure_clean_folder(self.folders.logs)
@@ -275,6 +282,11 @@ class BuildSetup:
             runez.log.setup(file_location=logs_path.as_posix())
 
         self.python_builder.validate_setup()
+        if self.cpu_level and not runez.DRYRUN:
+            # Freshly built python gets executed during the build (PGO, ensurepip, ...)
+            problem = self.cpu_level.host_problem()
+            runez.abort_if(problem, "Can't build for cpu-level %s on this host: %s" % (runez.red(self.cpu_level), problem))
+
         self.log_counter = 0
         with BuildContext(self) as build_context:
             self.build_context = build_context
@@ -282,7 +294,7 @@ class BuildSetup:
             LOG.info("portable-python v%s, current folder: %s", runez.get_version(__name__), os.getcwd())
             LOG.info(runez.joined(modules, list(modules)))
             LOG.info(PPG.config.config_files_report())
-            LOG.info("Platform: %s", PPG.target)
+            LOG.info("Platform: %s%s", PPG.target, " (cpu-level %s)" % self.cpu_level if self.cpu_level else "")
             LOG.info("Build report:\n%s", self.python_builder.modules.report())
             self.validate_module_selection(fatal=not runez.DRYRUN and not self.x_debug)
             self.ensure_clean_folder(self.folders.components)
@@ -290,7 +302,14 @@ class BuildSetup:
             build_context.compile()
             self.python_builder.compile()
             if self.folders.dist:
-                runez.compress(self.python_builder.install_folder, self.folders.dist / self.tarball_name)
+                install_folder = self.python_builder.install_folder
+                destination = self.folders.dist / self.tarball_name
+                dist_split = DistSplit.from_config(self.folders)
+                if dist_split:
+                    dist_split.write(self.compressor, install_folder, destination, index=self.python_builder.tree_index)
+
+                else:
+                    self.compressor.compress(install_folder, destination, logger=LOG.info)
 
 
 class ModuleCollection:
@@ -360,11 +379,32 @@ class ModuleCollection:
         return m in self.selected or m.resolved_telltale
 
     def report(self):
+        from runez.render import PrettyTable
+
         table = PrettyTable(4, missing="")
         rows = list(self.report_rows())
         table.add_rows(*rows)
         return str(table)
 
+    def report_records(self, parent=None):
+        """Yield the same information as `report_rows()`, as structured records (dicts)"""
+        for module in self.candidates:
+            name = module.m_name
+            is_selected = module in self.selected
+            outcome, problem = module.linker_outcome(is_selected)
+            yield {
+                "type": "module",
+                "name": name,
+                "parent": parent,
+                "version": module.version,
+                "selected": is_selected,
+                "auto_selected": self.auto_selected.get(name),
+                "outcome": outcome.name if isinstance(outcome, LinkerOutcome) else None,
+                "note": module.scan_note(),
+                "problem": problem,
+            }
+            yield from module.modules.report_records(parent=name)
+
     def report_rows(self, indent=0):
         indent_str = " +%s " % ("-" * indent) if indent else ""
         for module in self.candidates:
@@ -398,6 +438,7 @@ class ModuleBuilder:
     """Common behavior for all external (typically C) modules to be compiled"""
 
     m_build_cwd: str = None  # Optional: relative (to unpacked source) folder where to run configure/make from
+    m_cpu_level_vars = ("CFLAGS", "LDFLAGS")  # Env vars getting '-march' flag when building for a 'cpu-level'
     m_debian = None
     m_include: str = None  # Optional: subfolder to automatically list in CPATH when this module is active
     m_telltale: ClassVar[list]  # Optional: list of files that, if present, indicate this module is installed
@@ -559,7 +600,7 @@ class ModuleBuilder:
     def run_make(self, *args, program="make", cpu_count=None):
         cmd = program.split()
         if cpu_count is None:
-            cpu_count = multiprocessing.cpu_count()
+            cpu_count = os.cpu_count()
 
         if cpu_count and cpu_count > 3:
             cmd.append("-j%s" % (cpu_count - 2))
@@ -593,6 +634,10 @@ class ModuleBuilder:
 
     def compile(self):
         """Effectively compile this external module"""
+        from runez.render import Header
+
+        from portable_python.mirror import SourceMirror
+
         for submodule in self.modules.selected:
             submodule.compile()
 
@@ -606,19 +651,7 @@ class ModuleBuilder:
                         self._finalize()
                         return
 
-                # Split on '#' for urls that include a checksum, such as #sha256=... fragment
-                basename = runez.basename(self.url, extension_marker="#")
-                path = self.setup.folders.sources / basename
-                if not path.exists():
-                    proxies = {}
-                    http_proxy = os.environ.get("HTTP_PROXY") or os.environ.get("http_proxy")
-                    if http_proxy:
-                        proxies["http"] = http_proxy
-                    https_proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
-                    if https_proxy:
-                        proxies["https"] = https_proxy
-                    RestClient().download(self.url, path, proxies=proxies)
-
+                path = SourceMirror(self.setup.folders.sources, offline=PPG.offline).fetch(self.url)
                 runez.decompress(path, self.m_src_build, simplify=True)
 
                 env_vars = self._get_env_vars()
@@ -659,6 +692,10 @@ class ModuleBuilder:
                 if k not in result:
                     result[k] = v
 
+        if self.setup.cpu_level:
+            for k in self.m_cpu_level_vars:
+                result[k] = runez.joined(result.get(k), self.setup.cpu_level.cflags)
+
         return result
 
     def _find_all_env_vars(self):
@@ -0,0 +1,149 @@
+"""
+BOLT post-link optimization of cpython 3.12+ on linux (config 'cpython-bolt'), see https://github.com/llvm/llvm-project/tree/main/bolt
+
+cpython's own '--enable-bolt' is used: binaries get instrumented, trained with the PGO task, and optimized as part of 'make'.
+This happens before 'make install', and thus before `LibAutoCorrect` rewrites rpath-s via 'patchelf'
+(BOLT needs the relocations kept by '-Wl,--emit-relocs', patchelf-ed binaries are not valid BOLT input anymore).
+"""
+
+import logging
+import os
+import time
+
+import runez
+
+from portable_python.inspector import PythonInspector
+from portable_python.versions import PPG
+
+LOG = logging.getLogger(__name__)
+BENCHMARK_RUNS = 3  # Best time out of this many runs is kept, for each binary
+PREBOLT_FOLDER = "prebolt"  # Copy of shared libs as they were before BOLT, in build folder
+PREBOLT_PYTHON = "python.prebolt"  # Copy of python executable as it was before BOLT, in build folder
+TOOLS = {"llvm-bolt": "LLVM_BOLT", "merge-fdata": "MERGE_FDATA"}  # Tools needed, and corresponding ./configure variables
+
+
+class Bolt:
+    """BOLT optimization stage of a cpython build"""
+
+    def __init__(self, builder, tools, benchmark=None):
+        """
+        Parameters
+        ----------
+        builder : portable_python.cpython.Cpython
+            Associated cpython builder
+        tools : dict[str, str | None]
+            Path to each tool in `TOOLS` (None if not found)
+        benchmark : pathlib.Path | str | None
+            Optional python script to time with the binaries as they were before and after BOLT
+        """
+        self.builder = builder
+        self.tools = tools
+        self.benchmark = benchmark
+        self.benchmark_result = None  # type: str # Outcome of benchmark, if any
+
+    def __repr__(self):
+        return "BOLT %s" % runez.joined(self.binaries)
+
+    @classmethod
+    def from_config(cls, builder):
+        """
+        Parameters
+        ----------
+        builder : portable_python.cpython.Cpython
+            Associated cpython builder
+
+        Returns
+        -------
+        Bolt | None
+            BOLT stage, if configured (via 'cpython-bolt', or '--enable-bolt' in 'cpython-configure') and applicable
+        """
+        if not PPG.config.get_value("cpython-bolt") and not builder.has_configure_opt("--enable-bolt"):
+            return None
+
+        if not PPG.target.is_linux or builder.version < "3.12":
+            LOG.warning("Skipping BOLT: only available for cpython 3.12+ on linux")
+            return None
+
+        tools = {name: os.environ.get(var) or runez.which(name) for name, var in TOOLS.items()}
+        return cls(builder, tools, benchmark=PPG.config.resolved_path("cpython-bolt-benchmark"))
+
+    @property
+    def binaries(self):
+        """Files (in build folder) that get optimized: the python executable, and libpython when it is shared (3.13+)"""
+        result = ["python"]
+        if self.builder.version >= "3.13" and self.builder.has_configure_opt("--enable-shared", "yes"):
+            result.append(f"libpython{self.builder.version.mm}.so.1.0")
+
+        return result
+
+    @property
+    def prebolt_rule(self):
+        """'make' target building binaries as they are right before BOLT (same as cpython's ./configure PREBOLT_RULE)"""
+        return "profile-opt" if self.builder.has_configure_opt("--enable-optimizations") else "build_all"
+
+    def preflight_problem(self):
+        """Problem preventing BOLT from running, if any"""
+        missing = [name for name, path in self.tools.items() if not path]
+        if missing:
+            return "%s not found (part of LLVM 16+, can be pointed to via env vars %s)" % (
+                runez.joined(missing, delimiter=", "),
+                runez.joined(TOOLS.values(), delimiter=", "),
+            )
+
+        return None
+
+    def configure_args(self):
+        """Arguments to pass to cpython's ./configure"""
+        if not self.builder.has_configure_opt("--enable-bolt"):
+            yield "--enable-bolt"
+
+        for name, var in TOOLS.items():
+            if self.tools.get(name):
+                yield f"{var}={self.tools[name]}"
+
+    def keep_prebolt(self):
+        """
+        Keep a copy of binaries as they are before BOLT, to benchmark them later (current folder: cpython build folder).
+        The executable is kept as 'python.prebolt' right next to 'python': cpython finds its stdlib via 'pybuilddir.txt' there.
+        Shared libs are kept as 'prebolt/<name>', a folder that can be put in front of LD_LIBRARY_PATH.
+        """
+        for name in self.binaries:
+            runez.copy(name, PREBOLT_PYTHON if name == "python" else f"{PREBOLT_FOLDER}/{name}", logger=LOG.debug)
+
+    def run_benchmark(self):
+        """Time configured benchmark script with binaries before and after BOLT (current folder: cpython build folder)"""
+        if runez.log.hdry("benchmark %s with binaries before and after BOLT" % runez.short(self.benchmark)):
+            return
+
+        before = self._best_time(f"./{PREBOLT_PYTHON}", PREBOLT_FOLDER)
+        after = None if before is None else self._best_time("./python", ".")
+        if after is not None:
+            speedup = (before - after) / before * 100 if before else 0
+            self.benchmark_result = "%s: %.3fs -> %.3fs (%.1f%% faster)" % (os.path.basename(self.benchmark), before, after, speedup)
+            LOG.info("BOLT benchmark %s", self.benchmark_result)
+
+    def build_information(self):
+        """Information to store in build manifest"""
+        return {
+            "benchmark": self.benchmark_result,
+            "binaries": runez.joined(self.binaries),
+            "llvm-bolt": PythonInspector.tool_version(self.tools.get("llvm-bolt")),
+        }
+
+    def _best_time(self, python, lib_folder):
+        """Best time of `BENCHMARK_RUNS` runs of benchmark with 'python' (None if it failed, failure is reported in build manifest)"""
+        ld_library_path = [os.path.abspath(lib_folder), os.environ.get("LD_LIBRARY_PATH")]
+        env = dict(os.environ, LD_LIBRARY_PATH=os.pathsep.join(x for x in ld_library_path if x))
+        best = None
+        for _ in range(BENCHMARK_RUNS):
+            started = time.perf_counter()
+            r = runez.run(python, self.benchmark, env=env, fatal=False, logger=LOG.debug)
+            elapsed = time.perf_counter() - started
+            if r.failed:
+                self.benchmark_result = "%s: failed with %s (exit code %s)" % (os.path.basename(self.benchmark), python, r.exit_code)
+                LOG.warning("BOLT benchmark %s\n%s", self.benchmark_result, r.full_output)
+                return None
+
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best
@@ -1,12 +1,24 @@
+"""
+Subsystems (inspector, compression, delta, ...) are imported by the commands that use them,
+so that each invocation only pays for what it uses (see tests/test_startup.py)
+"""
+
 import logging
+import os
 
 import click
 import runez
 from runez.pyenv import PythonSpec
-from runez.render import PrettyTable
 
 from portable_python import BuildSetup, PPG
-from portable_python.inspector import LibAutoCorrect, PythonInspector
+from portable_python.compression import (
+    canonical_extension,
+    compare_compressions,
+    compressed_basename,
+    compression_candidates,
+    Compressor,
+    SUPPORTED_COMPRESSION,
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -17,8 +29,9 @@ LOG = logging.getLogger(__name__)
 @runez.click.debug("-v")
 @runez.click.dryrun("-n")
 @click.option("--config", "-c", metavar="PATH", default="portable-python.yml", show_default=True, help="Path to config file to use")
+@click.option("--offline", is_flag=True, envvar="PP_OFFLINE", help="Don't query python.org/github, use last known version listings")
 @click.option("--target", "-t", hidden=True, help="For internal use / testing")
-def main(debug, config, target):
+def main(debug, config, offline, target):
     """
     Build (optionally portable) python binaries
     """
@@ -31,24 +44,35 @@ def main(debug, config, target):
         locations=None,
     )
     PPG.grab_config(config, target=target)
+    PPG.offline = offline
 
 
 @main.command()
+@click.option("--cpu-level", "-l", metavar="CSV", help="Microarchitecture level(s) to build for (example: baseline,x86-64-v3)")
 @click.option("--modules", "-m", metavar="CSV", help="External modules to include")
 @click.option("--prefix", "-p", metavar="PATH", help="Use given --prefix for python installation (not portable)")
 @click.argument("python_spec")
-def build(modules, prefix, python_spec):
+def build(cpu_level, modules, prefix, python_spec):
     """Build a portable python binary"""
-    setup = BuildSetup(python_spec, modules=modules, prefix=prefix)
-    setup.compile()
+    from portable_python.cpu_level import configured_levels
+
+    setups = [BuildSetup(python_spec, modules=modules, prefix=prefix, cpu_level=x) for x in configured_levels(cpu_level)]
+    for setup in setups:
+        setup.compile()
 
 
 @main.command()
 @click.option("--modules", "-m", metavar="CSV", help="External modules to include")
+@click.option("--json", "as_json", is_flag=True, help="Json output")
+@click.option("--ndjson", is_flag=True, help="Newline-delimited json output, one record per line")
 @click.argument("python_spec", required=False)
-def build_report(modules, python_spec):
+def build_report(modules, as_json, ndjson, python_spec):
     """Show status of buildable modules, which will be auto-compiled"""
     setup = BuildSetup(python_spec, modules=modules)
+    if as_json or ndjson:
+        _print_records(setup.python_builder.modules.report_records(), ndjson)
+        return
+
     print(runez.bold(setup.python_spec))
     report = setup.python_builder.modules.report()
     print(report)
@@ -56,33 +80,192 @@ def build_report(modules, python_spec):
 
 
 @main.command()
-def diagnostics():
+@click.option("--output", "-o", metavar="PATH", help="Delta tarball to produce (default: <new>.delta.tar.<ext>)")
+@click.argument("old", required=True)
+@click.argument("new", required=True)
+def delta(output, old, new):
+    """
+    Produce a delta between two builds (dist tarballs, or installation folders)
+
+    \b
+    Hosts that have OLD unpacked can then rebuild NEW via 'apply', shipping only what changed
+    """  # noqa: D301
+    from portable_python.delta import create_delta
+
+    if not output:
+        stem = runez.basename(new.rstrip("/"))
+        if canonical_extension(stem, short_form=True):
+            stem = stem.rpartition(".")[0]
+            stem = stem.rpartition(".")[0] if stem.endswith(".tar") else stem
+
+        output = "%s.delta.%s" % (stem, canonical_extension(PPG.config.get_value("ext")))
+
+    create_delta(old, new, output, logger=print)
+
+
+@main.command()
+@click.argument("old", required=True)
+@click.argument("delta_path", metavar="DELTA", required=True)
+@click.argument("destination", required=True)
+def apply(old, delta_path, destination):
+    """Rebuild a new build in DESTINATION, from unpacked OLD build and a DELTA produced by 'delta' command"""
+    from portable_python.delta import apply_delta
+
+    apply_delta(old, delta_path, destination, logger=print)
+
+
+@main.command()
+@click.option("--resolved", is_flag=True, help="Show effective value of each setting for --target (and which config defined it)")
+def diagnostics(resolved):
     """Show diagnostics info"""
+    from runez.render import PrettyTable
+
     with runez.Anchored("."):
+        if resolved:
+            table = PrettyTable(["Setting", "Value", "Source"], border="github")
+            for key, value, source in PPG.config.resolved_table():
+                if isinstance(value, list):
+                    value = runez.joined(value)
+
+                table.add_row(key, runez.short(value), source)
+
+            print("Resolved config for %s" % runez.bold(PPG.target))
+            print(table)
+            return
+
         config = PPG.config.represented()
         print(PrettyTable.two_column_diagnostics(_diagnostics(), config))
 
 
+@main.command()
+@click.option("--jobs", "-j", type=int, metavar="N", help="Max number of frames to decompress in parallel (default: cpu count)")
+@click.argument("tarball", required=True)
+@click.argument("destination", required=True)
+@click.argument("members", nargs=-1)
+def extract(jobs, tarball, destination, members):
+    """
+    Extract TARBALL (or only given MEMBERS, files or folders) to DESTINATION
+
+    \b
+    Seekable tarballs (see 'compression-seekable' config) are decompressed in parallel,
+    and only the frames holding given MEMBERS get decompressed.
+    """  # noqa: D301
+    from portable_python.seekable import extract_archive
+
+    runez.abort_if(not os.path.isfile(tarball), "'%s' does not exist" % runez.red(runez.short(tarball)))
+    count = extract_archive(tarball, destination, selection=members, threads=jobs, logger=print)
+    runez.abort_if(members and not count and not runez.DRYRUN, "No member matching: %s" % runez.joined(members, delimiter=", "))
+
+
 @main.command()
 @click.option("--modules", "-m", help="Modules to inspect")
 @click.option("--verbose", "-v", is_flag=True, help="Show full so report")
 @click.option("--prefix", "-p", is_flag=True, help="Build was done with --prefix (not portable)")
 @click.option("--skip-so", "-s", is_flag=True, help="Don't check all .so-s")
-@click.argument("path")
-def inspect(modules, verbose, prefix, skip_so, path):
-    """Inspect a python installation for non-portable dynamic lib usage"""
-    if path != "invoker":
-        path = runez.resolved_path(path)
+@click.option("--jobs", "-j", type=int, metavar="N", help="Max parallel workers scanning .so files (default: from config, or cpu count)")
+@click.option("--no-cache", is_flag=True, help="Don't use inspection cache (re-scan all .so files)")
+@click.option("--deep", is_flag=True, help="Scan all ELF/Mach-O files in installation, including site-packages")
+@click.option("--import-cost", is_flag=True, help="Measure import time and memory of each module (in a fresh interpreter)")
+@click.option("--json", "as_json", is_flag=True, help="Json output")
+@click.option("--ndjson", is_flag=True, help="Newline-delimited json output, one record per line (streamed as they get produced)")
+@click.argument("paths", nargs=-1, required=True)
+def inspect(modules, verbose, prefix, skip_so, jobs, no_cache, deep, import_cost, as_json, ndjson, paths):
+    """
+    Inspect python installation(s) for non-portable dynamic lib usage
+
+    \b
+    Several installations can be inspected at once (in parallel), via:
+    - several paths, or a glob, example: /apps/python*
+    - a folder containing python installations
+    """  # noqa: D301
+    from portable_python.cpu_level import installation_problem
+    from portable_python.inspect_cache import default_cache_path
+    from portable_python.inspector import inspection_targets, PythonInspector
+
+    cache = None if no_cache else PPG.config.resolved_path("inspect-cache") or default_cache_path()
+    targets = inspection_targets(paths)
+    runez.abort_if(not targets, "No python installations found in %s" % runez.red(runez.joined(paths, delimiter=", ")))
+    if len(targets) > 1:
+        runez.abort_if(verbose or import_cost, "--verbose and --import-cost can only be used when inspecting one installation")
+        _inspect_installations(targets, modules, prefix, skip_so, jobs, cache, deep, as_json, ndjson)
+        return
+
+    path = targets[0]
+    problem = installation_problem(PPG.find_python(path))
+    runez.abort_if(problem, "%s: %s" % (runez.red(path), problem))
+    inspector = PythonInspector(path, modules=modules, jobs=jobs, cache=cache, import_cost=import_cost, deep=deep)
+    skip_so = skip_so or (modules and modules != "all")
+    if as_json or ndjson:
+        _print_records(inspector.report_records(portable=not prefix, skip_so=skip_so), ndjson)
 
-    inspector = PythonInspector(path, modules=modules)
     runez.abort_if(inspector.python.problem, "%s: %s" % (runez.red(path), inspector.python.problem))
-    print(runez.blue(inspector.python))
-    print(inspector.represented(verbose=verbose))
-    if not skip_so and (not modules or modules == "all"):
+    if not as_json and not ndjson:
+        print(runez.blue(inspector.python))
+        print(inspector.represented(verbose=verbose))
+
+    if not skip_so:
         problem = inspector.full_so_report.get_problem(portable=not prefix)
         runez.abort_if(problem)
 
 
+def _inspect_installations(targets, modules, prefix, skip_so, jobs, cache, deep, as_json, ndjson):
+    from runez.render import PrettyTable
+
+    from portable_python.inspector import inspect_installations
+
+    kwargs = {"modules": modules, "portable": not prefix, "skip_so": skip_so, "cache": cache, "deep": deep}
+    results = inspect_installations(targets, jobs=jobs, **kwargs)
+    problematic = sum(1 for _, _, problem in results if problem)
+    summary = "%s inspected, %s problematic" % (runez.plural(results, "installation"), problematic)
+    if as_json or ndjson:
+        records = ({"type": "installation", "path": t, "python": python, "problem": problem} for t, python, problem in results)
+        _print_records(records, ndjson)
+        runez.abort_if(problematic, summary)
+        return
+
+    table = PrettyTable(["Installation", "Python", "Problem"])
+    for target, python, problem in results:
+        table.add_row(runez.short(target), python, runez.red(problem) if problem else runez.green("OK"))
+
+    print(table)
+    runez.abort_if(problematic, summary)
+    print(summary)
+
+
+@main.command()
+@click.option("--top", "-n", type=int, default=10, show_default=True, help="Number of largest files, types and changed folders to show")
+@click.option("--depth", "-d", type=int, default=2, show_default=True, help="Max depth of folders to show")
+@click.option("--compare", metavar="PATH", help="Previous build to compare with: installation folder, or its size manifest")
+@click.option("--json", "as_json", is_flag=True, help="Json output")
+@click.argument("path", required=True)
+def size_report(top, depth, compare, as_json, path):
+    """
+    Show size breakdown of a python installation
+
+    \b
+    Fails if configured 'size-budget' is exceeded (growth is checked against --compare, or configured 'size-budget.baseline')
+    """  # noqa: D301
+    from portable_python.size_report import SizeReport
+
+    runez.abort_if(not os.path.isdir(path), "'%s' is not a folder" % runez.red(runez.short(path)))
+    baseline = compare or PPG.config.resolved_path("size-budget", "baseline")
+    baseline_report = SizeReport.from_path(baseline)
+    runez.abort_if(compare and not baseline_report, "'%s' does not exist" % runez.red(runez.short(compare)))
+    report = SizeReport.from_folder(path)
+    if as_json:
+        data = report.to_dict(top=top)
+        if baseline_report:
+            data["changes"] = [{"name": n, "before": b, "now": a} for n, b, a in report.changes(baseline_report, top=top)]
+
+        print(runez.represented_json(data))
+
+    else:
+        print(report.represented(top=top, depth=depth, baseline=baseline_report))
+
+    problem = report.budget_problem(PPG.config.get_value("size-budget"), baseline=baseline_report)
+    runez.abort_if(problem, "Size budget exceeded: %s" % problem)
+
+
 @main.command(name="list")
 @click.option("--json", is_flag=True, help="Json output")
 @click.argument("family", default="cpython")
@@ -101,6 +284,44 @@ def list_cmd(json, family):
         print("  %s: %s" % (runez.bold(mm), v))
 
 
+@main.command()
+@click.option("--matrix", "-x", metavar="SPEC", multiple=True, required=True, help="VERSIONS[:PLATFORMS[:MODULES]] to mirror sources for")
+@click.option("--dest", "-d", metavar="PATH", help="Mirror folder (default: configured 'folders.sources')")
+@click.option("--jobs", "-j", type=int, default=8, show_default=True, help="Max number of concurrent downloads")
+def mirror(matrix, dest, jobs):
+    """
+    Download all source tarballs needed to build given matrix of versions, platforms and modules
+
+    \b
+    Example: mirror -x 3.12.1,3.11.7:linux-x86_64,macos-arm64 -x 3.13.1:linux-aarch64:openssl,zlib
+    Builds can then use the mirror (via config 'folders.sources') fully offline, with: portable-python --offline build ...
+    Several hosts can fill the same (shared) mirror folder at the same time.
+    """  # noqa: D301
+    import concurrent.futures
+
+    from portable_python.mirror import matrix_source_urls, SourceMirror
+
+    urls = matrix_source_urls(matrix)
+    source_mirror = SourceMirror(dest or PPG.get_folders(base=".").sources, offline=PPG.offline)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(jobs, len(urls)))) as executor:
+        for url, path in zip(urls, executor.map(source_mirror.fetch, urls)):
+            LOG.debug("%s: %s (for %s)", runez.short(path), url, runez.joined(urls[url], delimiter=", "))
+
+    index = source_mirror.write_index()
+    downloaded = "%s downloaded" % len(source_mirror.downloaded)
+    print("%s in %s (%s), index: %s" % (runez.plural(urls, "source tarball"), source_mirror, downloaded, runez.short(index)))
+
+
+def _print_records(records, ndjson):
+    with runez.colors.ActivateColors(enable=False):
+        if ndjson:
+            for record in records:
+                print(runez.represented_json(record, none=True, indent=None), flush=True)
+
+        else:
+            print(runez.represented_json(list(records), none=True), end="")
+
+
 def _diagnostics():
     yield "invoker python", runez.SYS_INFO.invoker_python
     yield from runez.SYS_INFO.diagnostics()
@@ -122,9 +343,9 @@ def _find_recompress_source(folders, path):
 @runez.log.timeit
 def recompress_folder(folders, path, extension):
     """Recompress folder"""
-    dest = runez.SYS_INFO.platform_id.composed_basename("cpython", path.name, extension=extension)
+    dest = compressed_basename(runez.SYS_INFO.platform_id, "cpython", path.name, extension=extension)
     dest = folders.dist / dest
-    runez.compress(path, dest, logger=print)
+    Compressor.from_config(extension).compress(path, dest, logger=print)
     return dest
 
 
@@ -140,26 +361,87 @@ def recompress_archive(folders, path, extension):
         dest = "%s.%s" % (stem + "-recompressed", extension)
         dest = folders.dist / dest
 
+    compressor = Compressor.from_config(extension)
+    if "zip" not in (compressor.extension, canonical_extension(path.name, short_form=True)):
+        compressor.transcode(path, dest, logger=print)
+        return dest
+
     with runez.TempFolder() as _:
         tmp_folder = runez.to_path("tmp")
         runez.decompress(path, tmp_folder, simplify=True, logger=print)
-        runez.compress(tmp_folder, dest.name, arcname=dest.name, logger=print)
+        compressor.compress(tmp_folder, dest.name, arcname=dest.name, logger=print)
         runez.move(dest.name, dest, logger=print)
 
     return dest
 
 
+def _represented_comparison(original_size, results):
+    from runez.render import PrettyTable
+
+    table = PrettyTable(["Compression", "Size", "Ratio", "Compress", "Decompress", "Peak memory"], border="github")
+    for i in range(1, 6):
+        table.header[i].align = "right"
+
+    for item in results:
+        name = item["compression"] if item["level"] is None else "%s -%s" % (item["compression"], item["level"])
+        if item.get("problem"):
+            table.add_row(name, runez.red(item["problem"]), "", "", "", "")
+
+        else:
+            table.add_row(
+                name,
+                runez.represented_bytesize(item["size"]),
+                "%.2f" % item["ratio"],
+                "%s/s" % runez.represented_bytesize(item["compress_speed"]),
+                "%s/s" % runez.represented_bytesize(item["decompress_speed"]),
+                runez.represented_bytesize(item["peak_memory"]),
+            )
+
+    return "Uncompressed size: %s, 1 thread per compression\n%s" % (runez.bold(runez.represented_bytesize(original_size)), table)
+
+
+def recompress_comparison(actual_path, spec, jobs, as_json):
+    candidates = compression_candidates(spec)
+    if runez.log.hdry("compare %s on %s" % (runez.plural(candidates, "compression"), runez.short(actual_path))):
+        return
+
+    with runez.TempFolder(anchor=False, follow=False) as tmp_folder:
+        sample = runez.to_path(tmp_folder) / "sample.tar"
+        if actual_path.is_dir():
+            Compressor("tar").compress(actual_path, sample, logger=None)
+
+        elif canonical_extension(actual_path.name, short_form=True) == "zip":
+            runez.decompress(actual_path, sample.parent / "unzipped", simplify=True, logger=None)
+            Compressor("tar").compress(sample.parent / "unzipped", sample, arcname=actual_path.name.partition(".")[0], logger=None)
+
+        else:
+            Compressor("tar").transcode(actual_path, sample, logger=None)
+
+        original_size = sample.stat().st_size
+        results = compare_compressions(sample, candidates, jobs=jobs)
+
+    if as_json:
+        print(runez.represented_json({"source": str(actual_path), "size": original_size, "results": results}))
+
+    else:
+        print(_represented_comparison(original_size, results))
+
+
 @main.command()
+@click.option("--compare", metavar="SPEC", help="Compare compressions instead: 'all', or CSV of compressions (example: gz,xz:6-9,zst:19)")
+@click.option("--jobs", "-j", type=int, help="Number of compressions to compare at the same time (default: cpu count)")
+@click.option("--json", "as_json", is_flag=True, help="Json output (with --compare)")
 @click.argument("path", required=True)
-@click.argument("ext", required=True, type=click.Choice(runez.SYS_INFO.platform_id.supported_compression))
-def recompress(path, ext):
+@click.argument("ext", required=False, type=click.Choice(SUPPORTED_COMPRESSION))
+def recompress(compare, jobs, as_json, path, ext):
     """
     Re-compress an existing binary tarball, or folder
 
     \b
-    Mildly useful for comparing sizes from different compressions
+    Use --compare to see how all compressions and levels fare on given tarball or folder:
+    size, compression ratio, compress/decompress throughput and peak memory usage.
     """  # noqa: D301
-    extension = runez.SYS_INFO.platform_id.canonical_compress_extension(ext)
+    runez.abort_if(bool(compare) == bool(ext), "Specify exactly one of EXT or --compare")
     pspec = PythonSpec.from_text(path)
     folders = PPG.get_folders(base=".", family=pspec and pspec.family, version=pspec and pspec.version)
     with runez.Anchored(folders.base_folder):
@@ -167,6 +449,11 @@ def recompress(path, ext):
         if not actual_path:
             runez.abort("'%s' does not exist" % runez.red(runez.short(path)))
 
+        if compare:
+            recompress_comparison(actual_path, compare, jobs, as_json)
+            return
+
+        extension = canonical_extension(ext)
         if actual_path.is_dir():
             dest = recompress_folder(folders, actual_path, extension)
 
@@ -188,6 +475,8 @@ def lib_auto_correct(commit, prefix, path):
     This is mostly for testing purposes, applies the same method done internally by this tool.
     Allows to exercise just the lib-auto-correct part without having to wait for full build to complete.
     """
+    from portable_python.inspector import LibAutoCorrect
+
     if not runez.DRYRUN:
         runez.log.set_dryrun(not commit)
 
@@ -0,0 +1,602 @@
+"""
+Compression of dist artifacts, using all available cores.
+
+Tarballs are streamed to a multi-threaded compressor when one is available on PATH (pigz, pbzip2, xz, zstd).
+Otherwise, the tar stream is cut in chunks that get compressed in parallel in-process: concatenated gzip/bz2/xz/zstd streams
+are valid archives, which the usual tools decompress transparently.
+"""
+
+import bz2
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import gzip
+import json
+import logging
+import lzma
+import os
+import subprocess
+import sys
+import tarfile
+import time
+import zlib
+
+import runez
+
+from portable_python.versions import PPG
+
+LOG = logging.getLogger(__name__)
+SUPPORTED_COMPRESSION = ("tar", "bz2", "gz", "xz", "zst", "zip")
+CHUNK_SIZE = 16 * 1024 * 1024  # Size of chunks compressed independently by in-process fallback
+DEFAULT_LEVELS = {"bz2": 9, "gz": 9, "xz": 6, "zst": 19}  # Same as python's tarfile defaults (for bz2, gz and xz)
+EXTERNAL_TOOLS = {"bz2": "pbzip2", "gz": "pigz", "xz": "xz", "zst": "zstd"}
+SEEKABLE_INDEX_SUFFIX = ".index.json"  # Sidecar member index of seekable tarballs
+SEEKABLE_INDEX_FORMAT = 1
+COMPRESSION_LEVELS = {"bz2": range(1, 10), "gz": range(1, 10), "xz": range(10), "zst": range(1, 20)}
+
+
+class Compressor:
+    """Multi-threaded compression of a folder into a tarball"""
+
+    def __init__(self, extension, level=None, threads=None, seekable=False, frame_size=None):
+        """
+        Parameters
+        ----------
+        extension : str
+            Extension determining compression to use (example: 'gz', 'tar.xz', 'zst')
+        level : int | None
+            Compression level (default: per compression, see DEFAULT_LEVELS)
+        threads : int | None
+            Number of threads to use (default: cpu count)
+        seekable : bool
+            If True, write independently compressed frames, and a sidecar member index (see `portable_python.seekable`)
+        frame_size : int | None
+            Uncompressed size of independently compressed frames (default: CHUNK_SIZE)
+        """
+        self.extension = canonical_extension(extension, short_form=True)
+        runez.abort_if(not self.extension, "Invalid extension '%s'" % runez.red(extension))
+        self.level = DEFAULT_LEVELS.get(self.extension) if level is None else level
+        self.threads = threads or os.cpu_count() or 1
+        self.seekable = seekable and self.level is not None
+        self.frame_size = frame_size or CHUNK_SIZE
+
+    def __repr__(self):
+        if self.level is None:
+            return self.extension
+
+        tool = self.external_command()
+        tool = os.path.basename(tool[0]) if tool else "in-process"
+        text = "%s -%s, %s via %s" % (self.extension, self.level, runez.plural(self.threads, "thread"), tool)
+        if self.seekable:
+            text += ", seekable %s frames" % runez.represented_bytesize(self.frame_size)
+
+        return text
+
+    @classmethod
+    def from_config(cls, extension):
+        """
+        Parameters
+        ----------
+        extension : str
+            Extension determining compression to use
+
+        Returns
+        -------
+        Compressor
+            Compressor using configured 'compression-level' and 'compression-threads'
+        """
+        level = PPG.config.get_value("compression-level")
+        if isinstance(level, dict):
+            level = level.get(canonical_extension(extension, short_form=True))
+
+        threads = PPG.config.get_value("compression-threads")
+        seekable = bool(PPG.config.get_value("compression-seekable"))
+        configured_frame_size = PPG.config.get_value("compression-frame-size")
+        frame_size = configured_frame_size and runez.to_bytesize(configured_frame_size)
+        runez.abort_if(configured_frame_size and not frame_size, "Invalid 'compression-frame-size': %s" % runez.red(configured_frame_size))
+
+        return cls(extension, level=runez.to_int(level), threads=runez.to_int(threads), seekable=seekable, frame_size=frame_size)
+
+    def availability_problem(self):
+        """
+        Reason why this compression can't be used, if any
+
+        Returns
+        -------
+        str | None
+            Reason why this compression can't be used in this environment, if any
+        """
+        if self.extension == "zst" and not self.external_command() and not _zstd_compressor(self.level):
+            if self.seekable:
+                return "seekable zst compression requires the 'zstandard' package"
+
+            return "zst compression requires 'zstd' on PATH, or the 'zstandard' package"
+
+    def external_command(self):
+        """
+        Multi-threaded compressor to use, if available
+
+        Returns
+        -------
+        list[str] | None
+            Command line of multi-threaded compressor to use (reading from stdin, writing to stdout), if available on PATH
+        """
+        program = not self.seekable and runez.which(EXTERNAL_TOOLS.get(self.extension))
+        if program:
+            cmd = [program, "-%s" % self.level]
+            if self.extension == "bz2":
+                cmd.append("-p%s" % self.threads)
+
+            elif self.extension == "gz":
+                cmd.extend(["-p", str(self.threads)])
+
+            else:
+                cmd.extend(["-T%s" % self.threads, "-q"])
+                if self.extension == "zst" and self.level > 19:
+                    cmd.append("--ultra")
+
+            cmd.append("-c")
+            return cmd
+
+    def compress(self, source, destination, arcname=None, logger=LOG.debug):
+        """
+        Parameters
+        ----------
+        source : pathlib.Path | str
+            Folder to compress
+        destination : pathlib.Path | str
+            Tarball to produce
+        arcname : str | None
+            Name of subfolder in archive (default: source basename)
+        logger : callable | None
+            Logger to use
+        """
+        if self.extension == "zip":
+            return runez.compress(source, destination, arcname=arcname or runez.UNSET, logger=logger)
+
+        source = runez.to_path(source)
+        destination = runez.to_path(destination)
+        description = "tar %s -> %s" % (runez.short(source), runez.short(destination))
+        if runez.log.hdry(description):
+            return None
+
+        runez.abort_if(not source.exists(), "%s does not exist, can't tar to %s" % (runez.short(source), runez.short(destination)))
+        if logger:
+            logger("Tar %s -> %s (%s)" % (runez.short(source), runez.short(destination), self))
+
+        self.write_tarball(destination, lambda tar: tar.add(source, arcname=arcname or source.name, recursive=True))
+        return None
+
+    def transcode(self, source, destination, logger=LOG.debug):
+        """
+        Recompress tarball 'source' into 'destination', streaming members one by one (no temp folder, constant memory).
+        All member metadata (permissions, ownership, timestamps, symlinks) is preserved as-is.
+
+        Parameters
+        ----------
+        source : pathlib.Path | str
+            Tarball to recompress
+        destination : pathlib.Path | str
+            Tarball to produce
+        logger : callable | None
+            Logger to use
+        """
+        source = runez.to_path(source)
+        destination = runez.to_path(destination)
+        description = "recompress %s -> %s" % (runez.short(source), runez.short(destination))
+        if runez.log.hdry(description):
+            return
+
+        if logger:
+            logger("Recompress %s -> %s (%s)" % (runez.short(source), runez.short(destination), self))
+
+        with tar_reader(source) as src:
+            self.write_tarball(destination, lambda tar: _copy_members(src, tar))
+
+    def write_tarball(self, destination, fill):
+        """
+        Parameters
+        ----------
+        destination : pathlib.Path
+            Tarball to produce
+        fill : callable
+            Function adding members to the `tarfile.TarFile` it is given
+        """
+        runez.abort_if(self.availability_problem())
+        cmd = self.external_command()
+        runez.ensure_folder(destination.parent, logger=None)
+        with open(destination, "wb") as fh:
+            if self.extension == "tar":
+                _fill_tarball(fh, fill)
+
+            elif cmd:
+                with subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=fh) as proc:  # noqa: S603
+                    _fill_tarball(proc.stdin, fill)
+                    proc.stdin.close()
+
+                runez.abort_if(proc.returncode, "'%s' exited with code %s" % (runez.short(cmd[0]), proc.returncode))
+
+            else:
+                frames = [] if self.seekable else None
+                with ParallelWriter(fh, self.compressed_chunk, self.threads, chunk_size=self.frame_size, frames=frames) as writer:
+                    members = _fill_tarball(writer, fill)
+
+                if frames is not None:
+                    index = {"format": SEEKABLE_INDEX_FORMAT, "compression": self.extension, "frames": frames, "members": members}
+                    runez.write(seekable_index_path(destination), json.dumps(index, separators=(",", ":")), logger=None)
+
+    def compressed_chunk(self, data):
+        """Compressed 'data', as an independent stream (called in parallel from several threads)"""
+        if self.extension == "gz":
+            return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+        if self.extension == "bz2":
+            return bz2.compress(data, compresslevel=self.level)
+
+        if self.extension == "xz":
+            return lzma.compress(data, format=lzma.FORMAT_XZ, preset=self.level)
+
+        return _zstd_compressor(self.level)(data)
+
+
+class ParallelWriter:
+    """Writable file-like object compressing independent chunks of what gets written to it in parallel, preserving order"""
+
+    def __init__(self, fh, compress, threads, chunk_size=None, frames=None):
+        """
+        Parameters
+        ----------
+        fh : typing.BinaryIO
+            Where to write compressed chunks
+        compress : callable
+            Function compressing one chunk
+        threads : int
+            Number of threads to use
+        chunk_size : int | None
+            Size of chunks to compress independently (default: CHUNK_SIZE)
+        frames : list | None
+            If provided, (compressed size, uncompressed size) of each written chunk is appended to this list
+        """
+        self.fh = fh
+        self.compress = compress
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.frames = frames
+        self._buffer = bytearray()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        self._max_pending = 2 * threads  # Bounds memory usage, while keeping all threads busy
+        self._pending = collections.deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.chunk_size:
+            self._submit(bytes(self._buffer[: self.chunk_size]))
+            del self._buffer[: self.chunk_size]
+
+        return len(data)
+
+    def close(self):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+
+        while self._pending:
+            self._write_next()
+
+        self._executor.shutdown()
+
+    def _submit(self, chunk):
+        self._pending.append((len(chunk), self._executor.submit(self.compress, chunk)))
+        while len(self._pending) >= self._max_pending:
+            self._write_next()
+
+    def _write_next(self):
+        size, future = self._pending.popleft()
+        data = future.result()
+        self.fh.write(data)
+        if self.frames is not None:
+            self.frames.append((len(data), size))
+
+
+def canonical_extension(extension, short_form=False):
+    """
+    Parameters
+    ----------
+    extension : str | None
+        File extension (or file name) to validate and make canonical
+    short_form : bool
+        If True, return the short form (ie: no "tar.")
+
+    Returns
+    -------
+    str | None
+        Canonical form of 'extension', same as `runez.system.PlatformId.canonical_compress_extension()`, with 'zst' support
+    """
+    if extension:
+        extension = extension.lower().strip(".").rpartition(".")[2]
+        if extension in SUPPORTED_COMPRESSION:
+            if short_form or extension in ("tar", "zip"):
+                return extension
+
+            return "tar.%s" % extension
+
+
+def compression_candidates(spec):
+    """
+    Parameters
+    ----------
+    spec : str
+        'all', or comma separated compressions to compare, optionally with a level or range of levels (example: 'gz,xz:6-9,zst:19')
+
+    Returns
+    -------
+    list[Compressor]
+        Single-threaded compressors to compare
+    """
+    if spec == "all":
+        spec = ",".join(x for x in SUPPORTED_COMPRESSION if x != "zip")
+
+    result = []
+    for item in runez.flattened(spec, split=","):
+        name, _, levels = item.partition(":")
+        extension = canonical_extension(name, short_form=True)
+        runez.abort_if(extension in (None, "zip"), "Can't compare compression '%s'" % runez.red(item))
+        available = COMPRESSION_LEVELS.get(extension)
+        if available is None:
+            result.append(Compressor(extension, threads=1))
+            continue
+
+        if levels:
+            low, _, high = levels.partition("-")
+            low = runez.to_int(low)
+            high = runez.to_int(high) if high else low
+            expected = "%s-%s" % (available[0], available[-1])
+            runez.abort_if(
+                low not in available or high not in available, "Invalid %s level '%s', expecting %s" % (extension, levels, expected)
+            )
+            available = range(low, high + 1)
+
+        result.extend(Compressor(extension, level=level, threads=1) for level in available)
+
+    return result
+
+
+def compare_compressions(tarball, candidates, jobs=None):
+    """
+    Compress (then decompress) 'tarball' with each candidate, several candidates at the same time.
+    Each candidate runs in its own worker process, so that peak memory usage can be measured per candidate.
+
+    Parameters
+    ----------
+    tarball : pathlib.Path
+        Uncompressed tarball to use as sample (compressed candidates are temporarily written next to it)
+    candidates : list[Compressor]
+        Compressors to compare
+    jobs : int | None
+        Number of candidates to run at the same time (default: cpu count)
+
+    Returns
+    -------
+    list[dict]
+        One measurement per candidate, smallest compressed size first
+    """
+    runnable = []
+    for compressor in candidates:
+        problem = compressor.availability_problem()
+        if problem:
+            LOG.warning("Skipping %s: %s", compressor.extension, problem)
+
+        else:
+            runnable.append(compressor)
+
+    if not runnable:
+        return []
+
+    args = [(compressor, tarball, tarball.parent / ("candidate-%s" % i)) for i, compressor in enumerate(runnable)]
+    jobs = min(jobs or os.cpu_count() or 1, len(args))
+    import multiprocessing  # Only needed here, not imported at module level to keep CLI startup fast
+
+    # Explicit 'fork': workers see current state of this process (environment included), whatever the default start method
+    with multiprocessing.get_context("fork").Pool(jobs, maxtasksperchild=1) as pool:
+        results = pool.starmap(_measured_candidate, args, chunksize=1)
+
+    return sorted(results, key=lambda x: (x.get("size") is None, x.get("size") or 0, x["compression"]))
+
+
+def compressed_basename(target, prefix, version=None, extension=None, cpu_level=None):
+    """
+    Compose file basename of an artifact, same as `runez.system.PlatformId.composed_basename()` (with 'zst' support)
+    Artifacts built for a 'cpu-level' get its tag as suffix, example: cpython-3.12.1-linux-x86_64-v3.tar.gz
+    """
+    basename = target.composed_basename(prefix, version, extension="tar")[:-4]
+    if cpu_level:
+        basename += "-%s" % cpu_level.tag
+
+    return "%s.%s" % (basename, canonical_extension(extension))
+
+
+def seekable_index_path(path):
+    """Path to sidecar member index of seekable tarball 'path'"""
+    path = runez.to_path(path)
+    return path.parent / (path.name + SEEKABLE_INDEX_SUFFIX)
+
+
+def _copy_members(src, dest):
+    for member in src:
+        dest.addfile(member, src.extractfile(member) if member.isfile() else None)
+
+
+def _max_rss(children=False):
+    import resource  # Unix-only, imported only where memory usage gets measured
+
+    value = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return value if sys.platform == "darwin" else value * 1024  # Reported in bytes on macos, in KB on linux
+
+
+def _measured_candidate(*args):
+    """
+    Run `_measured_compression()` in a pool worker process (dedicated to one candidate, see `maxtasksperchild=1`).
+    An abort (for example: external compressor running out of memory at a high level) fails this candidate only:
+    it gets reported as its 'problem' (a `SystemExit` escaping a pool worker would make the pool wait forever for a result)
+    """
+    runez.system.AbortException = _CandidateAborted
+    return _measured_compression(*args)
+
+
+def _measured_compression(compressor, tarball, folder):
+    """Compress and decompress 'tarball' with 'compressor', in a dedicated worker process"""
+    baseline = _max_rss()
+    destination = folder / ("sample.%s" % canonical_extension(compressor.extension))
+    result = {"compression": compressor.extension, "level": compressor.level}
+    try:
+        started = time.perf_counter()
+        compressor.transcode(tarball, destination, logger=None)
+        compress_time = time.perf_counter() - started
+        started = time.perf_counter()
+        with tar_reader(destination) as tar:
+            for member in tar:
+                if member.isfile():
+                    fh = tar.extractfile(member)
+                    while fh.read(CHUNK_SIZE):
+                        pass
+
+        decompress_time = time.perf_counter() - started
+        original_size = tarball.stat().st_size
+        result["size"] = destination.stat().st_size
+        result["ratio"] = original_size / max(result["size"], 1)
+        result["compress_speed"] = original_size / max(compress_time, 1e-6)
+        result["decompress_speed"] = original_size / max(decompress_time, 1e-6)
+
+    except (
+        _CandidateAborted,
+        OSError,
+        EOFError,
+        ValueError,
+        tarfile.TarError,
+        lzma.LZMAError,
+        zlib.error,
+        subprocess.SubprocessError,
+    ) as e:
+        result["problem"] = str(e)  # Report failure of one candidate, without losing the measurements of the others
+
+    runez.delete(folder, logger=None)
+    # Memory used by in-process compression, or by external compressor, excluding worker process baseline
+    result["peak_memory"] = max(_max_rss() - baseline, _max_rss(children=True))
+    return result
+
+
+class _CandidateAborted(Exception):
+    """Raised instead of `SystemExit` by aborts in `compare_compressions()` pool workers"""
+
+
+class _IndexedTarFile(tarfile.TarFile):
+    """Tar file recording the (start, end) offset in uncompressed stream of each member it writes"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.member_ranges = []
+
+    def addfile(self, tarinfo, fileobj=None, **kwargs):
+        start = self.offset
+        super().addfile(tarinfo, fileobj, **kwargs)
+        self.member_ranges.append((tarinfo.name, start, self.offset))
+
+
+def _fill_tarball(fileobj, fill):
+    with _IndexedTarFile.open(fileobj=fileobj, mode="w|") as tar:
+        fill(tar)
+
+    return tar.member_ranges
+
+
+@contextlib.contextmanager
+def tar_reader(path):
+    """Tarball 'path' opened for sequential reading"""
+    if canonical_extension(path.name, short_form=True) != "zst":
+        # Not using stream mode 'r|*', as it does not support multi-stream files (such as the ones from `ParallelWriter`)
+        with tarfile.open(path) as tar:
+            yield tar
+
+        return
+
+    program = runez.which("zstd")
+    if program:
+        with subprocess.Popen([program, "-d", "-q", "-c", path], stdout=subprocess.PIPE) as proc:  # noqa: S603
+            with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+                yield tar
+
+            proc.stdout.close()
+
+        runez.abort_if(proc.returncode, "'%s' exited with code %s" % (runez.short(program), proc.returncode))
+        return
+
+    reader = _zstd_reader()
+    runez.abort_if(not reader, "zst decompression requires 'zstd' on PATH, or the 'zstandard' package")
+    with open(path, "rb") as fh, reader(fh) as stream, tarfile.open(fileobj=stream, mode="r|") as tar:
+        yield tar
+
+
+def _zstd_compressor(level):
+    """Get in-process zstd compression function, if available (python 3.14+, or 'zstandard' package installed)"""
+    try:
+        from compression import zstd
+
+    except ImportError:
+        zstd = None
+
+    if zstd is not None:
+        return functools.partial(zstd.compress, level=level)
+
+    try:
+        import zstandard
+
+    except ImportError:
+        return None
+
+    return zstandard.ZstdCompressor(level=level).compress
+
+
+def _zstd_decompressor():
+    """Get in-process zstd decompression function (for one frame), if available"""
+    try:
+        from compression import zstd
+
+    except ImportError:
+        zstd = None
+
+    if zstd is not None:
+        return zstd.decompress
+
+    try:
+        import zstandard
+
+    except ImportError:
+        return None
+
+    return zstandard.ZstdDecompressor().decompress
+
+
+def _zstd_reader():
+    """Get in-process streamed zstd decompression function (returning a readable file object), if available"""
+    try:
+        from compression import zstd
+
+    except ImportError:
+        zstd = None
+
+    if zstd is not None:
+        return zstd.ZstdFile
+
+    try:
+        import zstandard
+
+    except ImportError:
+        return None
+
+    return functools.partial(zstandard.ZstdDecompressor().stream_reader, read_across_frames=True)
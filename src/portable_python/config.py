@@ -6,9 +6,10 @@ import pathlib
 import re
 
 import runez
-import yaml
 from runez.pyenv import Version
 
+from portable_python.tree_index import TreeIndex
+
 LOG = logging.getLogger(__name__)
 
 DEFAULT_CONFIG = """
@@ -23,6 +24,7 @@ folders:
 manifest:
     build-info: .manifest.yml
     inspection-report: .inspection-report.yml
+    size-report: .size-report.yml
 
 ext: gz
 
@@ -71,6 +73,34 @@ macos:
     MACOSX_DEPLOYMENT_TARGET: 13  # Ventura, released June 2022
 """
 
+PLATFORMS = ("linux", "macos", "windows")
+
+# Expected type of settings that are not free-form, checked when a config file is loaded (settings not listed here are not checked)
+CONFIG_SCHEMA = {
+    "allowed-system-libs": str,
+    "compression-frame-size": (str, int),
+    "compression-level": (int, dict),
+    "compression-seekable": bool,
+    "compression-threads": int,
+    "cpython-allocator": str,
+    "cpython-bolt": bool,
+    "cpython-bolt-benchmark": str,
+    "cpython-compile-all": bool,
+    "cpython-pep668-externally-managed": dict,
+    "cpython-use-github": bool,
+    "cpu-level": (str, list),
+    "dist-split": dict,
+    "env": dict,
+    "ext": str,
+    "folders": dict,
+    "include": (str, list),
+    "inspect-jobs": int,
+    "manifest": dict,
+    "size-budget": dict,
+    "versions-cache-ttl": (str, int),
+}
+TYPE_DESCRIPTIONS = {bool: "a boolean", dict: "a mapping", int: "an integer", list: "a list", str: "a string"}
+
 
 class Config:
     """Overall config, the 1st found (most specific) setting wins"""
@@ -91,6 +121,8 @@ class Config:
         self.target = target
         self.default = ConfigSource("default config", self.parsed_yaml(DEFAULT_CONFIG, "default config"))
         self._sources = []  # type: list[ConfigSource]
+        self._table = None  # type: dict # Flat lookup table of all settings, computed on first use
+        self._resolved = {}  # Memoized `get_entry()` results
         self.by_path = {}
         for path in self.paths:
             self.load(path)
@@ -133,24 +165,65 @@ class Config:
         (str | int | float | bool | dict | list | None, ConfigSource | None)
             Associated value (if any), together with the source that defined it
         """
-        if by_platform:
-            keys = (self.target.platform, self.target.arch, *key), (self.target.platform, *key), key
+        entry = self._resolved.get((key, by_platform))
+        if entry is None:
+            if by_platform:
+                keys = (self.target.platform, self.target.arch, *key), (self.target.platform, *key), key
+
+            else:
+                keys = (key,)
 
-        else:
-            keys = (key,)
+            entry = None, None
+            for table in self.table:
+                found = next((table[k] for k in keys if k in table), None)
+                if found:
+                    entry = found
+                    break
 
-        for k in keys:
+            self._resolved[(key, by_platform)] = entry
+
+        return entry
+
+    @property
+    def table(self):
+        """
+        Settings of all config sources flattened, computed once (and again only when a new config file is loaded)
+
+        Returns
+        -------
+        (dict, dict)
+            Lookup tables (key tuple) -> (value, source), one for configured sources (1st source wins), one for default config
+        """
+        if self._table is None:
+            configured = {}
             for source in self._sources:
-                v = source.get_value(k)
-                if v is not None:
-                    return v, source
+                for key, value in source.flattened_items():
+                    configured.setdefault(key, (value, source))
 
-        for k in keys:
-            v = self.default.get_value(k)
-            if v is not None:
-                return v, self.default
+            self._table = configured, {k: (v, self.default) for k, v in self.default.flattened_items()}
 
-        return None, None
+        return self._table
+
+    def resolved_table(self):
+        """
+        Effective settings for configured target, as shown by 'diagnostics --resolved'
+
+        Returns
+        -------
+        list[(str, str | int | float | bool | list, ConfigSource)]
+            Effective value of each leaf setting for configured target, with the source that defined it, sorted by key
+        """
+        keys = set()
+        for source in runez.flattened(self._sources, self.default):
+            keys.update(unscoped_key(k) for k, v in source.flattened_items() if not isinstance(v, dict))
+
+        result = []
+        for key in keys:
+            value, source = self.get_entry(*key, by_platform=key[0] != "folders")
+            if value is not None:
+                result.append(("/".join(str(x) for x in key), value, source))
+
+        return sorted(result, key=lambda x: x[0])
 
     def resolved_path(self, *key, by_platform=True):
         value, source = self.get_entry(*key, by_platform=by_platform)
@@ -176,26 +249,31 @@ class Config:
         return runez.joined(result, delimiter="\n")
 
     @staticmethod
-    def represented_filesize(*paths, base=1024):
-        size = runez.filesize(*paths, logger=LOG.debug)
+    def represented_filesize(*paths, base=1024, index=None):
+        size = index.size(*paths) if index else runez.filesize(*paths, logger=LOG.debug)
         return runez.bold(runez.represented_bytesize(size, base=base) if size else "-")
 
     @staticmethod
-    def delete(path):
-        size = runez.filesize(path)
+    def delete(path, index=None):
+        size = index.size(path) if index else runez.filesize(path)
         runez.delete(path, logger=None)
+        if index:
+            index.update(path)
+
         LOG.info("Deleted %s (%s)", runez.short(path), runez.represented_bytesize(size))
         return size
 
     @staticmethod
     def parsed_yaml(text, source):
+        import yaml
+
         try:
             return yaml.safe_load(text)
 
         except Exception as e:
             runez.abort("Invalid yaml in %s: %s" % (runez.bold(runez.short(source)), e))
 
-    def cleanup_configured_globs(self, title, module, *keys):
+    def cleanup_configured_globs(self, title, module, *keys, index=None):
         """
         Parameters
         ----------
@@ -205,13 +283,15 @@ class Config:
             Associated python builder module
         *keys : str
             Config keys to lookup
+        index : portable_python.tree_index.TreeIndex | None
+            Index of `module.install_folder`, if available
         """
         globs = [(x, f"{x}-{self.target.platform}") for x in keys]
         globs = runez.flattened(globs, transform=self.get_value)
         globs = runez.flattened(globs, split=True, unique=True)
-        self.cleanup_globs(title, module, *globs)
+        self.cleanup_globs(title, module, *globs, index=index)
 
-    def cleanup_globs(self, title, module, *globs):
+    def cleanup_globs(self, title, module, *globs, index=None):
         """
         Parameters
         ----------
@@ -221,31 +301,28 @@ class Config:
             Associated python builder module
         *globs : str
             Glob patterns to clean up
+        index : portable_python.tree_index.TreeIndex | None
+            Index of `module.install_folder`, if available
         """
         if globs:
             spec = [module.setup.folders.formatted(x) for x in globs]
             deleted_size = 0
             matcher = FileMatcher(spec)
             LOG.info("Applying clean-up spec: %s", matcher)
+            if index is None:
+                index = TreeIndex(module.install_folder)
+
             cleaned = []
-            for dirpath, dirnames, filenames in os.walk(module.install_folder):
-                removed = []
-                dirpath = runez.to_path(dirpath)
-                for name in dirnames:
-                    full_path = dirpath / name
-                    if matcher.is_match(full_path):
-                        removed.append(name)
-                        cleaned.append(name)
-                        deleted_size += self.delete(full_path)
-
-                for name in removed:
-                    dirnames.remove(name)
-
-                for name in filenames:
-                    full_path = dirpath / name
-                    if matcher.is_match(full_path):
-                        cleaned.append(name)
-                        deleted_size += self.delete(full_path)
+            folders = [index.folder]
+            while folders:
+                children = index.children(folders.pop(0))
+                for entry in children:
+                    if matcher.is_match(entry.path, is_dir=entry.is_dir):
+                        cleaned.append(entry.path.name)
+                        deleted_size += self.delete(entry.path, index=index)
+
+                    elif entry.is_dir:
+                        folders.append(entry.path)
 
             if cleaned:
                 names = runez.joined(sorted(set(cleaned)))
@@ -253,10 +330,16 @@ class Config:
                 count = runez.plural(cleaned, "build artifact")
                 LOG.info("%s: Cleaned %s (%s): %s", title, count, deleted_size, runez.short(names))
 
-    def symlink_duplicates(self, folder):
+    def symlink_duplicates(self, folder, index=None):
         if self.target.is_linux or self.target.is_macos:
+            if index is None:
+                index = TreeIndex(folder)
+
             seen = collections.defaultdict(list)
-            _find_file_duplicates(seen, folder)
+            for entries in _same_size_files(index, folder):
+                for entry in entries:
+                    seen[entry.checksum].append(entry.path)
+
             duplicates = {k: v for k, v in seen.items() if len(v) > 1}
             for dupes in duplicates.values():
                 LOG.info("Found duplicates: %s", runez.joined(dupes, delimiter=", "))
@@ -265,6 +348,7 @@ class Config:
                     shorter, longer = dupes
                     if str(longer).startswith(str(shorter.parent)):
                         runez.symlink(longer, shorter, logger=LOG.info)
+                        index.update(shorter)
 
     @staticmethod
     def real_path(path: pathlib.Path):
@@ -331,6 +415,9 @@ class Config:
                 with open(path) as fh:
                     data = self.parsed_yaml(fh, path)
                     source = ConfigSource(path, data)
+                    source.validate()
+                    self._table = None
+                    self._resolved = {}
                     if front:
                         self._sources.insert(0, source)
 
@@ -354,8 +441,47 @@ class ConfigSource:
 
     def represented(self):
         """Textual (yaml) representation of this config"""
+        import yaml
+
         return yaml.safe_dump(self.data, width=140)
 
+    def flattened_items(self, data=None, prefix=()):
+        """
+        Parameters
+        ----------
+        data : dict | None
+            Data to flatten (default: all settings of this config)
+        prefix : tuple
+            Key of 'data'
+
+        Yields
+        ------
+        (tuple, str | int | float | bool | dict | list)
+            All settings (nested ones, and the mappings holding them), ie: {a: {b: c}} yields ((a,), {b: c}) and ((a, b), c)
+        """
+        if data is None:
+            data = self.data
+
+        if isinstance(data, dict):
+            for k, v in data.items():
+                if v is not None:
+                    key = (*prefix, k)
+                    yield key, v
+                    yield from self.flattened_items(v, key)
+
+    def validate(self):
+        """Abort if a setting is not of the expected type (see CONFIG_SCHEMA)"""
+        runez.abort_if(self.data is not None and not isinstance(self.data, dict), "Invalid config %s: expecting a mapping" % self)
+        for key, value in self.flattened_items():
+            unscoped = unscoped_key(key)
+            expected = len(unscoped) == 1 and CONFIG_SCHEMA.get(unscoped[0])
+            if expected:
+                expected = runez.flattened(expected)
+                if not isinstance(value, tuple(expected)) or (isinstance(value, bool) and bool not in expected):
+                    expected = runez.joined((TYPE_DESCRIPTIONS[x] for x in expected), delimiter=" or ")
+                    key = "/".join(str(x) for x in key)
+                    runez.abort("Invalid config %s: '%s' must be %s, got: %s" % (self, runez.red(key), expected, runez.red(value)))
+
     def get_value(self, key):
         """
         Parameters
@@ -395,9 +521,9 @@ class FileMatcher:
     def __repr__(self):
         return runez.joined(self.matches)
 
-    def is_match(self, path: pathlib.Path):
+    def is_match(self, path: pathlib.Path, is_dir=None):
         for m in self.matches:
-            if m.is_match(path):
+            if m.is_match(path, is_dir=is_dir):
                 return path
 
 
@@ -423,8 +549,11 @@ class SingleFileMatch:
     def __repr__(self):
         return self.spec
 
-    def is_match(self, path: pathlib.Path):
-        if self._on_folder == path.is_dir():
+    def is_match(self, path: pathlib.Path, is_dir=None):
+        if is_dir is None:
+            is_dir = path.is_dir()
+
+        if self._on_folder == is_dir:
             if self._rx_path:
                 m = self._rx_path.match(str(path.parent))
                 if not m:
@@ -433,12 +562,40 @@ class SingleFileMatch:
             return fnmatch.fnmatch(path.name, self._rx_basename)
 
 
-def _find_file_duplicates(seen, folder):
-    for p in runez.ls_dir(folder):
-        if p.name not in ("__pycache__", "site-packages"):
-            if p.is_dir():
-                _find_file_duplicates(seen, p)
+def unscoped_key(key):
+    """
+    Parameters
+    ----------
+    key : tuple
+        Key of a setting, as found in a config file
+
+    Returns
+    -------
+    tuple
+        Same key, without its platform and arch sections (if any), ie: (macos, arm64, ext) -> (ext,)
+    """
+    if len(key) > 1 and key[0] in PLATFORMS:
+        key = key[1:]
+        if len(key) > 1 and key[0] not in CONFIG_SCHEMA:
+            key = key[1:]  # Arch section
+
+    return key
+
+
+def _same_size_files(index, folder):
+    """Files bigger than 10KB, grouped by size (only files of the same size need to have their checksum computed)"""
+    by_size = collections.defaultdict(list)
+    for entry in _candidate_duplicates(index, folder):
+        by_size[entry.size].append(entry)
+
+    return [x for x in by_size.values() if len(x) > 1]
+
+
+def _candidate_duplicates(index, folder):
+    for entry in index.children(folder):
+        if entry.path.name not in ("__pycache__", "site-packages"):
+            if entry.is_dir:
+                yield from _candidate_duplicates(index, entry.path)
 
-            elif p.is_file() and runez.filesize(p) > 10000:
-                c = runez.checksum(p)
-                seen[c].append(p)
+            elif entry.is_file and entry.size > 10000:
+                yield entry
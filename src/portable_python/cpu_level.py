@@ -0,0 +1,186 @@
+"""
+Microarchitecture levels: build for a newer instruction set than the baseline of the target arch (config 'cpu-level').
+
+A build for a given level gets matching '-march' flags (for cpython and all its external modules),
+and only runs on hosts supporting that level: the level is part of the dist tarball name,
+is recorded in the build manifest, and 'inspect' reports installations the current host can't run.
+"""
+
+import functools
+
+import runez
+
+from portable_python.versions import PPG
+
+BASELINE = "baseline"  # Level name designating the default instruction set of the target arch (no '-march' flag)
+
+
+class CpuLevel:
+    """Instruction set level, and the cpu features (as named in /proc/cpuinfo) a host needs to run binaries built for it"""
+
+    def __init__(self, name, arches, tag, features, base=None):
+        """
+        Parameters
+        ----------
+        name : str
+            Name of the level, as understood by gcc/clang '-march'
+        arches : str
+            Archs this level applies to (space separated)
+        tag : str
+            Short name used as suffix of the dist tarball name
+        features : str
+            Host cpu features required by this level, in addition to the ones of 'base' (space separated)
+        base : CpuLevel | None
+            Lower level this one builds upon
+        """
+        self.name = name
+        self.arches = arches.split()
+        self.tag = tag
+        self.features = runez.flattened(base and base.features, features.split())
+
+    def __repr__(self):
+        return self.name
+
+    @property
+    def cflags(self):
+        """Compiler (and linker, for LTO) flags targeting this level"""
+        return f"-march={self.name}"
+
+    @classmethod
+    def from_name(cls, name, target=None):
+        """
+        Parameters
+        ----------
+        name : str | None
+            Name of level (None or 'baseline': default instruction set of 'target')
+        target : runez.system.PlatformId | None
+            Target platform (default: `PPG.target`)
+
+        Returns
+        -------
+        CpuLevel | None
+            Corresponding level, aborts if 'name' is not known, or does not apply to 'target'
+        """
+        if not name or name == BASELINE:
+            return None
+
+        target = target or PPG.target
+        level = CPU_LEVELS.get(name)
+        if level is None:
+            known = runez.joined(BASELINE, [x for x in CPU_LEVELS.values() if target.arch in x.arches])
+            runez.abort("Unknown cpu-level '%s', expecting one of: %s" % (runez.red(name), known))
+
+        runez.abort_if(target.arch not in level.arches, "cpu-level '%s' does not apply to %s" % (runez.red(name), target))
+        return level
+
+    def host_problem(self):
+        """
+        Check whether current host can run binaries built for this level
+
+        Returns
+        -------
+        str | None
+            Why current host can't run binaries built for this level (None if it can, or if host features can't be determined)
+        """
+        arch = runez.SYS_INFO.platform_id.arch
+        if arch not in self.arches:
+            return "built for %s, host is %s" % (self, arch)
+
+        features = host_cpu_features()
+        if features is not None:
+            missing = [x for x in self.features if x not in features]
+            if missing:
+                return "host cpu does not support %s (missing: %s)" % (self, runez.joined(missing))
+
+        return None
+
+
+def _levels(*levels):
+    result = {}
+    base = None
+    for name, arches, tag, features in levels:
+        if base is not None and base.arches != arches.split():
+            base = None
+
+        base = CpuLevel(name, arches, tag, features, base=base)
+        result[name] = base
+
+    return result
+
+
+# Levels build upon each other (per arch), see https://gitlab.com/x86-psABIs/x86-64-ABI (x86-64 micro-architecture levels)
+CPU_LEVELS = _levels(
+    ("x86-64-v2", "x86_64", "v2", "cx16 lahf_lm pni popcnt sse4_1 sse4_2 ssse3"),
+    ("x86-64-v3", "x86_64", "v3", "abm avx avx2 bmi1 bmi2 f16c fma movbe xsave"),
+    ("x86-64-v4", "x86_64", "v4", "avx512bw avx512cd avx512dq avx512f avx512vl"),
+    ("armv8.1-a", "aarch64 arm64", "armv8.1", "asimdrdm atomics crc32"),
+    ("armv8.2-a", "aarch64 arm64", "armv8.2", "dcpop"),
+    ("armv8.4-a", "aarch64 arm64", "armv8.4", "dit flagm ilrcpc uscat"),
+)
+
+
+def configured_levels(given=None):
+    """
+    Parameters
+    ----------
+    given : str | None
+        Levels given via CLI (comma separated), if any
+
+    Returns
+    -------
+    list[str | None]
+        Levels to build ('given', or configured 'cpu-level'), None standing for the baseline
+    """
+    levels = runez.flattened(given or PPG.config.get_value("cpu-level"), split=",", unique=True)
+    return [None if x == BASELINE else x for x in levels] or [None]
+
+
+@functools.lru_cache(maxsize=None)
+def host_cpu_features():
+    """
+    Cpu features of current host, as listed in /proc/cpuinfo
+
+    Returns
+    -------
+    set[str] | None
+        Features supported by current host's cpu (None if they can't be determined, ie: not on linux)
+    """
+    try:
+        for line in runez.readlines("/proc/cpuinfo"):
+            key, _, value = line.partition(":")
+            if key.strip() in ("flags", "Features"):
+                return set(value.split())
+
+    except OSError:
+        pass
+
+    return None
+
+
+def installation_problem(python):
+    """
+    Parameters
+    ----------
+    python : runez.pyenv.PythonInstallation
+        Python installation to check (typically from `PPG.find_python()`, spec can be a folder, an executable, 'invoker', ...)
+
+    Returns
+    -------
+    str | None
+        Why current host can't run that installation (based on the 'cpu-level' recorded in its build manifest), if applicable
+    """
+    # Installation root is derived from the real executable: python itself may not be able to run on this host to report its prefix
+    folder = python.real_exe.parent.parent
+    manifest = folder / (PPG.config.get_value("manifest", "build-info") or "")
+    if manifest.is_file():
+        import yaml
+
+        with open(manifest) as fh:
+            info = yaml.safe_load(fh)
+
+        name = isinstance(info, dict) and (info.get("cpython") or {}).get("cpu-level")
+        level = name and CPU_LEVELS.get(name)
+        if level:
+            return level.host_problem()
+
+    return None
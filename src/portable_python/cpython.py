@@ -8,9 +8,12 @@ import yaml
 from runez.pyenv import Version
 
 from portable_python import LOG, patch_file, patch_folder, PPG, PythonBuilder
+from portable_python.bolt import Bolt
 from portable_python.external.tkinter import TkInter
-from portable_python.external.xcpython import Bdb, Bzip2, Gdbm, LibFFI, Openssl, Readline, Sqlite, Uuid, Xz, Zlib
+from portable_python.external.xcpython import Allocator, Bdb, Bzip2, Gdbm, LibFFI, Openssl, Readline, Sqlite, Uuid, Xz, Zlib
 from portable_python.inspector import LibAutoCorrect, PythonInspector
+from portable_python.size_report import SizeReport
+from portable_python.tree_index import TreeIndex
 
 # https://github.com/docker-library/python/issues/160
 PGO_TESTS = """
@@ -46,7 +49,9 @@ class Cpython(PythonBuilder):
     See https://docs.python.org/3/using/configure.html
     """
 
+    m_cpu_level_vars = ("CFLAGS_NODIST", "LDFLAGS_NODIST")  # Don't leak '-march' to sysconfig (used to build wheels)
     xenv_CFLAGS_NODIST = "-Wno-unused-command-line-argument"
+    tree_index = None  # type: TreeIndex # Index of install folder, available during finalization
 
     def build_information(self):
         """
@@ -61,8 +66,10 @@ class Cpython(PythonBuilder):
         yield (
             "cpython",
             {
+                "allocator": self.active_module(Allocator),
                 "prefix": self.setup.prefix,
                 "source": self.url,
+                "cpu-level": self.setup.cpu_level,
                 "static": runez.joined(self.modules.selected) or None,
                 "target": PPG.target,
                 "version": self.version,
@@ -78,6 +85,7 @@ class Cpython(PythonBuilder):
                 "date": datetime.datetime.now(tz=datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S %Z"),
                 "host-platform": runez.SYS_INFO.platform_info,
                 "ldd-version": PythonInspector.tool_version("ldd"),
+                "bolt": self.bolt and self.bolt.build_information(),
                 "portable-python-version": runez.get_version(__package__),
                 "special-context": bc.isolate_usr_local and bc,
             },
@@ -96,7 +104,7 @@ class Cpython(PythonBuilder):
 
     @classmethod
     def candidate_modules(cls):
-        return [LibFFI, Zlib, Xz, Bzip2, Readline, Openssl, Sqlite, Bdb, Gdbm, Uuid, TkInter]
+        return [LibFFI, Zlib, Xz, Bzip2, Readline, Openssl, Sqlite, Bdb, Gdbm, Uuid, TkInter, Allocator]
 
     @property
     def url(self):
@@ -113,6 +121,21 @@ class Cpython(PythonBuilder):
             # rpath intentionally long to give 'patchelf' some room
             yield f"-Wl,-rpath={self.c_configure_prefix}/lib:{self.c_configure_prefix}/lib64"
 
+    @runez.cached_property
+    def bolt(self):
+        """BOLT post-link optimization stage, if configured and applicable"""
+        return Bolt.from_config(self)
+
+    def validate_setup(self):
+        if self.bolt:
+            problem = self.bolt.preflight_problem()
+            runez.abort_if(problem and not runez.DRYRUN, "Can't apply BOLT: %s" % problem)
+
+    def xenv_LIBS(self):
+        allocator = self.active_module(Allocator)
+        if allocator:
+            yield from allocator.linker_flags()
+
     def has_configure_opt(self, name, *variants):
         opts = self.c_configure_args_from_config
         if opts:
@@ -165,6 +188,15 @@ class Cpython(PythonBuilder):
             yield f"--with-tcltk-includes=-I{self.deps}/include"
             yield f"--with-tcltk-libs=-L{self.deps_lib} -ltcl{version.mm} -ltk{version.mm}"
 
+        allocator = self.active_module(Allocator)
+        if allocator and allocator.kind == "mimalloc" and self.version >= "3.13":
+            if not self.has_configure_opt("--with-mimalloc") and not self.has_configure_opt("--without-mimalloc"):
+                # Bundled mimalloc is python's allocator only when free-threaded, avoid duplicate symbols otherwise
+                yield "--with-mimalloc" if allocator.is_bundled else "--without-mimalloc"
+
+        if self.bolt:
+            yield from self.bolt.configure_args()
+
     @runez.cached_property
     def prefix_lib_folder(self):
         """Path to <prefix>/lib/pythonM.m folder"""
@@ -202,21 +234,34 @@ class Cpython(PythonBuilder):
             pgo_tests = runez.joined(runez.flattened(PGO_TESTS, split=True))
             make_args.append(f"PROFILE_TASK={pgo_tests}")
 
-        self.run_make(*make_args)
+        benchmark = self.bolt and self.bolt.benchmark
+        if benchmark:
+            self.run_make(*make_args, self.bolt.prebolt_rule)
+            self.bolt.keep_prebolt()
+
+        self.run_make(*make_args)  # Applies BOLT (if enabled), before 'make install' and thus before `LibAutoCorrect`
+        if benchmark:
+            self.bolt.run_benchmark()
+
         self.run_make("install", f"DESTDIR={self.destdir}")
 
     def _finalize(self):
+        # Install tree is walked once, each step below then keeps this index up-to-date with what it modifies
+        index = TreeIndex(self.install_folder)
+        self.tree_index = index
         is_shared = self.setup.prefix or self.has_configure_opt("--enable-shared", "yes")
         if is_shared:
-            lib_auto_correct = LibAutoCorrect(self.c_configure_prefix, self.install_folder, ppp_marker=self.setup.folders.ppp_marker)
+            ppp_marker = self.setup.folders.ppp_marker
+            lib_auto_correct = LibAutoCorrect(self.c_configure_prefix, self.install_folder, ppp_marker=ppp_marker, index=index)
             lib_auto_correct.run()
 
-        PPG.config.cleanup_configured_globs("Pass 1", self, "cpython-clean-1st-pass")
-        PPG.config.symlink_duplicates(self.install_folder)
+        PPG.config.cleanup_configured_globs("Pass 1", self, "cpython-clean-1st-pass", index=index)
+        PPG.config.symlink_duplicates(self.install_folder, index=index)
         validation_script = PPG.config.resolved_path("cpython-validate-script")
         if validation_script:
             LOG.info("Exercising configured validation script: %s" % runez.short(validation_script))
             self.run_python(validation_script)
+            index.refresh()
 
         additional = PPG.config.get_value("cpython-additional-packages")
         if additional:
@@ -229,9 +274,12 @@ class Cpython(PythonBuilder):
                 self.run_python(cmd)
 
             self.run_python("-mpip", "install", *runez.flattened(additional))
+            index.refresh()
 
         runez.abort_if(not runez.DRYRUN and not self.bin_python, f"Can't find bin/python in {self.bin_folder}")
         PPG.config.ensure_main_file_symlinks(self)
+        index.update(self.bin_folder)
+        self._unlist_allocator()
         if not self.setup.prefix:
             self._relativize_sysconfig()
             self._relativize_shebangs()
@@ -239,6 +287,7 @@ class Cpython(PythonBuilder):
         self._validate_venv_module()
         if PPG.config.get_value("cpython-compile-all"):
             self.run_python("-mcompileall", "-q", self.install_folder / "lib")
+            index.refresh()
 
         if self.prefix_config_folder:
             # When --enable-shared is specified, cpython build does not produce 'lib/libpython*.a'
@@ -247,25 +296,29 @@ class Cpython(PythonBuilder):
             symlink_static = self.install_folder / f"lib/libpython{self.version.mm}.a"
             if actual_static.exists() and not symlink_static.exists():
                 runez.symlink(actual_static, symlink_static)
+                index.update(symlink_static)
 
         info_path = PPG.config.get_value("manifest", "build-info")
         if info_path:
             contents = represented_yaml(self.build_information())
             runez.write(self.install_folder / info_path, contents)
+            index.update(self.install_folder / info_path)
 
         info_path = PPG.config.get_value("manifest", "inspection-report")
         if info_path:
             with runez.colors.ActivateColors(enable=False):
-                py_inspector = PythonInspector(self.install_folder, modules="all")
+                py_inspector = PythonInspector(self.install_folder, modules="all", index=index)
                 contents = "%s\n" % py_inspector.represented(verbose=True)
                 runez.write(self.install_folder / info_path, contents)
+                index.update(self.install_folder / info_path)
 
-        PPG.config.cleanup_configured_globs("Pass 2", self, "cpython-clean-2nd-pass", "cpython-clean")
+        PPG.config.cleanup_configured_globs("Pass 2", self, "cpython-clean-2nd-pass", "cpython-clean", index=index)
         self._apply_pep668()
+        size_problem = self._size_report()
 
-        py_inspector = PythonInspector(self.install_folder)
+        py_inspector = PythonInspector(self.install_folder, index=index)
         print(py_inspector.represented())
-        problem = py_inspector.full_so_report.get_problem(portable=not is_shared)
+        problem = py_inspector.full_so_report.get_problem(portable=not is_shared) or size_problem
         runez.abort_if(problem and self.setup.x_debug != "direct-finalize", "Build failed: %s" % problem)
 
     def _apply_pep668(self):
@@ -280,7 +333,7 @@ class Cpython(PythonBuilder):
             return
 
         runez.abort_if(not content.get("Error"), "Mis-configured 'cpython-pep668-externally-managed', expecting an 'Error' key")
-        PPG.config.cleanup_globs("PEP 668", self, "bin/pip*")
+        PPG.config.cleanup_globs("PEP 668", self, "bin/pip*", index=self.tree_index)
         externally_managed = self.prefix_lib_folder / "EXTERNALLY-MANAGED"
         if not runez.log.hdry(f"write {runez.short(externally_managed)}"):
             config = configparser.ConfigParser()
@@ -288,12 +341,55 @@ class Cpython(PythonBuilder):
             with open(externally_managed, "w") as fh:
                 config.write(fh)
 
+            self.tree_index.update(externally_managed)
+
+    def _size_report(self):
+        """
+        Write size manifest, and check installation size against configured 'size-budget'
+
+        Returns
+        -------
+        str | None
+            Problem, if installation size exceeds configured 'size-budget'
+        """
+        report = SizeReport.from_folder(self.install_folder, index=self.tree_index)
+        info_path = PPG.config.get_value("manifest", "size-report")
+        if info_path:
+            runez.write(self.install_folder / info_path, report.represented_manifest())
+            self.tree_index.update(self.install_folder / info_path)
+
+        baseline = SizeReport.from_path(PPG.config.resolved_path("size-budget", "baseline"))
+        LOG.info("Size report:\n%s", report.represented(baseline=baseline))
+        return report.budget_problem(PPG.config.get_value("size-budget"), baseline=baseline)
+
     def _relativize_shebangs(self):
         """Autocorrect shebangs in bin/ folder, making them relative to the location of the python executable"""
         for folder in (self.bin_folder, self.prefix_config_folder):
-            for path in runez.ls_dir(folder):
-                if path != self.bin_python and runez.is_executable(path) and not path.is_symlink():
-                    self._relativize_shebang_file(path)
+            for entry in self.tree_index.children(folder):
+                if entry.path != self.bin_python and entry.is_executable:
+                    self._relativize_shebang_file(entry.path)
+                    self.tree_index.update(entry.path)
+
+    def _unlist_allocator(self):
+        """
+        Remove allocator linker flags from sysconfig, python-config, pkgconfig etc (./configure persists LIBS there)
+        The allocator is linked into python itself, extensions built against this python must not link it again
+        """
+        allocator = self.active_module(Allocator)
+        flags = allocator and list(allocator.linker_flags())
+        if flags:
+            regex = r"[ \t]*" + r"\s+".join(re.escape(x) for x in runez.flattened(flags, split=True))
+            paths = [self._find_sys_cfg(), self.prefix_config_folder, self.install_folder / "lib/pkgconfig"]
+            paths.extend(self.bin_folder.glob("python*-config"))
+            for path in runez.flattened(paths):
+                if path.exists():
+                    if path.is_dir():
+                        patch_folder(path, regex, "")
+
+                    else:
+                        patch_file(path, regex, "")
+
+                    self.tree_index.update(path)
 
     def _relativize_sysconfig(self):
         """
@@ -301,10 +397,12 @@ class Cpython(PythonBuilder):
         See https://manpages.debian.org/stretch/pkg-config/pkg-config.1.en.html#PKG-CONFIG_DERIVED_VARIABLES
         """
         patch_folder(self.install_folder / "lib/pkgconfig", f"prefix={self.c_configure_prefix}", "prefix=${pcfiledir}/../..")
+        self.tree_index.update(self.install_folder / "lib/pkgconfig")
         sys_cfg = self._find_sys_cfg()
         if sys_cfg:
             rs = RelSysConf(sys_cfg, self.c_configure_prefix)
             runez.write(sys_cfg, rs.text)
+            self.tree_index.update(sys_cfg)
 
     def _validate_venv_creation(self, copies=False):
         folder = "venv"
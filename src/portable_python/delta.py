@@ -0,0 +1,415 @@
+"""
+Chunk-level deltas between two builds, allowing to ship only what changed to hosts that already have the previous build.
+
+A delta is a tarball containing:
+- delta.json: manifest describing each entry of the new build, and how to reconstruct its files
+- data.bin: bytes that could not be found in the old build, in the order in which delta.json needs them
+
+Files identical to a file of the old build are referred to as a whole. Changed files are cut in content-defined chunks
+(boundaries depend only on the few bytes preceding them: an insertion only affects the chunks around it),
+and chunks found in the old version of the same file are referred to by offset instead of being shipped again.
+
+Deltas are applied with the same safety rules as the 'tar' extraction filter: no absolute paths, no '..',
+no writing through symlinks, and symlinks (or hardlinks) can't point outside of the rebuilt folder.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import pathlib
+import stat
+import tarfile
+import tempfile
+
+import runez
+
+from portable_python.compression import canonical_extension, Compressor, tar_reader
+from portable_python.tree_index import TreeIndex
+
+LOG = logging.getLogger(__name__)
+DELTA_FORMAT = 1
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+# Chunk boundaries follow runs of bytes all belonging to a pseudo-random half of the 256 byte values (~6KB average chunk size).
+# Found via bytes.translate() + bytes.find(), which run at C speed (a per-byte rolling hash in python is way too slow)
+BOUNDARY_MARKS = bytes(hashlib.sha256(bytes([i])).digest()[0] & 1 for i in range(256))
+BOUNDARY_RUN = b"\x01" * 11
+
+
+class TreeMember:
+    """One entry of an installation, as seen in a folder or a tarball"""
+
+    __slots__ = ("kind", "mode", "mtime", "path", "read", "target")
+
+    def __init__(self, path, kind, mode=None, mtime=None, target=None, read=None):
+        """
+        Parameters
+        ----------
+        path : str
+            Path relative to installation folder
+        kind : str
+            'dir', 'file', 'symlink' or 'hardlink'
+        mode : int | None
+            Permission bits
+        mtime : float | None
+            Modification time
+        target : str | None
+            Target of symlink (as-is), or of hardlink (path relative to installation folder)
+        read : callable | None
+            Function returning contents of file (available only while iterating over given entry)
+        """
+        self.path = path
+        self.kind = kind
+        self.mode = mode
+        self.mtime = mtime
+        self.target = target
+        self.read = read
+
+    def __repr__(self):
+        return self.path
+
+    def to_dict(self):
+        result = {"path": self.path, "type": self.kind}
+        if self.kind in ("symlink", "hardlink"):
+            result["target"] = self.target
+
+        else:
+            result["mode"] = self.mode
+            result["mtime"] = int(self.mtime)
+
+        return result
+
+
+def tree_members(path):
+    """
+    Parameters
+    ----------
+    path : pathlib.Path | str
+        Installation folder, or dist tarball (its single top-level folder gets stripped)
+
+    Yields
+    ------
+    TreeMember
+        All entries, parent folders first
+    """
+    path = runez.to_path(path)
+    if path.is_dir():
+        index = TreeIndex(path)
+        for entry in index.walk():
+            relative_path = os.path.relpath(entry.path, path)
+            if entry.is_symlink:
+                yield TreeMember(relative_path, "symlink", target=os.readlink(entry.path))
+
+            elif entry.is_dir:
+                yield TreeMember(relative_path, "dir", stat.S_IMODE(entry.mode), entry.mtime)
+
+            elif entry.is_file:
+                yield TreeMember(relative_path, "file", stat.S_IMODE(entry.mode), entry.mtime, read=_file_reader(entry.path))
+
+        return
+
+    runez.abort_if(not path.exists(), "'%s' does not exist" % runez.red(runez.short(path)))
+    with tar_reader(path) as tar:
+        top = None
+        for member in tar:
+            name = os.path.normpath(member.name)
+            if top is None:
+                runez.abort_if(not member.isdir(), "%s does not have a top-level folder" % runez.red(runez.short(path)))
+                top = name + "/"
+                continue
+
+            runez.abort_if(not name.startswith(top), "%s has more than one top-level folder" % runez.red(runez.short(path)))
+            relative_path = name[len(top) :]
+            if member.issym():
+                yield TreeMember(relative_path, "symlink", target=member.linkname)
+
+            elif member.isdir():
+                yield TreeMember(relative_path, "dir", member.mode, member.mtime)
+
+            elif member.islnk():
+                target = os.path.normpath(member.linkname)
+                runez.abort_if(not target.startswith(top), "%s: hardlink %s points outside of %s" % (runez.short(path), name, top))
+                yield TreeMember(relative_path, "hardlink", target=target[len(top) :])
+
+            elif member.isfile():
+                yield TreeMember(relative_path, "file", member.mode, member.mtime, read=tar.extractfile(member).read)
+
+            else:
+                runez.abort("%s: unsupported member type for %s" % (runez.red(runez.short(path)), name))
+
+
+def content_defined_chunks(data):
+    """
+    Parameters
+    ----------
+    data : bytes
+        Data to cut in chunks
+
+    Yields
+    ------
+    (int, int)
+        Offset and length of each chunk, boundaries depend only on the content around them
+    """
+    marks = data.translate(BOUNDARY_MARKS)
+    size = len(data)
+    start = 0
+    while start < size:
+        end = min(start + MAX_CHUNK, size)
+        found = marks.find(BOUNDARY_RUN, start + MIN_CHUNK, end)
+        cut = end if found < 0 else found + len(BOUNDARY_RUN)
+        yield start, cut - start
+        start = cut
+
+
+def create_delta(old, new, destination, logger=LOG.info):
+    """
+    Parameters
+    ----------
+    old : pathlib.Path | str
+        Previous build (installation folder or dist tarball), as deployed on target hosts
+    new : pathlib.Path | str
+        New build (installation folder or dist tarball)
+    destination : pathlib.Path | str
+        Path to delta tarball to produce
+    logger : callable | None
+        Logger to use
+    """
+    destination = runez.to_path(destination)
+    extension = canonical_extension(destination.name, short_form=True)
+    runez.abort_if(extension in (None, "zip"), "Delta must be a tarball, invalid extension: %s" % runez.red(destination.name))
+    if runez.log.hdry("create delta %s -> %s" % (runez.short(old), runez.short(destination))):
+        return
+
+    new_hashes = {m.path: _sha256(m.read()) for m in tree_members(new) if m.kind == "file"}
+    old_hashes = {}
+    old_by_hash = {}
+    old_chunks = {}
+    for member in tree_members(old):
+        if member.kind == "file":
+            data = member.read()
+            digest = _sha256(data)
+            old_hashes[member.path] = digest
+            old_by_hash.setdefault(digest, member.path)
+            new_digest = new_hashes.get(member.path)
+            if new_digest and new_digest != digest:
+                # File changed in new build, remember its chunks
+                old_chunks[member.path] = {_chunk_key(data, o, n): o for o, n in content_defined_chunks(data)}
+
+    stats = {"files": 0, "identical": 0, "size": 0, "reused": 0, "literal": 0}
+    required = {}
+    entries = []
+    with tempfile.TemporaryFile() as literals:
+        for member in tree_members(new):
+            entry = member.to_dict()
+            entries.append(entry)
+            if member.kind == "file":
+                data = member.read()
+                digest = new_hashes[member.path]
+                entry["size"] = len(data)
+                entry["sha256"] = digest
+                stats["files"] += 1
+                stats["size"] += len(data)
+                source = old_by_hash.get(digest)
+                if source is not None:
+                    entry["copy"] = source
+                    required[source] = digest
+                    stats["identical"] += 1
+                    stats["reused"] += len(data)
+                    continue
+
+                chunks = _delta_chunks(data, old_chunks.get(member.path))
+                entry["chunks"] = chunks
+                for chunk in chunks:
+                    if chunk[0] == "old":
+                        required[member.path] = old_hashes[member.path]
+                        stats["reused"] += chunk[2]
+
+                    else:
+                        literals.write(data[chunk[1] : chunk[1] + chunk[2]])
+                        stats["literal"] += chunk[2]
+                        del chunk[1]  # Literal data is read sequentially, offset is not needed
+
+        manifest = {"format": DELTA_FORMAT, "required": required, "entries": entries, "stats": stats}
+        manifest = json.dumps(manifest, separators=(",", ":")).encode()
+        literals.seek(0)
+        Compressor.from_config(extension).write_tarball(destination, lambda tar: _add_delta_members(tar, manifest, literals))
+
+    if logger:
+        identical = runez.plural(stats["identical"], "identical file")
+        literal = runez.represented_bytesize(stats["literal"])
+        logger("Delta %s: %s, %s, %s of new data" % (runez.short(destination), runez.plural(stats["files"], "file"), identical, literal))
+
+
+def apply_delta(old, delta, destination, logger=LOG.info):
+    """
+    Parameters
+    ----------
+    old : pathlib.Path | str
+        Unpacked previous build (the one delta was produced against)
+    delta : pathlib.Path | str
+        Delta tarball, as produced by `create_delta()`
+    destination : pathlib.Path | str
+        Folder where to reconstruct new build (must not exist yet)
+    logger : callable | None
+        Logger to use
+    """
+    old = runez.to_path(old)
+    delta = runez.to_path(delta)
+    destination = runez.to_path(destination)
+    runez.abort_if(not old.is_dir(), "'%s' is not a folder" % runez.red(runez.short(old)))
+    runez.abort_if(destination.exists(), "'%s' already exists" % runez.red(runez.short(destination)))
+    if runez.log.hdry("apply delta %s to %s -> %s" % (runez.short(delta), runez.short(old), runez.short(destination))):
+        return
+
+    with tar_reader(delta) as tar:
+        members = iter(tar)
+        manifest = json.loads(_delta_member(tar, next(members, None), "delta.json").read())
+        runez.abort_if(manifest.get("format") != DELTA_FORMAT, "Unsupported delta format in %s" % runez.short(delta))
+        for path, digest in manifest["required"].items():
+            path = old / _safe_relative_path(path)
+            actual = os.path.isfile(path) and runez.checksum(path)
+            runez.abort_if(actual != digest, "%s differs from the build this delta was made against" % runez.red(runez.short(path)))
+
+        literals = _delta_member(tar, next(members, None), "data.bin")
+        folders = []
+        files = set()
+        symlinks = set()
+        runez.ensure_folder(destination, logger=None)
+        for entry in manifest["entries"]:
+            path = _safe_relative_path(entry["path"])
+            runez.abort_if(symlinks.intersection(path.parents), "Invalid delta: %s would be written through a symlink" % runez.red(path))
+            target = destination / path
+            if entry["type"] == "dir":
+                target.mkdir()
+                folders.append(entry)
+
+            elif entry["type"] == "symlink":
+                runez.abort_if(os.path.isabs(entry["target"]), "Invalid delta: %s is an absolute symlink" % runez.red(path))
+                _safe_relative_path(os.path.join(os.path.dirname(entry["path"]), entry["target"]))
+                os.symlink(entry["target"], target)
+                symlinks.add(path)
+
+            elif entry["type"] == "hardlink":
+                source = _safe_relative_path(entry["target"])
+                runez.abort_if(source not in files, "Invalid delta: hardlink %s must point to a file rebuilt before it" % runez.red(path))
+                os.link(destination / source, target)
+
+            else:
+                _reconstructed_file(old, entry, literals, target)
+                files.add(path)
+                os.chmod(target, entry["mode"])
+                os.utime(target, (entry["mtime"], entry["mtime"]))
+
+        for entry in reversed(folders):
+            os.chmod(destination / entry["path"], entry["mode"])
+            os.utime(destination / entry["path"], (entry["mtime"], entry["mtime"]))
+
+    if logger:
+        count = runez.plural(manifest["stats"]["files"], "file")
+        logger("Rebuilt %s from %s + %s, verified %s" % (runez.short(destination), runez.short(old), runez.short(delta), count))
+
+
+def _add_delta_members(tar, manifest, literals):
+    info = tarfile.TarInfo("delta.json")
+    info.size = len(manifest)
+    tar.addfile(info, io.BytesIO(manifest))
+    info = tarfile.TarInfo("data.bin")
+    info.size = literals.seek(0, os.SEEK_END)
+    literals.seek(0)
+    tar.addfile(info, literals)
+
+
+def _chunk_key(data, offset, length):
+    return hashlib.blake2b(data[offset : offset + length], digest_size=16).digest()
+
+
+def _delta_chunks(data, old_chunks):
+    """
+    Parameters
+    ----------
+    data : bytes
+        Contents of new file
+    old_chunks : dict[bytes, int] | None
+        Offsets of chunks in old version of the same file, if any
+
+    Returns
+    -------
+    list[list]
+        ['old', offset, length] (when found in old version), or ['data', offset, length], adjacent chunks are merged
+    """
+    if not old_chunks:
+        return [["data", 0, len(data)]] if data else []
+
+    result = []
+    for offset, length in content_defined_chunks(data):
+        old_offset = old_chunks.get(_chunk_key(data, offset, length))
+        chunk = ["data", offset, length] if old_offset is None else ["old", old_offset, length]
+        if result and result[-1][0] == chunk[0] and result[-1][1] + result[-1][2] == chunk[1]:
+            result[-1][2] += length
+
+        else:
+            result.append(chunk)
+
+    return result
+
+
+def _delta_member(tar, member, name):
+    runez.abort_if(member is None or member.name != name, "Invalid delta: expecting '%s' member" % name)
+    return tar.extractfile(member)
+
+
+def _file_reader(path):
+    def read():
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    return read
+
+
+def _reconstructed_file(old, entry, literals, target):
+    """Write file described by delta 'entry' to 'target', verifying its checksum"""
+    digest = hashlib.sha256()
+    chunks = entry.get("chunks")
+    needs_old = chunks is None or any(x[0] == "old" for x in chunks)
+    with contextlib.ExitStack() as stack, open(target, "wb") as fout:
+        fin = needs_old and stack.enter_context(open(old / _safe_relative_path(entry.get("copy") or entry["path"]), "rb"))
+        for buffer in _chunk_contents(fin, literals, chunks):
+            digest.update(buffer)
+            fout.write(buffer)
+
+    runez.abort_if(digest.hexdigest() != entry["sha256"], "Checksum mismatch for reconstructed %s" % runez.red(runez.short(target)))
+
+
+def _chunk_contents(fin, literals, chunks):
+    if chunks is None:
+        # Whole file copied from old build
+        yield from iter(lambda: fin.read(1024 * 1024), b"")
+        return
+
+    for chunk in chunks:
+        if chunk[0] == "old":
+            fin.seek(chunk[1])
+            buffer = fin.read(chunk[2])
+            expected = chunk[2]
+
+        else:
+            buffer = literals.read(chunk[1])
+            expected = chunk[1]
+
+        runez.abort_if(len(buffer) != expected, "Invalid delta: truncated data for %s" % runez.red(chunk))
+        yield buffer
+
+
+def _safe_relative_path(path):
+    """'path' from a delta manifest, as a relative path that can't escape the folder it gets joined to"""
+    path = os.path.normpath(path)
+    safe = path and path != "." and not os.path.isabs(path) and path != ".." and not path.startswith(".." + os.sep)
+    runez.abort_if(not safe, "Invalid delta: unsafe path %s" % runez.red(path))
+    return pathlib.Path(path)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
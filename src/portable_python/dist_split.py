@@ -0,0 +1,178 @@
+"""
+Split of the dist artifact into a core runtime tarball, plus optional component tarballs (configured via 'dist-split').
+
+All tarballs share the same top-level folder, extracting components on top of the core yields the full installation.
+A shared manifest lists which tarball holds what, with their checksums.
+"""
+
+import functools
+import logging
+
+import runez
+import yaml
+
+from portable_python.compression import canonical_extension
+from portable_python.config import FileMatcher
+from portable_python.tree_index import TreeIndex
+from portable_python.versions import PPG
+
+LOG = logging.getLogger(__name__)
+CORE = "core"
+
+
+class DistSplit:
+    """Assigns each file of an installation to the core runtime, or to one of the configured optional components"""
+
+    def __init__(self, components):
+        """
+        Parameters
+        ----------
+        components : dict[str, list[str]]
+            Globs (same syntax as clean-up specs) of files or folders going to each component, by component name
+        """
+        self.matchers = {name: FileMatcher(globs) for name, globs in components.items()}
+
+    def __repr__(self):
+        return runez.joined((f"{name}: {matcher}" for name, matcher in self.matchers.items()), delimiter="; ")
+
+    @classmethod
+    def from_config(cls, folders):
+        """
+        Parameters
+        ----------
+        folders : portable_python.versions.Folders
+            Folders used to format configured globs (example: {python_mm})
+
+        Returns
+        -------
+        DistSplit | None
+            Split configured via 'dist-split', if any
+        """
+        config = PPG.config.get_value("dist-split")
+        if not config:
+            return None
+
+        runez.abort_if(not isinstance(config, dict), "'dist-split' must be a mapping of component name -> globs")
+        components = {}
+        for name, globs in config.items():
+            runez.abort_if(name == CORE or not globs, "Invalid 'dist-split' component '%s'" % runez.red(name))
+            components[name] = [folders.formatted(x) for x in runez.flattened(globs, split=True, unique=True)]
+
+        return cls(components)
+
+    def component_of(self, entry, inherited):
+        """
+        Parameters
+        ----------
+        entry : portable_python.tree_index.TreeEntry
+            File, folder or symlink to assign
+        inherited : str
+            Component of parent folder
+
+        Returns
+        -------
+        str
+            Component 'entry' goes to: deepest match wins, first configured component wins among matches for the same path
+        """
+        for name, matcher in self.matchers.items():
+            if matcher.is_match(entry.path, is_dir=entry.is_dir):
+                return name
+
+        return inherited
+
+    def assigned(self, index):
+        """
+        Parameters
+        ----------
+        index : TreeIndex
+            Index of the installation folder to split
+
+        Returns
+        -------
+        dict[str, list[portable_python.tree_index.TreeEntry]]
+            Files, symlinks and empty folders (other folders are implied) going to each component, core first
+        """
+        result = {CORE: []}
+        result.update((name, []) for name in self.matchers)
+        folders = [(index.folder, CORE)]
+        while folders:
+            folder, inherited = folders.pop()
+            for entry in index.children(folder):
+                component = self.component_of(entry, inherited)
+                if entry.is_dir and index.children(entry.path):
+                    folders.append((entry.path, component))
+
+                else:
+                    result[component].append(entry)
+
+        for entries in result.values():
+            entries.sort(key=lambda x: x.path)
+
+        return result
+
+    def write(self, compressor, install_folder, destination, index=None, logger=LOG.info):
+        """
+        Parameters
+        ----------
+        compressor : portable_python.compression.Compressor
+            Compressor to use
+        install_folder : pathlib.Path
+            Installation to split
+        destination : pathlib.Path
+            Path to core tarball, component tarballs and manifest go next to it (with a '-<component>' suffix)
+        index : TreeIndex | None
+            Index of 'install_folder', if available
+        logger : callable | None
+            Logger to use
+
+        Returns
+        -------
+        pathlib.Path | None
+            Path to written manifest
+        """
+        extension = canonical_extension(compressor.extension)
+        runez.abort_if(extension == "zip", "'dist-split' requires a tarball 'ext', can't split a .zip")
+        stem = destination.name[: -len(extension) - 1]
+        manifest_path = destination.parent / f"{stem}.components.yml"
+        if runez.log.hdry("split %s -> %s (%s)" % (runez.short(install_folder), runez.short(destination), self)):
+            return None
+
+        if index is None:
+            index = TreeIndex(install_folder)
+
+        manifest = {"folder": install_folder.name, "components": {}}
+        for component, entries in self.assigned(index).items():
+            tarball = destination if component == CORE else destination.parent / f"{stem}-{component}.{extension}"
+            if logger:
+                logger("Tar %s %s -> %s (%s)" % (runez.plural(entries, "file"), component, runez.short(tarball), compressor))
+
+            compressor.write_tarball(tarball, functools.partial(_add_entries, install_folder=install_folder, entries=entries))
+            info = {"tarball": tarball.name, "sha256": runez.checksum(tarball), "files": len(entries)}
+            info["size"] = sum(x.size for x in entries if x.is_file)
+            if component != CORE:
+                info["paths"] = [str(x.path.relative_to(install_folder)) for x in entries]
+
+            manifest["components"][component] = info
+
+        runez.write(manifest_path, yaml.safe_dump(manifest, width=140, sort_keys=False), logger=logger)
+        return manifest_path
+
+
+def _add_entries(tar, install_folder, entries):
+    """Add 'entries' (and their parent folders) to 'tar', all under a top folder named like 'install_folder'"""
+    added = set()
+    for entry in entries:
+        relative = entry.path.relative_to(install_folder)
+        for parent in [install_folder / x for x in list(relative.parents)[::-1]]:
+            if parent not in added:
+                added.add(parent)
+                tar.add(parent, arcname=_arcname(install_folder, parent), recursive=False)
+
+        tar.add(entry.path, arcname=_arcname(install_folder, entry.path), recursive=False)
+
+
+def _arcname(install_folder, path):
+    if path == install_folder:
+        return install_folder.name
+
+    return "%s/%s" % (install_folder.name, path.relative_to(install_folder))
@@ -0,0 +1,373 @@
+"""
+Minimal in-process ELF reader, focused on the dynamic section (DT_NEEDED, DT_RPATH, DT_RUNPATH).
+
+Allows to inspect and auto-correct exes/libs without having to spawn 'patchelf' for each file.
+"""
+
+import mmap
+import struct
+
+ELF_MAGIC = b"\x7fELF"
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_SYMTAB = 6
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+DT_VERDEF = 0x6FFFFFFC
+DT_VERDEFNUM = 0x6FFFFFFD
+DT_VERNEED = 0x6FFFFFFE
+DT_VERNEEDNUM = 0x6FFFFFFF
+
+# Other dynamic entries whose value is an offset in .dynstr: DT_CONFIG, DT_DEPAUDIT, DT_AUDIT, DT_AUXILIARY, DT_FILTER
+DT_OTHER_STRINGS = (0x6FFFFEFA, 0x6FFFFEFB, 0x6FFFFEFC, 0x7FFFFFFD, 0x7FFFFFFF)
+
+SHT_DYNSYM = 11
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+
+# Parsed fields that `ElfFile.dynamic_info` captures (all that's needed to resolve dependencies, see `LdSoResolver`)
+DYNAMIC_INFO_KEYS = ("elf_class", "machine", "interpreter", "needed", "soname", "rpath", "runpath")
+
+
+class ElfLayout:
+    """struct formats for a given ELF class (32 or 64 bits) and endianness"""
+
+    def __init__(self, is_64, endian):
+        self.is_64 = is_64
+        self.endian = endian
+        if is_64:
+            self.header = struct.Struct(endian + "HHIQQQIHHHHHH")
+            self.program_header = struct.Struct(endian + "IIQQQQQQ")
+            self.section_header = struct.Struct(endian + "IIQQQQIIQQ")
+            self.dyn = struct.Struct(endian + "qQ")
+
+        else:
+            self.header = struct.Struct(endian + "HHIIIIIHHHHHH")
+            self.program_header = struct.Struct(endian + "IIIIIIII")
+            self.section_header = struct.Struct(endian + "IIIIIIIIII")
+            self.dyn = struct.Struct(endian + "iI")
+
+        # Symbol version structures have the same layout in 32 and 64 bits
+        self.word = struct.Struct(endian + "I")
+        self.verdef = struct.Struct(endian + "HHHHIII")
+        self.verdaux = struct.Struct(endian + "II")
+        self.verneed = struct.Struct(endian + "HHIII")
+        self.vernaux = struct.Struct(endian + "IHHII")
+
+    def program_header_fields(self, data, offset):
+        """(p_type, p_offset, p_vaddr, p_filesz) of program header at 'offset'"""
+        fields = self.program_header.unpack_from(data, offset)
+        if self.is_64:
+            p_type, _, p_offset, p_vaddr, _, p_filesz, _, _ = fields
+
+        else:
+            p_type, p_offset, p_vaddr, _, p_filesz, _, _, _ = fields
+
+        return p_type, p_offset, p_vaddr, p_filesz
+
+    def section_header_fields(self, data, offset):
+        """(sh_type, sh_offset, sh_size, sh_entsize) of section header at 'offset'"""
+        _, sh_type, _, _, sh_offset, sh_size, _, _, _, sh_entsize = self.section_header.unpack_from(data, offset)
+        return sh_type, sh_offset, sh_size, sh_entsize
+
+
+class RpathSlot:
+    """Location of a DT_RPATH or DT_RUNPATH entry, and of its string in .dynstr"""
+
+    def __init__(self, tag, entry_offset, string_offset, capacity):
+        self.tag = tag
+        self.entry_offset = entry_offset
+        self.string_offset = string_offset
+        self.capacity = capacity
+
+
+class ElfFile:
+    """Dynamic section of an ELF exe or shared lib, read via mmap"""
+
+    def __init__(self, path, dynamic_info=None):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to ELF file (use `ElfFile.from_path()` if you're not sure it's an ELF file)
+        dynamic_info : dict | None
+            Previously obtained `ElfFile.dynamic_info`, if any (file is not read in that case, and can't be modified)
+        """
+        self.path = path
+        self.elf_class = None
+        self.machine = None
+        self.interpreter = None
+        self.needed = []
+        self.soname = None
+        self.rpath = None
+        self.runpath = None
+        self._layout = None
+        self._rpath_slots = []  # type: list[RpathSlot]
+        self._rpath_is_shared = None  # type: bool # Computed on demand, when rpath is about to be overwritten
+        if dynamic_info is not None:
+            for key in DYNAMIC_INFO_KEYS:
+                setattr(self, key, dynamic_info.get(key))
+
+            self.needed = list(self.needed or [])
+            return
+
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            self._parse(data)
+
+    def __repr__(self):
+        return str(self.path)
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to file to inspect
+
+        Returns
+        -------
+        ElfFile | None
+            Parsed file, if 'path' is a readable ELF file
+        """
+        if is_elf_file(path):
+            try:
+                return cls(path)
+
+            except (OSError, ValueError, struct.error):
+                return None
+
+    @property
+    def dynamic_info(self):
+        """What's needed to resolve dependencies of this file, as a json-serializable dict (depends on this file only)"""
+        return {key: getattr(self, key) for key in DYNAMIC_INFO_KEYS}
+
+    @property
+    def effective_rpath(self):
+        """DT_RUNPATH if present (the loader ignores DT_RPATH in that case), DT_RPATH otherwise"""
+        return self.runpath if self.runpath is not None else self.rpath
+
+    def can_set_rpath(self, rpath):
+        """
+        Can 'rpath' be written in place?
+        Not possible if .dynstr would have to grow, or if current rpath string shares bytes with any other string
+        (linkers may tail-merge strings: a DT_NEEDED, symbol or version name could point inside the rpath string)
+        """
+        size = len(rpath.encode())
+        if not self._rpath_slots or any(size > slot.capacity for slot in self._rpath_slots):
+            return False
+
+        if self._rpath_is_shared is None:
+            with open(self.path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self._rpath_is_shared = self._parse(data, check_shared=True)
+
+        return not self._rpath_is_shared
+
+    def set_rpath(self, rpath):
+        """
+        Overwrite rpath in place, in the same manner 'patchelf --set-rpath' does it when new rpath is not longer than current one.
+        Like 'patchelf', DT_RPATH gets turned into DT_RUNPATH (unless there already is a DT_RUNPATH entry).
+
+        Parameters
+        ----------
+        rpath : str
+            New rpath to use
+
+        Returns
+        -------
+        bool
+            True if rpath was written, False if it can't be written in place (in which case file was not touched)
+        """
+        if not self.can_set_rpath(rpath):
+            return False
+
+        encoded = rpath.encode()
+        has_runpath = any(slot.tag == DT_RUNPATH for slot in self._rpath_slots)
+        with open(self.path, "r+b") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_WRITE) as data:
+            for slot in self._rpath_slots:
+                data[slot.string_offset : slot.string_offset + slot.capacity] = encoded.ljust(slot.capacity, b"\0")
+                if slot.tag == DT_RPATH and not has_runpath:
+                    d_val = self._layout.dyn.unpack_from(data, slot.entry_offset)[1]
+                    self._layout.dyn.pack_into(data, slot.entry_offset, DT_RUNPATH, d_val)
+                    slot.tag = DT_RUNPATH
+
+            data.flush()
+
+        self.rpath = rpath if has_runpath and self.rpath is not None else None
+        self.runpath = rpath
+        return True
+
+    def _parse(self, data, check_shared=False):
+        if len(data) < 52 or data[:4] != ELF_MAGIC or data[4] not in (1, 2) or data[5] not in (1, 2):
+            raise ValueError("Not an ELF file: %s" % self.path)
+
+        self.elf_class = 64 if data[4] == 2 else 32
+        layout = ElfLayout(data[4] == 2, "<" if data[5] == 1 else ">")
+        self._layout = layout
+        self._rpath_slots = []
+        header = layout.header.unpack_from(data, 16)
+        self.machine = header[1]
+        e_phoff = header[4]
+        e_phentsize = header[8]
+        e_phnum = header[9]
+        loads = []
+        dynamic = None
+        for i in range(e_phnum):
+            p_type, p_offset, p_vaddr, p_filesz = layout.program_header_fields(data, e_phoff + i * e_phentsize)
+            if p_type == PT_LOAD:
+                loads.append((p_vaddr, p_offset, p_filesz))
+
+            elif p_type == PT_DYNAMIC:
+                dynamic = (p_offset, p_filesz)
+
+            elif p_type == PT_INTERP:
+                self.interpreter = _c_string(data, p_offset)
+
+        if dynamic:
+            return self._parse_dynamic(data, layout, header, loads, *dynamic, check_shared=check_shared)
+
+    def _parse_dynamic(self, data, layout, header, loads, offset, size, check_shared=False):
+        entries = []
+        strtab = None
+        end = min(offset + size, len(data))
+        while offset + layout.dyn.size <= end:
+            tag, value = layout.dyn.unpack_from(data, offset)
+            if tag == DT_NULL:
+                break
+
+            if tag == DT_STRTAB:
+                strtab = _vaddr_to_offset(loads, value)
+
+            else:
+                entries.append((tag, value, offset))
+
+            offset += layout.dyn.size
+
+        if strtab is None:
+            return None
+
+        self.needed = []
+        for tag, value, entry_offset in entries:
+            if tag in (DT_NEEDED, DT_SONAME, DT_RPATH, DT_RUNPATH):
+                text = _c_string(data, strtab + value)
+                if tag == DT_NEEDED:
+                    self.needed.append(text)
+
+                elif tag == DT_SONAME:
+                    self.soname = text
+
+                else:
+                    if tag == DT_RPATH:
+                        self.rpath = text
+
+                    else:
+                        self.runpath = text
+
+                    self._rpath_slots.append(RpathSlot(tag, entry_offset, strtab + value, len(text.encode())))
+
+        if check_shared:
+            return self._is_rpath_shared(data, layout, header, loads, strtab, entries)
+
+        return None
+
+    def _is_rpath_shared(self, data, layout, header, loads, strtab, entries):
+        """Do other strings of .dynstr share bytes with rpath (linkers may tail-merge strings)? True if it can't be determined"""
+        try:
+            refs = self._other_string_refs(data, layout, header, loads, entries)
+
+        except (IndexError, struct.error):
+            refs = None
+
+        if refs is None:
+            return True
+
+        for slot in self._rpath_slots:
+            start = slot.string_offset
+            end = start + slot.capacity
+            for value in refs:
+                offset = strtab + value
+                if start <= offset < end or (offset < start and data.find(b"\0", offset, start) < 0):
+                    return True
+
+        return False
+
+    def _other_string_refs(self, data, layout, header, loads, entries):
+        """Offsets in .dynstr of all strings referenced by anything else than DT_RPATH/DT_RUNPATH (None if they can't all be found)"""
+        refs = {value for tag, value, _ in entries if tag in (DT_NEEDED, DT_SONAME) or tag in DT_OTHER_STRINGS}
+        values = {tag: value for tag, value, _ in entries}
+        dynsym = None
+        e_shoff, e_shentsize, e_shnum = header[5], header[10], header[11]
+        for i in range(e_shnum if e_shoff else 0):
+            sh_type, sh_offset, sh_size, sh_entsize = layout.section_header_fields(data, e_shoff + i * e_shentsize)
+            if sh_type == SHT_DYNSYM and sh_entsize:
+                dynsym = range(sh_offset, sh_offset + sh_size, sh_entsize)
+
+        if dynsym is None:
+            if DT_SYMTAB in values:
+                return None  # Stripped section headers, dynamic symbols can't be enumerated
+
+        else:
+            refs.update(layout.word.unpack_from(data, x)[0] for x in dynsym)  # st_name is 1st field in 32 and 64 bits
+
+        offset = _vaddr_to_offset(loads, values.get(DT_VERNEED, -1))
+        if offset is None and DT_VERNEED in values:
+            return None
+
+        for _ in range(values.get(DT_VERNEEDNUM, 0) if offset is not None else 0):
+            _, vn_cnt, vn_file, vn_aux, vn_next = layout.verneed.unpack_from(data, offset)
+            refs.add(vn_file)
+            aux = offset + vn_aux
+            for _ in range(vn_cnt):
+                _, _, _, vna_name, vna_next = layout.vernaux.unpack_from(data, aux)
+                refs.add(vna_name)
+                aux += vna_next
+
+            offset += vn_next
+
+        offset = _vaddr_to_offset(loads, values.get(DT_VERDEF, -1))
+        if offset is None and DT_VERDEF in values:
+            return None
+
+        for _ in range(values.get(DT_VERDEFNUM, 0) if offset is not None else 0):
+            _, _, _, vd_cnt, _, vd_aux, vd_next = layout.verdef.unpack_from(data, offset)
+            aux = offset + vd_aux
+            for _ in range(vd_cnt):
+                vda_name, vda_next = layout.verdaux.unpack_from(data, aux)
+                refs.add(vda_name)
+                aux += vda_next
+
+            offset += vd_next
+
+        return refs
+
+
+def is_elf_file(path):
+    """Quick check based on magic bytes, without parsing the file"""
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(4) == ELF_MAGIC
+
+    except OSError:
+        return False
+
+
+def _c_string(data, offset):
+    end = data.find(b"\0", offset)
+    if end < 0:
+        end = len(data)
+
+    return data[offset:end].decode("utf-8", errors="surrogateescape")
+
+
+def _vaddr_to_offset(loads, vaddr):
+    for p_vaddr, p_offset, p_filesz in loads:
+        if p_vaddr <= vaddr < p_vaddr + p_filesz:
+            return vaddr - p_vaddr + p_offset
+
+    return None
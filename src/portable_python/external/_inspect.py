@@ -1,8 +1,10 @@
 import json
 import os
 import re
+import subprocess
 import sys
 import sysconfig
+import time
 
 RX_VERSION = re.compile(r"\d\.\d")
 INSIGHTS = {
@@ -75,6 +77,95 @@ def module_report(module_name):
         return {"version": "*absent*", "note": note}
 
 
+def get_rss():
+    """Get current resident set size of this process, in bytes (if it can be determined)"""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    except (IOError, OSError, ValueError):  # IOError: py2
+        pass
+
+    try:
+        import resource
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+    except ImportError:
+        return None
+
+
+def import_cost(module_name, traced=False):
+    """
+    Import 'module_name', and measure what it cost (meant to be called in a fresh interpreter)
+    Allocations are measured in a separate run ('traced'), as tracemalloc significantly slows down imports
+    """
+    result = {}
+    if traced:
+        try:
+            import tracemalloc
+
+        except ImportError:
+            return result
+
+        tracemalloc.start()
+        __import__(module_name)
+        result["import_allocated"] = tracemalloc.get_traced_memory()[1]
+        return result
+
+    timer = getattr(time, "perf_counter", time.time)
+    rss = get_rss()
+    started = timer()
+    __import__(module_name)
+    result["import_time"] = timer() - started
+    if rss is not None:
+        result["import_rss"] = max(0, get_rss() - rss)
+
+    return result
+
+
+def measured_import_cost(module_name):
+    """Import cost of 'module_name', each measurement done in a fresh interpreter"""
+    result = {}
+    for mode in ("plain", "traced"):
+        try:
+            cmd = [sys.executable, os.path.abspath(__file__), "--import-cost", module_name, mode]
+            output = subprocess.check_output(cmd, stderr=subprocess.STDOUT)  # noqa: S603
+            result.update(json.loads(output.decode("utf-8")))
+
+        except Exception:  # noqa: S112, module could not be imported, it is reported as absent already
+            continue
+
+    return result
+
+
+def get_allocator():
+    """Allocators in use: python's own one (for small objects), and the one implementing malloc()"""
+    result = {"python": os.environ.get("PYTHONMALLOC"), "malloc": "libc"}
+    if not result["python"]:
+        if sysconfig.get_config_var("Py_GIL_DISABLED"):
+            result["python"] = "mimalloc"  # Free-threaded builds always use their bundled mimalloc
+
+        else:
+            result["python"] = "pymalloc" if sysconfig.get_config_var("WITH_PYMALLOC") else "malloc"
+
+    try:
+        import ctypes
+
+        process = ctypes.CDLL(None)
+        if hasattr(process, "mallctl"):
+            result["malloc"] = "jemalloc"
+
+        elif hasattr(process, "mi_version") and not sysconfig.get_config_var("WITH_MIMALLOC"):
+            result["malloc"] = "mimalloc"  # Statically linked (cpython's bundled mimalloc does not override malloc)
+
+    except Exception:  # noqa: S110, ctypes not available, malloc implementation can't be determined
+        pass
+
+    return result
+
+
 def get_srcdir():
     srcdir = sysconfig.get_config_var("srcdir")
     if not srcdir or len(srcdir) < 3:
@@ -97,7 +188,11 @@ def get_simplified_dirs(path):
     return result
 
 
-def main(arg):
+def main(arg, *options):
+    if arg == "--import-cost":
+        print(json.dumps(import_cost(options[0], traced=options[1:] == ("traced",))))
+        return
+
     if arg == "sysconfig":
         marker = "$^"
         simplified_dirs = get_simplified_dirs(sysconfig.get_config_var("abs_builddir"))
@@ -121,9 +216,14 @@ def main(arg):
             names.append("pip")
 
         report = dict((k, module_report(k)) for k in names)  # noqa: C402, works on py2 as well (can inspect py2)
-        report = {"report": report, "srcdir": get_srcdir(), "prefix": sysconfig.get_config_var("prefix")}
+        if "--import-cost" in options:
+            for k, v in report.items():
+                if v.get("version") != "*absent*":
+                    v.update(measured_import_cost(k))
+
+        report = {"report": report, "srcdir": get_srcdir(), "prefix": sysconfig.get_config_var("prefix"), "allocator": get_allocator()}
         print(json.dumps(report, indent=2, sort_keys=True))
 
 
 if __name__ == "__main__":
-    main(sys.argv[1] if len(sys.argv) > 1 else "")
+    main(*(sys.argv[1:] or [""]))
@@ -4,6 +4,116 @@ import runez
 
 from portable_python import LinkerOutcome, ModuleBuilder, PPG
 
+ALLOCATORS = {"jemalloc": "5.3.0", "mimalloc": "2.1.7"}  # Supported 'cpython-allocator' values, with their default version
+
+
+class Allocator(ModuleBuilder):
+    """
+    Memory allocator replacing libc's malloc(), statically linked into the interpreter (config 'cpython-allocator')
+    See https://github.com/microsoft/mimalloc and https://github.com/jemalloc/jemalloc
+    cpython 3.13+ bundles mimalloc, but uses it as python allocator only in free-threaded builds ('--disable-gil'):
+    its '--with-mimalloc' is used for those, other builds get mimalloc compiled separately (and '--without-mimalloc')
+    Known issues:
+    - macos: malloc() can't be overridden via static linking
+    """
+
+    xenv_CFLAGS = "-fPIC"
+
+    def __repr__(self):
+        return "%s:%s" % (self.kind or self.m_name, self.version or "bundled")
+
+    @runez.cached_property
+    def kind(self):
+        """Allocator to use as per config, None for the default one (pymalloc on top of libc's malloc)"""
+        kind = PPG.config.get_value("cpython-allocator")
+        if kind in (None, "default"):
+            return None
+
+        if kind not in ALLOCATORS:
+            runez.abort(
+                "Unknown cpython-allocator '%s', expecting one of: %s" % (runez.red(kind), runez.joined("default", list(ALLOCATORS)))
+            )
+
+        return kind
+
+    @property
+    def is_bundled(self):
+        """True if cpython's own bundled mimalloc is used (free-threaded builds only, the others don't use it by default)"""
+        if self.kind == "mimalloc" and self.setup.python_spec.version >= "3.13":
+            return bool(self.setup.python_builder.has_configure_opt("--disable-gil"))
+
+    def auto_select_reason(self):
+        if self.kind:
+            return "Configured via 'cpython-allocator: %s'" % self.kind
+
+    def linker_outcome(self, is_selected):
+        if not self.kind:
+            return runez.UNSET, None
+
+        if not PPG.target.is_linux:
+            return LinkerOutcome.failed, "%s, can't override malloc() statically on %s" % (runez.red("broken"), PPG.target.platform)
+
+        if is_selected and self.url and self.kind == "mimalloc" and not runez.which("cmake"):
+            return LinkerOutcome.failed, "%s (apt install cmake)" % runez.red("needs cmake")
+
+        outcome = LinkerOutcome.static if is_selected else LinkerOutcome.absent
+        return outcome, None
+
+    def scan_note(self):
+        if not self.kind:
+            return runez.dim("default: pymalloc + libc malloc()")
+
+        if self.is_bundled:
+            return "bundled with free-threaded cpython %s" % self.setup.python_spec.version.mm
+
+        return self.kind
+
+    @property
+    def url(self):
+        if self.kind == "jemalloc":
+            return f"https://github.com/jemalloc/jemalloc/releases/download/{self.version}/jemalloc-{self.version}.tar.bz2"
+
+        if self.kind == "mimalloc" and not self.is_bundled:
+            return f"https://github.com/microsoft/mimalloc/archive/refs/tags/v{self.version}.tar.gz"
+
+        return ""
+
+    @property
+    def version(self):
+        if self.kind and not self.is_bundled:
+            return PPG.config.get_value("%s-version" % self.kind) or ALLOCATORS[self.kind]
+
+    def linker_flags(self):
+        """Linker flags pulling the whole static allocator into python, so that it overrides malloc() & co"""
+        if self.url:
+            name = "jemalloc_pic" if self.kind == "jemalloc" else self.kind
+            yield f"-Wl,--whole-archive {self.deps_lib}/lib{name}.a -Wl,--no-whole-archive"
+            yield "-lpthread"
+            if self.kind == "jemalloc":
+                yield "-ldl"
+
+    def _do_linux_compile(self):
+        if self.kind == "jemalloc":
+            self.run_configure("./configure", "--disable-cxx", "--disable-doc", "--disable-initial-exec-tls")
+            self.run_make("build_lib_static")
+            self.run_make("install_lib_static", "install_include")
+            return
+
+        self._do_run(
+            "cmake",
+            "-S.",
+            "-Bout",
+            f"-DCMAKE_INSTALL_PREFIX={self.deps}",
+            "-DCMAKE_INSTALL_LIBDIR=lib",
+            "-DCMAKE_BUILD_TYPE=Release",
+            "-DMI_BUILD_OBJECT=OFF",
+            "-DMI_BUILD_SHARED=OFF",
+            "-DMI_BUILD_TESTS=OFF",
+            "-DMI_INSTALL_TOPLEVEL=ON",
+        )
+        self._do_run("cmake", "--build", "out")
+        self._do_run("cmake", "--install", "out")
+
 
 class Bdb(ModuleBuilder):
     """
@@ -53,7 +163,8 @@ class Bzip2(ModuleBuilder):
         return self.cfg_version("1.0.8")
 
     def _do_linux_compile(self):
-        self.run_make("install", f"PREFIX={self.deps}", "CFLAGS=-fPIC -O2 -g -D_FILE_OFFSET_BITS=64")
+        cflags = runez.joined("-fPIC -O2 -g -D_FILE_OFFSET_BITS=64", self.setup.cpu_level and self.setup.cpu_level.cflags)
+        self.run_make("install", f"PREFIX={self.deps}", f"CFLAGS={cflags}")
 
 
 class Gdbm(ModuleBuilder):
@@ -0,0 +1,143 @@
+"""
+On-disk cache of .so parse results, allows to not re-read unchanged files when inspecting the same installations repeatedly.
+
+Entries are keyed by file identity (path, inode, size, mtime), by portable-python version, and by `CACHE_FORMAT`.
+Only what depends on the file itself is cached: dependencies are resolved again on each run
+(they depend on other files: $ORIGIN, rpath and default folders, LD_LIBRARY_PATH, /etc/ld.so.cache).
+
+The db may be used by several processes at once (see `inspect_installations()`): a busy timeout and WAL journal are used,
+and sqlite errors are never fatal (cache simply isn't used or updated in that case).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+
+import runez
+
+LOG = logging.getLogger(__name__)
+SCHEMA = "CREATE TABLE IF NOT EXISTS listing (path TEXT PRIMARY KEY, identity TEXT, fingerprint TEXT, content TEXT)"
+BUSY_TIMEOUT = 30  # Seconds to wait for a concurrent writer to release its lock
+CACHE_FORMAT = 1  # Bump whenever what `SoInfo.parsed_file()` returns changes (ELF/Mach-O parsing, or shape of cached content)
+
+
+class InspectionCache:
+    """Parsed files as returned by `SoInfo.parsed_file()`, persisted in a sqlite db"""
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to sqlite db file to use (created if needed)
+        """
+        self.path = runez.to_path(path)
+        self.fingerprint = cache_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        runez.ensure_folder(self.path.parent, logger=None)
+        try:
+            self._db = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(SCHEMA)
+
+        except sqlite3.Error as e:
+            LOG.warning("Can't use inspection cache %s: %s", runez.short(self.path), e)
+            self._db = None
+
+    def __repr__(self):
+        return "%s (%s hits, %s misses)" % (runez.short(self.path), self.hits, self.misses)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._db is not None:
+            try:
+                self._db.commit()
+
+            except sqlite3.Error as e:
+                LOG.warning("Can't update inspection cache %s: %s", runez.short(self.path), e)
+
+            self._db.close()
+            self._db = None
+            LOG.debug("Inspection cache: %s", self)
+
+    def get(self, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path
+            Path to .so file
+
+        Returns
+        -------
+        (str | None, object) | None
+            Cached parse result, if 'path' was already inspected (and did not change since)
+        """
+        row = self._execute("SELECT identity, fingerprint, content FROM listing WHERE path = ?", os.path.abspath(path))
+        row = row and row.fetchone()
+        if row and row[0] == file_identity(path) and row[1] == self.fingerprint:
+            self.hits += 1
+            return tuple(json.loads(row[2]))
+
+        self.misses += 1
+
+    def put(self, path, listing):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path
+            Path to .so file
+        listing : (str | None, object)
+            Result of `SoInfo.parsed_file()` for 'path'
+        """
+        identity = file_identity(path)
+        if identity and listing[0]:
+            self._execute(
+                "INSERT OR REPLACE INTO listing VALUES (?, ?, ?, ?)", os.path.abspath(path), identity, self.fingerprint, json.dumps(listing)
+            )
+
+    def _execute(self, sql, *args):
+        if self._db is not None:
+            try:
+                return self._db.execute(sql, args)
+
+            except sqlite3.Error as e:
+                LOG.warning("Can't use inspection cache %s: %s", runez.short(self.path), e)
+
+
+def cache_fingerprint():
+    """Fingerprint of everything (other than the inspected file itself) that can change a parse result"""
+    return "%s:%s" % (runez.get_version(__package__), CACHE_FORMAT)
+
+
+def default_cache_path():
+    """Path to default inspection cache (in user's cache folder)"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "portable-python", "inspect.sqlite")
+
+
+def file_identity(path):
+    """
+    Parameters
+    ----------
+    path : pathlib.Path | str
+        Path to file
+
+    Returns
+    -------
+    str | None
+        inode, size and modification time of 'path' (if it exists)
+    """
+    try:
+        st = os.stat(path)
+
+    except OSError:
+        return None
+
+    return "%s:%s:%s" % (st.st_ino, st.st_size, st.st_mtime_ns)
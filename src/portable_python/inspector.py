@@ -1,5 +1,8 @@
 import collections
+import concurrent.futures
+import contextlib
 import enum
+import glob
 import json
 import logging
 import os
@@ -8,11 +11,19 @@ import re
 import runez
 from runez.render import PrettyTable
 
+from portable_python.cpu_level import installation_problem
+from portable_python.elf import ElfFile, is_elf_file
+from portable_python.inspect_cache import InspectionCache
+from portable_python.ldso import LdSoResolver
+from portable_python.macho import is_macho_file, MachOFile
 from portable_python.tracking import Trackable, Tracker
+from portable_python.tree_index import TreeIndex
 from portable_python.versions import PPG
 
 LOG = logging.getLogger(__name__)
 RX_DYNLIB = re.compile(r"^.*\.(so(\.[0-9.]+)?|dylib)$")
+DEEP_SCAN_PRUNED = {"__pycache__", "include", "man"}  # Folders that can't contain native files, not walked in deep scan mode
+DEEP_SCAN_SKIPPED = {".c", ".h", ".json", ".md", ".pth", ".py", ".pyc", ".pyi", ".rst", ".txt", ".typed"}
 
 
 class LibType(enum.Enum):
@@ -54,7 +65,7 @@ class TempChmod:
 class LibAutoCorrect:
     """Automatically correct all absolute paths in exes/dynamic libs"""
 
-    def __init__(self, prefix, install_folder, ppp_marker=None):
+    def __init__(self, prefix, install_folder, ppp_marker=None, index=None):
         """
         Parameters
         ----------
@@ -64,30 +75,32 @@ class LibAutoCorrect:
             Installation folder to scan (all paths will be relative to this)
         ppp_marker : str | None
             Path to ppp-marker, if any
+        index : portable_python.tree_index.TreeIndex | None
+            Index of 'install_folder', if available
         """
         self.prefix = prefix
         self.install_folder = install_folder
         self.ppp_marker = ppp_marker
+        self.index = index
         self._file_corrector = getattr(self, "_auto_correct_%s" % PPG.target.platform)
 
     def run(self):
-        self._scan(self.install_folder)
+        if self.index is None:
+            self.index = TreeIndex(self.install_folder)
 
-    def _scan(self, folder):
-        for path in sorted(runez.ls_dir(folder)):
-            if not path.is_symlink():
-                if path.is_dir():
-                    self._scan(path)
-
-                elif is_dyn_lib(path) or runez.is_executable(path):
-                    self._file_corrector(path)
+        for entry in list(self.index.walk()):
+            if entry.is_file and (is_dyn_lib(entry.path) or entry.is_executable):
+                self._file_corrector(entry.path)
+                self.index.update(entry.path)
 
     def _auto_correct_linux(self, path):
         """
         On linux, we change the /<prefix> rpath to be relative via $ORIGIN
+        rpath is rewritten in place when it fits (see '-rpath' in `Cpython.xenv_LDFLAGS_NODIST()`), 'patchelf' is used otherwise
         """
-        r = runez.run("patchelf", "--print-rpath", path, fatal=False, dryrun=False, logger=False)
-        if r.output and self.prefix in r.output:
+        elf = ElfFile.from_path(path)
+        current_rpath = elf and elf.effective_rpath
+        if current_rpath and self.prefix in current_rpath:
             with TempChmod(path, chmod=0o755):
                 relative_location = path.relative_to(self.install_folder).parent
                 new_origin = os.path.relpath("lib", relative_location)  # Allows libpython.so to be found relative to this exe or .so
@@ -101,7 +114,13 @@ class LibAutoCorrect:
                     rpath.append("$ORIGIN/../lib")
 
                 rpath = runez.joined(rpath, delimiter=":")
-                runez.run("patchelf", "--set-rpath", rpath, path)
+                if not elf.can_set_rpath(rpath):
+                    # .dynstr has to grow, let 'patchelf' take care of that
+                    runez.run("patchelf", "--set-rpath", rpath, path)
+
+                elif not runez.log.hdry(f"set rpath {rpath} in {runez.short(path)}"):
+                    elf.set_rpath(rpath)
+                    LOG.info("Set rpath %s in %s", rpath, runez.short(path))
 
     def _auto_correct_macos(self, path):
         """
@@ -112,16 +131,16 @@ class LibAutoCorrect:
 
         Note that this is not necessary thanks to the '-Wl,-install_name,@executable_path/..' patch
         It is here just as fallback (double-checks that all exes/libs are indeed relative/portable)
+        Load commands are read in-process (no need to run 'otool -L' on each file)
         """
         prefixed_folder = path.relative_to(self.install_folder)
         prefixed_folder = runez.to_path(f"{self.prefix}/{prefixed_folder}").parent
         abs_paths = collections.defaultdict(list)
-        r = runez.run("otool", "-L", path, dryrun=False, logger=None)
-        if r.output:
-            for line in r.output.splitlines():
-                line = line.strip()
-                if not line.endswith(":") and line.startswith(self.prefix):
-                    ref_path = line.split()[0]
+        macho = MachOFile.from_path(path)
+        if macho:
+            for ref in macho.dylibs:
+                ref_path = ref.path
+                if ref_path.startswith(self.prefix):
                     relative_path = os.path.relpath(ref_path, prefixed_folder)
                     if relative_path != path.name:
                         # See https://stackoverflow.com/questions/9690362/osx-dll-has-a-reference-to-itself
@@ -132,7 +151,10 @@ class LibAutoCorrect:
             with TempChmod(path, chmod=0o755):
                 for top_level, ref_paths in abs_paths.items():
                     rpath = "@loader_path" if is_dyn_lib(path) else "@executable_path"
-                    runez.run("install_name_tool", "-add_rpath", f"{rpath}/{top_level}", path)
+                    rpath = f"{rpath}/{top_level}"
+                    if rpath not in macho.rpaths:
+                        runez.run("install_name_tool", "-add_rpath", rpath, path)
+
                     for ref_path in ref_paths:
                         relative_to_scanned = os.path.join(prefixed_folder, top_level)
                         relative_path = os.path.relpath(ref_path, relative_to_scanned)
@@ -160,6 +182,9 @@ class ModuleInfo:
         self.note = payload.get("note")
         self.version = payload.get("version")
         self.version_field = payload.get("version_field")
+        self.import_time = payload.get("import_time")
+        self.import_allocated = payload.get("import_allocated")
+        self.import_rss = payload.get("import_rss")
 
     def __repr__(self):
         return runez.short(self.filepath)
@@ -198,7 +223,38 @@ class ModuleInfo:
         else:
             info = runez.short(info)
 
-        yield self.name, runez.joined(version, info)
+        row = [self.name, runez.joined(version, info)]
+        if self.inspector.import_cost:
+            row.extend(self.import_cost_cells())
+
+        yield row
+
+    def import_cost_cells(self):
+        """Import time, bytes allocated and RSS increase during import (when measured)"""
+        if self.import_time is None:
+            return None, None, None
+
+        allocated = self.import_allocated
+        return (
+            "%.1f ms" % (self.import_time * 1000),
+            allocated is not None and runez.represented_bytesize(allocated),
+            self.import_rss is not None and runez.represented_bytesize(self.import_rss),
+        )
+
+    def to_dict(self):
+        info = self.additional_info
+        return {
+            "type": "module",
+            "name": self.name,
+            "version": self.version,
+            "version_field": self.version_field,
+            "path": str(self.filepath) if self.filepath else None,
+            "note": self.note,
+            "import_time": self.import_time,
+            "import_allocated": self.import_allocated,
+            "import_rss": self.import_rss,
+            "so": info.to_dict() if isinstance(info, SoInfo) else None,
+        }
 
 
 class CLibInfo(Trackable):
@@ -226,6 +282,15 @@ class CLibInfo(Trackable):
     def __repr__(self):
         return self.short_name
 
+    def to_dict(self):
+        return {
+            "type": "lib",
+            "basename": self.basename,
+            "category": self.tracked_category.name,
+            "path": self.relative_path,
+            "version": self.version,
+        }
+
     @runez.cached_property
     def short_name(self):
         if self.tracked_category is LibType.other:
@@ -250,19 +315,29 @@ class CLibInfo(Trackable):
 
 
 class SoInfo(Trackable):
-    def __init__(self, inspector: "PythonInspector", path):
+    def __init__(self, inspector: "PythonInspector", path, listing=None):
+        """
+        Parameters
+        ----------
+        inspector : PythonInspector
+            Associated inspector
+        path : pathlib.Path | str
+            Path to .so file to inspect
+        listing : (str | None, object) | None
+            Result of `SoInfo.dot_so_listing()`, if it was already obtained (for example, in a worker thread)
+        """
         self.inspector = inspector
         self.path = runez.to_path(path)
         self.relative_path = inspector.relative_path(self.path)
         self.extension = self.path.name.rpartition(".")[2]
         self.lib_tracker = Tracker(LibType, ".so")
-        program, output = self._dot_so_listing(self.path)
+        program, output = listing or self.dot_so_listing(self.path)
         self.is_failed = "_failed" in self.path.name
         self.short_name = "%s*" % self.path.name.partition(".")[0]
         if self.is_failed:
             self.short_name += "_failed"  # pragma: no cover
 
-        if program and output:
+        if program and output is not None:
             func = getattr(self, "parse_%s" % program)
             func(output)
 
@@ -279,20 +354,79 @@ class SoInfo(Trackable):
         yield from self.lib_tracker.items
 
     @staticmethod
-    def _dot_so_listing(path):
-        for cmd in ("otool -L", "ldd"):
-            cmd = runez.flattened(cmd, split=" ")
-            program = cmd[0]
-            if runez.which(program):
-                r = runez.run(*cmd, path, fatal=False, logger=None)
-                if not r.succeeded:
-                    logging.warning("%s exited with code %s for %s: %s", program, r.exit_code, path, r.full_output)
-                    return program, None
-
-                return program, r.output
+    def dot_so_listing(path, resolver=None):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to .so file to inspect
+        resolver : LdSoResolver | None
+            Resolver to use for ELF files (a shared one avoids re-parsing the same system libs over and over)
+
+        Returns
+        -------
+        (str | None, object)
+            Name of `parse_*` function to use, and what to pass to it
+        """
+        return SoInfo.resolved_listing(path, SoInfo.parsed_file(path), resolver=resolver)
+
+    @staticmethod
+    def parsed_file(path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to .so file to inspect
+
+        Returns
+        -------
+        (str | None, object)
+            What could be parsed from 'path' itself: Mach-O listing, or ELF dynamic info (safe to cache, depends on 'path' only)
+        """
+        macho = MachOFile.from_path(path)
+        if macho:
+            return "macho", [(ref.path, ref.current_version) for ref in macho.dylibs]
 
+        elf = ElfFile.from_path(path)
+        if elf:
+            return "elf", elf.dynamic_info
+
+        LOG.warning("Can't inspect %s: not an ELF or Mach-O file", path)
         return None, None
 
+    @staticmethod
+    def resolved_listing(path, parsed, resolver=None):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to .so file to inspect
+        parsed : (str | None, object)
+            Result of `SoInfo.parsed_file()` for 'path'
+        resolver : LdSoResolver | None
+            Resolver to use for ELF files
+
+        Returns
+        -------
+        (str | None, object)
+            Same as `SoInfo.dot_so_listing()`, ELF dependencies are resolved as of now (they depend on other files)
+        """
+        program, output = parsed
+        if program == "elf":
+            return program, (resolver or LdSoResolver()).resolved(ElfFile(path, dynamic_info=output))
+
+        return program, output
+
+    def to_dict(self):
+        return {
+            "type": "so",
+            "path": self.relative_path,
+            "failed": self.is_failed,
+            "problematic": self.is_problematic,
+            "size": self.size,
+            "libs": [x.to_dict() for x in self.lib_tracker.items],
+        }
+
     @property
     def is_problematic(self):
         return self.is_failed or bool(self.lib_tracker.category[LibType.missing] or self.lib_tracker.category[LibType.other])
@@ -301,37 +435,13 @@ class SoInfo(Trackable):
     def size(self):
         return self.path.stat().st_size if self.path.exists() else 0
 
-    def parse_otool(self, output):
-        first_line = None
-        for line in output.splitlines():
-            line = line.strip()
-            if line:
-                if first_line is None:
-                    first_line = line.strip(":")
-
-                else:
-                    m = re.match(r"^(\S+).+current version ([0-9.]+).*$", line.strip())
-                    if m:
-                        path = m.group(1)
-                        # See https://stackoverflow.com/questions/9690362/osx-dll-has-a-reference-to-itself
-                        if not first_line.endswith(path):
-                            version = m.group(2)
-                            self.add_ref(path, version=version)
-
-    def parse_ldd(self, output):
-        for line in output.splitlines():
-            line = line.strip()
-            if line and line != "statically linked":
-                if "=>" in line:
-                    basename, _, path = line.partition("=")
-                    basename = basename.strip()
-                    path = path[1:].partition("(")[0].strip()
-
-                else:
-                    path, _, _ = line.partition(" ")
-                    basename = None
+    def parse_macho(self, dylibs):
+        for path, version in dylibs:
+            self.add_ref(path, version=version)
 
-                self.add_ref(path.strip(), basename=basename)
+    def parse_elf(self, dependencies):
+        for basename, path in dependencies:
+            self.add_ref(path or "not found", basename=basename)
 
     def add_ref(self, path, version=None, basename=None):
         info = CLibInfo(self.inspector, path, version, basename)
@@ -371,7 +481,17 @@ def is_dyn_lib(path):
     return RX_DYNLIB.match(path.name)
 
 
-def find_libs(folder):
+def find_libs(folder, index=None):
+    if index is not None and folder in index:
+        for entry in index.children(folder):
+            if is_dyn_lib(entry.path) or entry.path.name.endswith(".a"):
+                yield entry.path
+
+            elif entry.is_dir and entry.path.name.startswith(("config-", "lib-dynload", "python")):
+                yield from find_libs(entry.path, index=index)
+
+        return
+
     for path in runez.ls_dir(folder):
         if is_dyn_lib(path) or path.name.endswith(".a"):
             yield path
@@ -380,6 +500,180 @@ def find_libs(folder):
             yield from find_libs(path)
 
 
+def find_native_files(folder):
+    """
+    Yield all ELF/Mach-O files under 'folder' (exes, dynamic libs, python extensions, vendored libs in site-packages)
+    Walked via `os.scandir()`, in alphabetical order, without following symlinks
+    Only files named like a dynamic lib, or with an executable bit, get their magic bytes checked
+
+    Parameters
+    ----------
+    folder : pathlib.Path | str
+        Folder to scan
+    """
+    folders = [str(folder)]
+    while folders:
+        try:
+            with os.scandir(folders.pop()) as it:
+                entries = sorted(it, key=lambda x: x.name)
+
+        except OSError:
+            continue
+
+        subfolders = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in DEEP_SCAN_PRUNED and not entry.name.endswith((".dist-info", ".egg-info")):
+                    subfolders.append(entry.path)
+
+            elif entry.is_file(follow_symlinks=False) and _is_native_candidate(entry):
+                if is_elf_file(entry.path) or is_macho_file(entry.path):
+                    yield runez.to_path(entry.path)
+
+        folders.extend(reversed(subfolders))
+
+
+def _is_native_candidate(entry):
+    if RX_DYNLIB.match(entry.name):
+        return True
+
+    if os.path.splitext(entry.name)[1] in DEEP_SCAN_SKIPPED:
+        return False
+
+    try:
+        return bool(entry.stat(follow_symlinks=False).st_mode & 0o111)
+
+    except OSError:
+        return False
+
+
+def scan_jobs(jobs=None):
+    """
+    Parameters
+    ----------
+    jobs : int | None
+        Explicitly requested number of parallel workers, if any
+
+    Returns
+    -------
+    int
+        Max number of parallel workers to use when scanning .so files (configurable via 'inspect-jobs')
+    """
+    if not jobs:
+        jobs = PPG.config.get_value("inspect-jobs") or os.cpu_count() or 1
+
+    return max(1, int(jobs))
+
+
+def inspection_targets(specs):
+    """
+    Parameters
+    ----------
+    specs : list[str]
+        Python installations, globs (ie: /apps/python*), or folders containing python installations
+
+    Returns
+    -------
+    list[str]
+        Python installations to inspect (in order given, without duplicates)
+    """
+    targets = []
+    for spec in specs:
+        if spec == "invoker":
+            targets.append(spec)
+            continue
+
+        spec = runez.resolved_path(spec)
+        for path in sorted(glob.glob(spec)) if any(c in spec for c in "*?[") else [spec]:
+            if os.path.isdir(path) and not _is_python_installation(path):
+                subfolders = [str(x) for x in sorted(runez.ls_dir(path)) if _is_python_installation(x)]
+                if subfolders:
+                    targets.extend(subfolders)
+                    continue
+
+            targets.append(path)
+
+    return list(dict.fromkeys(targets))
+
+
+def inspection_problem(spec, modules=None, portable=True, skip_so=False, cache=None, deep=False, config=None):
+    """
+    Inspect one python installation, this is the unit of work when inspecting several installations in parallel
+
+    Parameters
+    ----------
+    spec : str
+        Python installation to inspect
+    modules : str | None
+        Modules to inspect
+    portable : bool
+        If True, installation is expected to be portable
+    skip_so : bool
+        If True, don't check all .so files
+    cache : str | None
+        Path to inspection cache to use, if any
+    deep : bool
+        If True, scan all ELF/Mach-O files in installation (including site-packages)
+    config : (list, str) | None
+        Config paths and target to use (worker processes don't necessarily inherit global config)
+
+    Returns
+    -------
+    (str, str | None)
+        Represented python, and problem found (if any)
+    """
+    if config:
+        PPG.grab_config(config[0], target=config[1])
+
+    problem = installation_problem(PPG.find_python(spec))
+    if problem:
+        return spec, problem
+
+    inspector = PythonInspector(spec, modules=modules, jobs=1, cache=cache, deep=deep)
+    problem = inspector.python.problem
+    if not problem and not skip_so and (not modules or modules == "all"):
+        problem = inspector.full_so_report.get_problem(portable=portable)
+
+    return str(inspector.python), problem
+
+
+def inspect_installations(specs, jobs=None, **kwargs):
+    """
+    Parameters
+    ----------
+    specs : list[str]
+        Python installations to inspect, in parallel (one process per installation)
+    jobs : int | None
+        Max number of worker processes to use (default: from config, or cpu count)
+    **kwargs
+        Passed through to `inspection_problem()`
+
+    Returns
+    -------
+    list[(str, str | None, str | None)]
+        For each installation, in order: spec, represented python (if it could be inspected), problem (if any)
+    """
+    kwargs.setdefault("config", (PPG.config.paths, str(PPG.target)))
+    result = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(scan_jobs(jobs), len(specs))) as executor:
+        futures = [executor.submit(inspection_problem, spec, **kwargs) for spec in specs]
+        for spec, future in zip(specs, futures):
+            try:
+                python, problem = future.result()
+
+            # One failed installation (unreadable files, unexpected output, crashed worker) should not prevent reporting on the others
+            except (concurrent.futures.process.BrokenProcessPool, OSError, ValueError) as e:
+                python, problem = None, "inspection failed: %s" % e
+
+            result.append((spec, python, problem))
+
+    return result
+
+
+def _is_python_installation(folder):
+    return bool(glob.glob(os.path.join(folder, "bin", "python*")))
+
+
 def get_lib_type(install_folder, path, basename):
     if basename.startswith("libpython") and path.startswith(install_folder):
         return LibType.libpython_so
@@ -400,20 +694,45 @@ class PythonInspector:
     default = "_bz2,_ctypes,_curses,_decimal,_dbm,_gdbm,_lzma,_tkinter,_sqlite3,_ssl,_uuid,pip,readline,pyexpat,setuptools,zlib"
     additional = "_asyncio,_functools,_tracemalloc,dbm.gnu,ensurepip,ossaudiodev,spwd,sys,tkinter,venv,wheel"
 
-    def __init__(self, spec, modules=None):
+    def __init__(self, spec, modules=None, jobs=None, cache=None, import_cost=False, deep=False, index=None):
+        """
+        Parameters
+        ----------
+        spec : str | pathlib.Path
+            Python installation to inspect
+        modules : str | None
+            Modules to inspect (default: `PythonInspector.default`)
+        jobs : int | None
+            Max number of parallel workers to use when scanning .so files (default: from config, or cpu count)
+        cache : pathlib.Path | str | None
+            Path to inspection cache to use, if any (see `InspectionCache`)
+        import_cost : bool
+            If True, measure import time and memory of each module (each module imported in a fresh interpreter)
+        deep : bool
+            If True, scan all ELF/Mach-O files in installation (including site-packages), not just the stdlib ones
+        index : portable_python.tree_index.TreeIndex | None
+            Index of installation folder, if available (avoids walking it again)
+        """
         self.spec = spec
+        self.jobs = jobs
+        self.cache = cache
+        self.import_cost = import_cost
+        self.deep = deep
+        self.index = index
         self.modules = self.resolved_names(modules)
         self.module_names = runez.flattened(self.modules, split=",")
         self.python = PPG.find_python(self.spec)
         arg = self.resolved_names(self.modules)
         script = os.path.join(os.path.dirname(__file__), "external/_inspect.py")
-        r = runez.run(self.python.executable, script, arg, fatal=False, logger=print if runez.DRYRUN else logging.debug)
+        cost = "--import-cost" if import_cost else None
+        r = runez.run(self.python.executable, script, arg, cost, fatal=False, logger=print if runez.DRYRUN else logging.debug)
         self.output = r.output if r.succeeded else "exit code: %s\n%s" % (r.exit_code, r.full_output)
         self.payload = None
         if self.output and self.output.startswith("{"):
             self.payload = json.loads(self.output)
 
         self.reported_prefix = self.payload and self.payload.get("prefix")
+        self.allocator = self.payload and self.payload.get("allocator")
         self.srcdir = runez.to_path(self.payload and self.payload.get("srcdir"))
         self.lib_folder = _find_parent_subfolder(self.srcdir, "lib")
         self.install_folder = self.lib_folder and str(self.lib_folder.parent)
@@ -433,9 +752,17 @@ class PythonInspector:
 
         return names
 
+    @runez.cached_property
+    def lazy_so_report(self):
+        """.so files report, scanned only as its `FullSoReport.scanned()` files get consumed"""
+        return FullSoReport(self, jobs=self.jobs, cache=self.cache, deep=self.deep)
+
     @runez.cached_property
     def full_so_report(self):
-        return FullSoReport(self)
+        """.so files report, fully scanned"""
+        so_report = self.lazy_so_report
+        so_report.complete()
+        return so_report
 
     @runez.cached_property
     def module_info(self):
@@ -457,20 +784,54 @@ class PythonInspector:
 
         rel_paths = [getattr(x, "relative_path", x) for x in items]
         full_paths = [runez.to_path(self.install_folder) / x for x in rel_paths]
-        return runez.joined(PPG.config.represented_filesize(*full_paths), rel_paths)
+        return runez.joined(PPG.config.represented_filesize(*full_paths, index=self.index), rel_paths)
+
+    def report_records(self, portable=True, skip_so=False):
+        """
+        Yield the same information as `represented()`, as structured records (dicts), as they get produced
+
+        Parameters
+        ----------
+        portable : bool
+            If True, installation is expected to be portable (determines reported .so problem, if any)
+        skip_so : bool
+            If True, don't report on all .so files
+        """
+        yield {
+            "type": "python",
+            "python": str(self.python),
+            "problem": self.python.problem,
+            "prefix": self.reported_prefix,
+            "allocator": self.allocator,
+        }
+        module_report = self.payload and self.payload.get("report")
+        for name, report in (module_report or {}).items():
+            yield ModuleInfo(self, name, report).to_dict()
+
+        if module_report and not skip_so:
+            yield from self.lazy_so_report.report_records(portable=portable)
 
     def represented(self, verbose=False):
         report = []
         if self.module_info:
-            table = PrettyTable(2)
+            if self.import_cost:
+                table = PrettyTable(["", "", "import time", "allocated", "RSS"], missing="")
+                table.header[2].align = table.header[3].align = table.header[4].align = "right"
+
+            else:
+                table = PrettyTable(2)
+
             table.header[0].align = "right"
             table.add_row("prefix", runez.short(self.reported_prefix, size=120))
+            if self.allocator:
+                table.add_row("allocator", "%s + %s malloc()" % (self.allocator.get("python"), self.allocator.get("malloc")))
+
             for v in self.module_info.values():
                 table.add_rows(*v.report_rows())
 
             table.add_row("libpython*.a", self.libpython_report(self.full_so_report.lib_static))
             table.add_row("libpython*.so", self.libpython_report(self.full_so_report.libpython_so))
-            table.add_row("install size", PPG.config.represented_filesize(self.install_folder))
+            table.add_row("install size", PPG.config.represented_filesize(self.install_folder, index=self.index))
 
             if runez.log.debug:
                 table.add_row("install dir", runez.short(self.install_folder))
@@ -540,31 +901,105 @@ def _find_parent_subfolder(folder, basename):
 
 
 class FullSoReport:
-    def __init__(self, inspector: PythonInspector):
+    def __init__(self, inspector: PythonInspector, jobs=None, cache=None, deep=False):
         self.inspector = inspector
+        self.jobs = scan_jobs(jobs)
         self.size = 0
         self.lib_tracker = Tracker(LibType)
         self.ok = Tracker(LibType, "OK")
         self.problematic = Tracker(LibType, "problematic")
         self.libpython_so = []
         self.lib_static = []
-        for path in find_libs(self.inspector.lib_folder):
+        paths = []
+        for path in find_libs(self.inspector.lib_folder, index=self.inspector.index):
             if path.name.endswith(".a"):  # pragma: no cover
                 self.lib_static.append(self.inspector.relative_path(path))
-                continue
 
-            info = SoInfo(inspector, path)
+            else:
+                paths.append(path)
+
+        if deep and self.inspector.install_folder:
+            seen = set(paths)
+            paths.extend(x for x in find_native_files(self.inspector.install_folder) if x not in seen)
+
+        self._pending = self._scan(paths, cache)  # Nothing is scanned until needed, see `scanned()` and `complete()`
+
+    def scanned(self):
+        """Yield the `SoInfo` of each .so file as soon as it is scanned (in parallel, but yielded in a deterministic order)"""
+        yield from list(self.lib_tracker.items)  # Already scanned
+        yield from self._pending
+
+    def complete(self):
+        """Scan all remaining .so files, if any"""
+        for _ in self._pending:
+            pass
+
+    def _scan(self, paths, cache_path):
+        for path, listing in zip(paths, self._listings(paths, cache_path)):
+            info = SoInfo(self.inspector, path, listing=listing)
             if path.name.startswith("libpython"):  # pragma: no cover (would need to do a full build with libpython.so...)
                 self.libpython_so.append(info)
 
+            is_new = info not in self.lib_tracker  # Same lib can be reached via several paths (symlinks)
             self.lib_tracker.add(info)
             self.size += info.size
             target = self.problematic if info.is_problematic else self.ok
             target.add(info)
+            if is_new:
+                yield info
+
+    def _listings(self, paths, cache_path):
+        # Only what's parsed from each file is cached, resolution depends on other files (rpath folders, ld.so.cache...)
+        with contextlib.ExitStack() as stack:
+            cache = cache_path and stack.enter_context(InspectionCache(cache_path))
+            cached = [cache.get(x) for x in paths] if cache else [None] * len(paths)
+            resolver = LdSoResolver()
+
+            def parsed_listing(path, parsed):
+                parsed = parsed or SoInfo.parsed_file(path)
+                return parsed, SoInfo.resolved_listing(path, parsed, resolver=resolver)
+
+            for path, was_cached, (parsed, listing) in zip(paths, cached, self._in_parallel(parsed_listing, paths, cached)):
+                if cache and was_cached is None:
+                    cache.put(path, parsed)  # From this thread only: sqlite connection can't be shared between threads
+
+                yield listing
+
+    def _in_parallel(self, func, paths, *args):
+        """Yield results of 'func' on each path, in order, as soon as they are available"""
+        if self.jobs < 2 or len(paths) < 2:
+            for x in zip(paths, *args):
+                yield func(*x)
+
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.jobs, len(paths))) as executor:
+            yield from executor.map(func, paths, *args)
 
     def __repr__(self):
         return runez.joined(".so files: %s" % runez.represented_bytesize(self.size), self.problematic, self.ok, delimiter=", ")
 
+    def report_records(self, portable=True):
+        for info in self.scanned():
+            yield info.to_dict()
+
+        for lib_type, libs in self.lib_tracker.category.items():
+            for lib in libs.items:
+                if lib_type is not LibType.base:
+                    record = lib.to_dict()
+                    record["users"] = sorted(x.relative_path for x in self.lib_tracker.users.get(lib, ()))
+                    yield record
+
+        yield {
+            "type": "so-report",
+            "size": self.size,
+            "ok": len(self.ok.items),
+            "problematic": len(self.problematic.items),
+            "lib_static": self.lib_static,
+            "libpython_so": [x.relative_path for x in self.libpython_so],
+            "problem": self.get_problem(portable),
+        }
+
     def get_problem(self, portable) -> str:
         if portable:
             allowed = PPG.config.get_value("allowed-system-libs")
@@ -0,0 +1,220 @@
+"""
+Resolve ELF dependencies the same way glibc's ld.so does, without executing anything (as opposed to 'ldd').
+
+Search order for each DT_NEEDED entry (see 'man ld.so'):
+- DT_RPATH of the object (if it has no DT_RUNPATH), then DT_RPATH of the main object
+- LD_LIBRARY_PATH
+- DT_RUNPATH of the object
+- /etc/ld.so.cache
+- default folders (/lib64, /usr/lib64, /lib, /usr/lib)
+"""
+
+import os
+import struct
+import threading
+
+from portable_python.elf import _c_string, ElfFile
+
+CACHE_MAGIC_NEW = b"glibc-ld.so.cache1.1"
+CACHE_MAGIC_OLD = b"ld.so-1.7.0"
+
+# Program interpreter used when inspecting a lib (libs have no PT_INTERP), per ELF e_machine
+DEFAULT_INTERPRETERS = {
+    (32, 3): "/lib/ld-linux.so.2",
+    (32, 40): "/lib/ld-linux-armhf.so.3",
+    (64, 21): "/lib64/ld64.so.2",
+    (64, 22): "/lib/ld64.so.1",
+    (64, 62): "/lib64/ld-linux-x86-64.so.2",
+    (64, 183): "/lib/ld-linux-aarch64.so.1",
+    (64, 243): "/lib/ld-linux-riscv64-lp64d.so.1",
+}
+
+
+class LdSoCache:
+    """Contents of /etc/ld.so.cache: library name -> candidate paths (in order of preference)"""
+
+    _default = None
+    _lock = threading.Lock()
+
+    def __init__(self, path="/etc/ld.so.cache"):
+        self.path = path
+        self.entries = {}  # type: dict[str, list[str]]
+        try:
+            with open(path, "rb") as fh:
+                self._parse(fh.read())
+
+        except (OSError, struct.error):
+            self.entries = {}
+
+    def __repr__(self):
+        return "%s (%s entries)" % (self.path, len(self.entries))
+
+    @classmethod
+    def default(cls):
+        """Cache of the current system, parsed once"""
+        with cls._lock:
+            if cls._default is None:
+                cls._default = cls()
+
+            return cls._default
+
+    def candidates(self, name):
+        return self.entries.get(name, [])
+
+    def _parse(self, data):
+        offset = 0
+        if data.startswith(CACHE_MAGIC_OLD):
+            # Old format may be followed by new format, old format entries are: flags, key, value (3 ints)
+            nlibs = struct.unpack_from("=I", data, 12)[0]
+            offset = 16 + nlibs * 12
+            offset += -offset % 8
+
+        if data[offset : offset + len(CACHE_MAGIC_NEW)] != CACHE_MAGIC_NEW:
+            return
+
+        nlibs = struct.unpack_from("=I", data, offset + 20)[0]
+        entry = struct.Struct("=iIIIQ")
+        position = offset + 48
+        for _ in range(nlibs):
+            _, key, value, _, _ = entry.unpack_from(data, position)
+            position += entry.size
+            name = _c_string(data, offset + key)
+            self.entries.setdefault(name, []).append(_c_string(data, offset + value))
+
+
+class LdSoResolver:
+    """Resolves the full set of shared libs an ELF file would load, similar to 'ldd' (but without running the loader)"""
+
+    def __init__(self, ld_library_path=None, cache=None):
+        """
+        Parameters
+        ----------
+        ld_library_path : str | None
+            LD_LIBRARY_PATH to use (default: from current environment)
+        cache : LdSoCache | None
+            ld.so.cache to use (default: the one from current system)
+        """
+        if ld_library_path is None:
+            ld_library_path = os.environ.get("LD_LIBRARY_PATH", "")
+
+        self.ld_library_path = [x for x in ld_library_path.split(":") if x]
+        self.cache = cache or LdSoCache.default()
+        self._elf_files = {}
+
+    def elf_file(self, path):
+        """Memoized `ElfFile` for 'path' (the same system libs get looked at over and over)"""
+        path = os.path.realpath(path)
+        if path not in self._elf_files:
+            self._elf_files[path] = ElfFile.from_path(path)
+
+        return self._elf_files[path]
+
+    def resolved(self, main):
+        """
+        Parameters
+        ----------
+        main : ElfFile
+            ELF file to resolve dependencies of
+
+        Returns
+        -------
+        list[(str | None, str | None)]
+            In load order, same as 'ldd': (name, resolved path) for each needed lib (path None if not found),
+            and (None, path) for the program interpreter
+        """
+        interpreter = main.interpreter or DEFAULT_INTERPRETERS.get((main.elf_class, main.machine))
+        interpreter_name = interpreter and os.path.basename(interpreter)
+        result = []
+        loaded = set()
+        uses_interpreter = bool(main.interpreter)
+        queue = [main]
+        while queue:
+            obj = queue.pop(0)
+            for name in obj.needed:
+                if name in loaded:
+                    continue
+
+                loaded.add(name)
+                if name == interpreter_name:
+                    uses_interpreter = True
+                    continue
+
+                path = self.find(name, obj, main)
+                result.append((name, path))
+                dependency = path and self.elf_file(path)
+                if dependency:
+                    queue.append(dependency)
+
+        if uses_interpreter and interpreter:
+            result.append((None, interpreter))
+
+        return result
+
+    def find(self, name, obj, main):
+        """
+        Parameters
+        ----------
+        name : str
+            DT_NEEDED entry to find
+        obj : ElfFile
+            Object that needs 'name'
+        main : ElfFile
+            Main object (the exe or lib being inspected)
+
+        Returns
+        -------
+        str | None
+            Path to where loader would find 'name', if it can be found
+        """
+        if "/" in name:
+            path = self._expanded(name, obj)
+            return path if self._is_compatible(path, main) else None
+
+        folders = []
+        if obj.runpath is None:
+            folders.extend(self._rpath_folders(obj.rpath, obj))
+            if obj is not main and main.runpath is None:
+                folders.extend(self._rpath_folders(main.rpath, main))
+
+        folders.extend(self.ld_library_path)
+        folders.extend(self._rpath_folders(obj.runpath, obj))
+        for folder in folders:
+            path = os.path.join(folder, name)
+            if self._is_compatible(path, main):
+                return path
+
+        for path in self.cache.candidates(name):
+            if self._is_compatible(path, main):
+                return path
+
+        for folder in self._default_folders(main):
+            path = os.path.join(folder, name)
+            if self._is_compatible(path, main):
+                return path
+
+    def _is_compatible(self, path, main):
+        if os.path.isfile(path):
+            candidate = self.elf_file(path)
+            return bool(candidate) and candidate.elf_class == main.elf_class and candidate.machine == main.machine
+
+    def _rpath_folders(self, rpath, obj):
+        if rpath:
+            for folder in rpath.split(":"):
+                if folder:
+                    yield self._expanded(folder, obj, lib="lib64" if obj.elf_class == 64 else "lib")
+
+    @staticmethod
+    def _expanded(path, obj, lib="lib"):
+        if "$" in path:
+            origin = os.path.dirname(os.path.realpath(obj.path))
+            for name, value in (("ORIGIN", origin), ("LIB", lib)):
+                path = path.replace("${%s}" % name, value).replace("$%s" % name, value)
+
+        return path
+
+    @staticmethod
+    def _default_folders(main):
+        if main.elf_class == 64:
+            return "/lib64", "/usr/lib64", "/lib", "/usr/lib"
+
+        return "/lib", "/usr/lib"
@@ -0,0 +1,192 @@
+"""
+On-disk cache of remote listings used to discover available versions (python.org ftp index, github tags).
+
+Listings are re-used as-is for 'versions-cache-ttl' (default: 1 hour), then refreshed via a conditional request
+(ETag / If-Modified-Since), so that an unchanged listing costs one short round-trip.
+In offline mode (--offline, or PP_OFFLINE env var), last known good listings are used, no matter their age.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import time
+
+import runez
+
+LOG = logging.getLogger(__name__)
+DEFAULT_TTL = "1h"
+MAX_CONCURRENT_CHECKS = 8
+
+
+class ListingCache:
+    """Remote listings, and remote file existence checks, persisted as one small json file per url"""
+
+    def __init__(self, folder, ttl=None, offline=False, client=None):
+        """
+        Parameters
+        ----------
+        folder : pathlib.Path | str
+            Folder where to store cached listings
+        ttl : int | float | None
+            Number of seconds during which cached listings are used without checking for updates (default: DEFAULT_TTL)
+        offline : bool
+            If True, never query remote urls, use cached listings only
+        client : runez.http.RestClient | None
+            Client to use (default: created on first remote query, cached listings don't need to import 'requests')
+        """
+        self.folder = runez.to_path(folder)
+        self.ttl = runez.to_seconds(DEFAULT_TTL) if ttl is None else ttl
+        self.offline = offline
+        self._client = client
+
+    def __repr__(self):
+        return "%s%s" % (runez.short(self.folder), " (offline)" if self.offline else "")
+
+    @property
+    def client(self):
+        """Client used to query remote urls"""
+        if self._client is None:
+            from runez.http import RestClient
+
+            self._client = RestClient()
+
+        return self._client
+
+    @classmethod
+    def from_config(cls, config, offline=False):
+        """
+        Parameters
+        ----------
+        config : portable_python.config.Config
+            Config to use ('versions-cache' and 'versions-cache-ttl')
+        offline : bool
+            If True, never query remote urls, use cached listings only
+
+        Returns
+        -------
+        ListingCache
+            Cache to use
+        """
+        folder = config.resolved_path("versions-cache") or default_cache_folder()
+        ttl = config.get_value("versions-cache-ttl")
+        if ttl is not None:
+            configured = ttl
+            ttl = runez.to_seconds(ttl)
+            runez.abort_if(ttl is None, "Invalid 'versions-cache-ttl': %s" % runez.red(configured))
+
+        return cls(folder, ttl=ttl, offline=offline)
+
+    def get_text(self, url):
+        """
+        Parameters
+        ----------
+        url : str
+            Url of listing to get
+
+        Returns
+        -------
+        str | None
+            Contents of listing, from cache if fresh enough (or offline)
+        """
+        entry = self._load("GET", url)
+        if entry and (self.offline or time.time() - entry["fetched"] < self.ttl):
+            LOG.debug("Using cached listing of %s", url)
+            return entry["text"]
+
+        runez.abort_if(self.offline, "No cached listing of %s, can't run offline" % url)
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self.client.get_response(url, headers=headers, logger=LOG.debug)
+
+        except OSError as e:  # Network issues (`requests.RequestException` is an OSError): fall back to last good listing, if any
+            response = e
+
+        if entry and getattr(response, "status_code", None) == 304:
+            entry["fetched"] = time.time()
+            self._save("GET", url, entry)
+            return entry["text"]
+
+        if getattr(response, "ok", False):
+            headers = response.raw_response.headers
+            entry = {"url": url, "fetched": time.time(), "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+            entry["text"] = response.text
+            self._save("GET", url, entry)
+            return entry["text"]
+
+        if entry:
+            age = runez.represented_duration(time.time() - entry["fetched"])
+            LOG.warning("Can't refresh listing of %s (%s), using listing cached %s ago", url, response, age)
+            return entry["text"]
+
+        return None
+
+    def get_json(self, url):
+        """Deserialized json listing from 'url', see `get_text()`"""
+        text = self.get_text(url)
+        return text and json.loads(text)
+
+    def urls_exist(self, urls):
+        """
+        Parameters
+        ----------
+        urls : list[str]
+            Urls to check, all pending checks are done concurrently
+
+        Returns
+        -------
+        dict[str, bool]
+            Whether each url exists (positive results are cached for good, negative ones for 'ttl' seconds)
+        """
+        result = {}
+        pending = []
+        for url in urls:
+            entry = self._load("HEAD", url)
+            if entry and (entry["exists"] or self.offline or time.time() - entry["fetched"] < self.ttl):
+                result[url] = entry["exists"]
+
+            elif self.offline:
+                result[url] = False
+
+            else:
+                pending.append(url)
+
+        if pending:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_CHECKS, len(pending))) as executor:
+                for url, exists in zip(pending, executor.map(self.client.url_exists, pending)):
+                    result[url] = exists
+                    self._save("HEAD", url, {"url": url, "fetched": time.time(), "exists": exists})
+
+        return result
+
+    def _path(self, method, url):
+        key = hashlib.sha256(f"{method} {url}".encode()).hexdigest()[:20]
+        return self.folder / f"{key}.json"
+
+    def _load(self, method, url):
+        path = self._path(method, url)
+        try:
+            entry = json.loads("\n".join(runez.readlines(path)))
+            if entry.get("url") == url:
+                return entry
+
+        except (OSError, ValueError):
+            pass
+
+        return None
+
+    def _save(self, method, url, entry):
+        runez.write(self._path(method, url), json.dumps(entry), logger=None, dryrun=False)
+
+
+def default_cache_folder():
+    """Path to default versions cache (in user's cache folder)"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "portable-python", "versions")
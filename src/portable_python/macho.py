@@ -0,0 +1,183 @@
+"""
+Minimal in-process Mach-O reader, focused on load commands referring to other dylibs (LC_LOAD_DYLIB, LC_RPATH, LC_ID_DYLIB).
+
+Works on any platform (no need for 'otool'), handles fat/universal binaries.
+"""
+
+import mmap
+import struct
+
+FAT_MAGIC = 0xCAFEBABE
+FAT_MAGIC_64 = 0xCAFEBABF
+MH_MAGIC = 0xFEEDFACE
+MH_MAGIC_64 = 0xFEEDFACF
+MH_CIGAM = 0xCEFAEDFE
+MH_CIGAM_64 = 0xCFFAEDFE
+
+LC_REQ_DYLD = 0x80000000
+LC_LOAD_DYLIB = 0xC
+LC_ID_DYLIB = 0xD
+LC_LOAD_WEAK_DYLIB = 0x18 | LC_REQ_DYLD
+LC_RPATH = 0x1C | LC_REQ_DYLD
+LC_REEXPORT_DYLIB = 0x1F | LC_REQ_DYLD
+LC_LAZY_LOAD_DYLIB = 0x20
+LC_LOAD_UPWARD_DYLIB = 0x23 | LC_REQ_DYLD
+
+LOAD_COMMANDS = (LC_LOAD_DYLIB, LC_LOAD_WEAK_DYLIB, LC_REEXPORT_DYLIB, LC_LAZY_LOAD_DYLIB, LC_LOAD_UPWARD_DYLIB)
+MAX_FAT_ARCHS = 32  # 0xCAFEBABE is also the magic of java .class files, which have a much higher number in that spot
+
+
+class DylibRef:
+    """Reference to a dylib, as found in a LC_*_DYLIB load command"""
+
+    def __init__(self, path, current_version, compatibility_version):
+        self.path = path
+        self.current_version = _represented_version(current_version)
+        self.compatibility_version = _represented_version(compatibility_version)
+
+    def __repr__(self):
+        return self.path
+
+
+class MachOSlice:
+    """One architecture-specific Mach-O image (there are several in fat/universal binaries)"""
+
+    def __init__(self, data, offset):
+        magic = struct.unpack_from("<I", data, offset)[0]
+        endian = "<" if magic in (MH_MAGIC, MH_MAGIC_64) else ">"
+        is_64 = magic in (MH_MAGIC_64, MH_CIGAM_64)
+        self.cputype, self.cpusubtype, self.filetype, ncmds, _ = struct.unpack_from(endian + "iiIII", data, offset + 4)
+        self.install_name = None
+        self.dylibs = []  # type: list[DylibRef]
+        self.rpaths = []
+        position = offset + (32 if is_64 else 28)
+        for _ in range(ncmds):
+            cmd, cmdsize = struct.unpack_from(endian + "II", data, position)
+            if cmdsize < 8:
+                raise ValueError("Invalid load command size: %s" % cmdsize)
+
+            if cmd in LOAD_COMMANDS or cmd == LC_ID_DYLIB:
+                name_offset, _, current, compatibility = struct.unpack_from(endian + "IIII", data, position + 8)
+                ref = DylibRef(_lc_string(data, position, name_offset, cmdsize), current, compatibility)
+                if cmd == LC_ID_DYLIB:
+                    self.install_name = ref
+
+                else:
+                    self.dylibs.append(ref)
+
+            elif cmd == LC_RPATH:
+                path_offset = struct.unpack_from(endian + "I", data, position + 8)[0]
+                self.rpaths.append(_lc_string(data, position, path_offset, cmdsize))
+
+            position += cmdsize
+
+
+class MachOFile:
+    """Load commands of a Mach-O exe or dylib, read via mmap"""
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to Mach-O file (use `MachOFile.from_path()` if you're not sure it's a Mach-O file)
+        """
+        self.path = path
+        self.slices = []  # type: list[MachOSlice]
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic = struct.unpack_from(">I", data)[0]
+            if magic in (FAT_MAGIC, FAT_MAGIC_64):
+                self._parse_fat(data, magic == FAT_MAGIC_64)
+
+            elif magic in (MH_MAGIC, MH_MAGIC_64, MH_CIGAM, MH_CIGAM_64):
+                self.slices.append(MachOSlice(data, 0))
+
+            else:
+                raise ValueError("Not a Mach-O file: %s" % path)
+
+    def __repr__(self):
+        return str(self.path)
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to file to inspect
+
+        Returns
+        -------
+        MachOFile | None
+            Parsed file, if 'path' is a readable Mach-O file
+        """
+        if is_macho_file(path):
+            try:
+                return cls(path)
+
+            except (OSError, ValueError, struct.error):
+                return None
+
+    @property
+    def install_name(self):
+        """LC_ID_DYLIB of this file, if any (dylibs only)"""
+        for s in self.slices:
+            if s.install_name:
+                return s.install_name.path
+
+    @property
+    def dylibs(self):
+        """All dylibs referred to, across all architectures (first seen wins)"""
+        seen = {}
+        for s in self.slices:
+            for ref in s.dylibs:
+                seen.setdefault(ref.path, ref)
+
+        return list(seen.values())
+
+    @property
+    def rpaths(self):
+        """All LC_RPATH entries, across all architectures"""
+        seen = {}
+        for s in self.slices:
+            for rpath in s.rpaths:
+                seen.setdefault(rpath, rpath)
+
+        return list(seen)
+
+    def _parse_fat(self, data, is_64):
+        nfat_arch = struct.unpack_from(">I", data, 4)[0]
+        if nfat_arch > MAX_FAT_ARCHS:
+            raise ValueError("Not a fat Mach-O file: %s" % self.path)
+
+        arch_format = ">iiQQII" if is_64 else ">iiIII"
+        arch_size = struct.calcsize(arch_format)
+        for i in range(nfat_arch):
+            offset = struct.unpack_from(arch_format, data, 8 + i * arch_size)[2]
+            self.slices.append(MachOSlice(data, offset))
+
+
+def is_macho_file(path):
+    """Quick check based on magic bytes, without parsing the file"""
+    try:
+        with open(path, "rb") as fh:
+            magic = fh.read(4)
+
+    except OSError:
+        return False
+
+    return len(magic) == 4 and struct.unpack(">I", magic)[0] in (FAT_MAGIC, FAT_MAGIC_64, MH_MAGIC, MH_MAGIC_64, MH_CIGAM, MH_CIGAM_64)
+
+
+def _lc_string(data, command_offset, string_offset, cmdsize):
+    start = command_offset + string_offset
+    end = data.find(b"\0", start, command_offset + cmdsize)
+    if end < 0:
+        end = command_offset + cmdsize
+
+    return data[start:end].decode("utf-8", errors="surrogateescape")
+
+
+def _represented_version(version):
+    """Represent 'version' the same way 'otool -L' does (X.Y.Z packed in nibbles xxxx.yy.zz)"""
+    return "%s.%s.%s" % (version >> 16, (version >> 8) & 0xFF, version & 0xFF)
@@ -0,0 +1,312 @@
+"""
+Mirror of source tarballs: builds can share one (possibly network-mounted) sources folder, and run fully offline against it.
+
+Several hosts can fill the same mirror at the same time: each tarball is downloaded once (under a lock file),
+to a temp file that gets atomically renamed once complete and verified.
+Each tarball gets a '<name>.sha256' sidecar (verified before use), and a SHA256SUMS index is kept for the whole folder.
+Urls with a '#sha256=...' fragment are verified against it as well.
+Lock files are refreshed while held, and stale ones (from a crashed host) are broken atomically, by one host only.
+"""
+
+import contextlib
+import logging
+import os
+import socket
+import threading
+import time
+
+import runez
+from runez.http import RestClient
+
+from portable_python import BuildSetup
+from portable_python.versions import PPG
+
+LOG = logging.getLogger(__name__)
+INDEX_NAME = "SHA256SUMS"
+LOCK_POLL_INTERVAL = 2  # Seconds to wait between checks for lock released by another host
+LOCK_REFRESH_INTERVAL = 60  # Seconds between refreshes of a held lock (so that long downloads don't see their lock broken)
+LOCK_STALE_AFTER = 3600  # Locks not refreshed for this long (in seconds) are considered abandoned (crashed host)
+
+
+class SourceMirror:
+    """Folder of source tarballs, safe to fill concurrently from several threads, processes or hosts"""
+
+    def __init__(self, folder, offline=False):
+        """
+        Parameters
+        ----------
+        folder : pathlib.Path | str
+            Folder holding source tarballs (typically: configured 'folders.sources')
+        offline : bool
+            If True, never download anything, all needed sources must already be present
+        """
+        self.folder = runez.to_path(folder)
+        self.offline = offline
+        self.downloaded = []  # type: list[pathlib.Path] # Tarballs downloaded by this instance
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return runez.short(self.folder)
+
+    def fetch(self, url):
+        """
+        Parameters
+        ----------
+        url : str
+            Url of source tarball (may end with a '#sha256=...' fragment)
+
+        Returns
+        -------
+        pathlib.Path
+            Path to verified source tarball in mirror, downloaded if needed
+        """
+        path = self.folder / source_basename(url)
+        expected = url_checksum(url)
+        if path.exists():
+            self.verify(path, expected=expected)
+            return path
+
+        runez.abort_if(self.offline, "%s is not in %s, can't download it offline" % (runez.red(path.name), runez.short(self.folder)))
+        if runez.DRYRUN:
+            _download(url, path)
+            return path
+
+        with _exclusive_lock(path):
+            if not path.exists():  # Another host may have downloaded it while we were waiting for the lock
+                tmp = path.parent / f".{path.name}.{_unique_id()}.tmp"
+                try:
+                    _download(url, tmp)  # Verifies '#sha256=...' fragment, if any
+                    _atomic_write(checksum_path(path), "%s  %s\n" % (runez.checksum(tmp), path.name))
+                    os.replace(tmp, path)
+
+                finally:
+                    runez.delete(tmp, fatal=False, logger=None)
+
+                with self._lock:
+                    self.downloaded.append(path)
+
+            else:
+                self.verify(path, expected=expected)
+
+        return path
+
+    def verify(self, path, expected=None):
+        """
+        Abort if 'path' does not match its recorded checksum, or 'expected' checksum (if any).
+        Tarballs put in mirror by other means (without a sidecar) get their sidecar recorded once verified.
+        """
+        sidecar = checksum_path(path)
+        recorded = sidecar.exists() and next(runez.readlines(sidecar), "").partition(" ")[0]
+        actual = runez.checksum(path)
+        _abort_on_mismatch(path, recorded, actual)
+        _abort_on_mismatch(path, expected, actual)
+        if not recorded and not runez.DRYRUN:
+            _atomic_write(sidecar, "%s  %s\n" % (actual, path.name))
+
+    def write_index(self):
+        """
+        Rewrite SHA256SUMS index of all tarballs in mirror (atomically, safe to call from several hosts)
+
+        Returns
+        -------
+        pathlib.Path
+            Path to index
+        """
+        index = self.folder / INDEX_NAME
+        if runez.log.hdry("write %s" % runez.short(index)):
+            return index
+
+        with _exclusive_lock(index):
+            lines = []
+            for path in sorted(self.folder.iterdir()):
+                if _is_source_tarball(path):
+                    if not checksum_path(path).exists():  # Put in mirror by other means: record its checksum
+                        self.verify(path)
+
+                    lines.extend(runez.readlines(checksum_path(path)))
+
+            _atomic_write(index, "".join(f"{x}\n" for x in lines))
+
+        return index
+
+
+def matrix_source_urls(matrix):
+    """
+    Parameters
+    ----------
+    matrix : list[str]
+        Entries of the form VERSIONS[:PLATFORMS[:MODULES]] (CSVs, default platform: current one, default modules: all)
+
+    Returns
+    -------
+    dict[str, list[str]]
+        Source urls needed to build each combination, with which builds need them
+    """
+    from portable_python.external import Toolchain
+
+    config_paths, original_target = PPG.config.paths, PPG.target
+    result = {}
+    try:
+        for entry in matrix:
+            versions, _, rest = entry.partition(":")
+            platforms, _, modules = rest.partition(":")
+            for platform in runez.flattened(platforms or str(original_target), split=","):
+                PPG.grab_config(config_paths, target=platform)
+                for version in runez.flattened(versions, split=","):
+                    setup = BuildSetup(version, modules=modules or "all")
+                    urls = list(_module_urls(setup.python_builder))
+                    if PPG.config.get_value("isolate-usr-local") == "gettext-tiny":
+                        urls.append(Toolchain(setup).url)
+
+                    for url in urls:
+                        result.setdefault(url, []).append(f"{setup.python_spec.version} {platform}")
+
+    finally:
+        PPG.grab_config(config_paths, target=original_target)
+
+    return result
+
+
+def checksum_path(path):
+    """Path to sidecar file holding sha256 checksum of source tarball 'path'"""
+    return path.parent / f"{path.name}.sha256"
+
+
+def url_checksum(url):
+    """Get expected sha256 checksum of source tarball downloaded from 'url', if it has a '#sha256=...' fragment"""
+    key, _, value = url.partition("#")[2].partition("=")
+    if key == "sha256" and value:
+        return value.lower()
+
+    return None
+
+
+def source_basename(url):
+    """Basename of source tarball downloaded from 'url' (without '#sha256=...' fragment, if any)"""
+    return runez.basename(url, extension_marker="#")
+
+
+def _abort_on_mismatch(source, expected, actual):
+    if expected and actual != expected:
+        runez.abort("Checksum mismatch for %s: expected %s, got %s" % (runez.red(runez.short(source)), expected, actual))
+
+
+def _atomic_write(path, content):
+    tmp = path.parent / f".{path.name}.{_unique_id()}.tmp"
+    runez.write(tmp, content, logger=None)
+    os.replace(tmp, path)
+
+
+def _break_stale_lock(lock):
+    """
+    Break 'lock' if it is stale (not refreshed by its owner for LOCK_STALE_AFTER seconds)
+
+    Returns
+    -------
+    bool
+        True if 'lock' is gone (released, or broken here because it was stale), False if it is still validly held
+    """
+    try:
+        if time.time() - lock.stat().st_mtime <= LOCK_STALE_AFTER:
+            return False
+
+        # Renaming is atomic: if several hosts try to break the same stale lock, only one succeeds
+        broken = lock.parent / f".{lock.name}.{_unique_id()}.stale"
+        os.rename(lock, broken)
+
+    except FileNotFoundError:  # Lock was just released, or broken by another host
+        return True
+
+    try:
+        age = time.time() - broken.stat().st_mtime
+        if age <= LOCK_STALE_AFTER:
+            # Another host broke the stale lock and took a fresh one since we looked at it: give it back
+            with contextlib.suppress(OSError):
+                os.link(broken, lock)
+
+        else:
+            LOG.warning("Removed stale lock %s (%s old)", runez.short(lock), runez.represented_duration(age))
+
+    finally:
+        os.remove(broken)
+
+    return True
+
+
+def _download(url, path):
+    proxies = {}
+    http_proxy = os.environ.get("HTTP_PROXY") or os.environ.get("http_proxy")
+    if http_proxy:
+        proxies["http"] = http_proxy
+
+    https_proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
+    if https_proxy:
+        proxies["https"] = https_proxy
+
+    RestClient().download(url, path, proxies=proxies)
+
+
+@contextlib.contextmanager
+def _exclusive_lock(path):
+    """Lock file next to 'path', created atomically (works across hosts sharing the same folder)"""
+    lock = path.parent / f"{path.name}.lock"
+    owner = _unique_id()
+    runez.ensure_folder(lock.parent, logger=None)
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, "w") as fh:
+                fh.write(owner)
+
+            break
+
+        except FileExistsError:
+            if not _break_stale_lock(lock):
+                LOG.debug("Waiting for %s to be released", runez.short(lock))
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    released = threading.Event()
+    refresher = threading.Thread(target=_refresh_lock, args=(lock, owner, released), daemon=True)
+    refresher.start()
+    try:
+        yield
+
+    finally:
+        released.set()
+        refresher.join()
+        if _lock_owner(lock) == owner:  # Don't remove a lock that was (wrongly) broken and taken by another host since
+            runez.delete(lock, fatal=False, logger=None)
+
+
+def _is_source_tarball(path):
+    name = path.name
+    return path.is_file() and not name.startswith(".") and name != INDEX_NAME and not name.endswith((".sha256", ".lock"))
+
+
+def _lock_owner(lock):
+    try:
+        with open(lock) as fh:
+            return fh.read()
+
+    except OSError:
+        return None
+
+
+def _module_urls(module):
+    if module.url:
+        yield module.url
+
+    for submodule in module.modules.selected:
+        yield from _module_urls(submodule)
+
+
+def _refresh_lock(lock, owner, released):
+    while not released.wait(LOCK_REFRESH_INTERVAL):
+        if _lock_owner(lock) == owner:
+            with contextlib.suppress(OSError):
+                os.utime(lock)
+
+
+def _unique_id():
+    """Id of current thread, unique across hosts sharing the mirror folder"""
+    return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
@@ -0,0 +1,280 @@
+"""
+Reading of seekable tarballs: archives written as independently compressed frames (see `Compressor.seekable`).
+
+Such archives are regular concatenated gzip/bz2/xz/zstd streams (usual tools can extract them as-is),
+with a sidecar member index telling which frames hold which member. This allows to:
+- decompress all frames in parallel when extracting everything
+- extract one member, or one subtree, by decompressing only the frames that hold them
+"""
+
+import bisect
+import bz2
+import collections
+import concurrent.futures
+import contextlib
+import gzip
+import io
+import json
+import logging
+import lzma
+import os
+import tarfile
+
+import runez
+
+from portable_python.compression import _zstd_decompressor, SEEKABLE_INDEX_FORMAT, seekable_index_path, tar_reader
+
+LOG = logging.getLogger(__name__)
+
+
+class SeekableArchive:
+    """Tarball made of independently compressed frames, with a sidecar index of its members"""
+
+    def __init__(self, path, index):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path
+            Path to tarball
+        index : dict
+            Contents of sidecar index
+        """
+        self.path = path
+        self.compression = index["compression"]
+        self.members = index["members"]  # type: list[tuple[str, int, int]] # Name, start and end offset in uncompressed stream
+        self.frames = index["frames"]  # type: list[tuple[int, int]] # Compressed and uncompressed size of each frame
+        self.compressed_offsets = [0]
+        self.uncompressed_offsets = [0]
+        for compressed_size, uncompressed_size in self.frames:
+            self.compressed_offsets.append(self.compressed_offsets[-1] + compressed_size)
+            self.uncompressed_offsets.append(self.uncompressed_offsets[-1] + uncompressed_size)
+
+        self.decompress = _frame_decompressor(self.compression)
+        runez.abort_if(not self.decompress, "Can't decompress '%s' frames, 'zstandard' package is needed" % self.compression)
+
+    def __repr__(self):
+        return "%s (%s, %s)" % (runez.short(self.path), runez.plural(self.members, "member"), runez.plural(self.frames, "frame"))
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to tarball
+
+        Returns
+        -------
+        SeekableArchive | None
+            Corresponding seekable archive, if 'path' has a sidecar member index
+        """
+        path = runez.to_path(path)
+        index_path = seekable_index_path(path)
+        if not index_path.exists():
+            return None
+
+        index = json.loads("\n".join(runez.readlines(index_path)))
+        runez.abort_if(index.get("format") != SEEKABLE_INDEX_FORMAT, "Unsupported index format in %s" % runez.red(runez.short(index_path)))
+        return cls(path, index)
+
+    def frame_range(self, start, end):
+        """Range of frames holding uncompressed bytes 'start' to 'end'"""
+        first = bisect.bisect_right(self.uncompressed_offsets, start) - 1
+        last = bisect.bisect_left(self.uncompressed_offsets, end)
+        return range(max(first, 0), min(last, len(self.frames)))
+
+    def selected_ranges(self, selection):
+        """
+        Parameters
+        ----------
+        selection : list[str]
+            Members or folders to extract (with, or without the top-level folder of the tarball)
+
+        Returns
+        -------
+        list[tuple[int, int, int]]
+            Merged (start, end, member count) ranges in uncompressed stream, holding selected members
+        """
+        selection = [x.strip("/") for x in selection]
+        ranges = []
+        for name, start, end in self.members:
+            relative = name.partition("/")[2]
+            if any(_is_under(name, x) or _is_under(relative, x) for x in selection):
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1] = (ranges[-1][0], end, ranges[-1][2] + 1)
+
+                else:
+                    ranges.append((start, end, 1))
+
+        return ranges
+
+    def extract(self, destination, selection=None, threads=None, logger=LOG.info):
+        """
+        Parameters
+        ----------
+        destination : pathlib.Path | str
+            Folder where to extract
+        selection : list[str] | None
+            Members or folders to extract (default: everything)
+        threads : int | None
+            Number of frames to decompress in parallel (default: cpu count)
+        logger : callable | None
+            Logger to use
+
+        Returns
+        -------
+        int
+            Number of extracted members
+        """
+        destination = runez.to_path(destination)
+        if runez.log.hdry("extract %s -> %s" % (runez.short(self.path), runez.short(destination))):
+            return 0
+
+        threads = threads or os.cpu_count() or 1
+        runez.ensure_folder(destination, logger=None)
+        if selection:
+            ranges = self.selected_ranges(selection)
+
+        else:
+            ranges = [(0, self.uncompressed_offsets[-1], len(self.members))]
+
+        count = decompressed = 0
+        with open(self.path, "rb") as fh:
+            for start, end, member_count in ranges:
+                frames = self.frame_range(start, end)
+                decompressed += len(frames)
+                with contextlib.closing(self._decompressed_frames(fh, frames, threads)) as decompressed_frames:
+                    stream = _FrameStream(decompressed_frames, self.uncompressed_offsets[frames[0]], start, end)
+                    with tarfile.open(fileobj=stream, mode="r|") as tar:
+                        _extract_all(tar, destination)
+
+                count += member_count
+
+        if logger:
+            summary = "%s from %s -> %s" % (runez.plural(count, "member"), runez.short(self.path), runez.short(destination))
+            logger("Extracted %s (%s of %s frames)" % (summary, decompressed, len(self.frames)))
+
+        return count
+
+    def _decompressed_frames(self, fh, frames, threads):
+        """Decompressed contents of 'frames', in order, decompressing up to 2 * 'threads' frames ahead in parallel"""
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            for i in frames:
+                fh.seek(self.compressed_offsets[i])
+                pending.append(executor.submit(self.decompress, fh.read(self.frames[i][0])))
+                while len(pending) >= 2 * threads:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+
+def extract_archive(path, destination, selection=None, threads=None, logger=LOG.info):
+    """
+    Parameters
+    ----------
+    path : pathlib.Path | str
+        Tarball to extract (seekable, or not)
+    destination : pathlib.Path | str
+        Folder where to extract
+    selection : list[str] | None
+        Members or folders to extract (default: everything)
+    threads : int | None
+        Number of frames to decompress in parallel (default: cpu count)
+    logger : callable | None
+        Logger to use
+
+    Returns
+    -------
+    int
+        Number of extracted members
+    """
+    archive = SeekableArchive.from_path(path)
+    if archive is not None:
+        return archive.extract(destination, selection=selection, threads=threads, logger=logger)
+
+    path = runez.to_path(path)
+    destination = runez.to_path(destination)
+    if runez.log.hdry("extract %s -> %s" % (runez.short(path), runez.short(destination))):
+        return 0
+
+    # Not seekable: whole archive needs to be decompressed sequentially
+    runez.ensure_folder(destination, logger=None)
+    selection = [x.strip("/") for x in selection or ()]
+    count = 0
+    with tar_reader(path) as tar:
+        for member in tar:
+            if not selection or any(_is_under(member.name, x) or _is_under(member.name.partition("/")[2], x) for x in selection):
+                _extract_all(tar, destination, members=[member])
+                count += 1
+
+    if logger:
+        logger("Extracted %s from %s -> %s (not seekable)" % (runez.plural(count, "member"), runez.short(path), runez.short(destination)))
+
+    return count
+
+
+class _FrameStream(io.RawIOBase):
+    """Readable view of uncompressed bytes 'start' to 'end', out of decompressed frames starting at offset 'offset'"""
+
+    def __init__(self, frames, offset, start, end):
+        super().__init__()
+        self._frames = frames
+        self._current = b""
+        self._position = 0
+        self._skip = start - offset
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._remaining
+
+        size = min(size, self._remaining)
+        chunks = []
+        while size > 0:
+            if self._position >= len(self._current):
+                self._current = next(self._frames, b"")
+                self._position = min(self._skip, len(self._current))
+                self._skip -= self._position
+                if not self._current:
+                    break
+
+                continue
+
+            chunk = self._current[self._position : self._position + size]
+            self._position += len(chunk)
+            size -= len(chunk)
+            chunks.append(chunk)
+
+        data = b"".join(chunks)
+        self._remaining -= len(data)
+        return data
+
+
+def _extract_all(tar, destination, members=None):
+    if hasattr(tarfile, "tar_filter"):
+        # Own archives: keep permissions and symlinks as-is (but don't allow paths outside of 'destination')
+        return tar.extractall(destination, members=members, filter="tar")
+
+    return tar.extractall(destination, members=members)  # noqa: S202
+
+
+def _frame_decompressor(compression):
+    if compression == "gz":
+        return gzip.decompress
+
+    if compression == "bz2":
+        return bz2.decompress
+
+    if compression == "xz":
+        return lzma.decompress
+
+    return _zstd_decompressor()
+
+
+def _is_under(name, selected):
+    return name == selected or name.startswith(selected + "/")
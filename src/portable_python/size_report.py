@@ -0,0 +1,273 @@
+"""
+Size breakdown of a python installation: per folder, per file type, largest files, and changes compared to a previous build.
+
+Installation size directly impacts how long it takes to download and unpack a build, the report allows to spot regressions
+(like a test suite that escaped clean-up), and optionally fail the build when a configured 'size-budget' is exceeded.
+"""
+
+import collections
+import os
+
+import runez
+import yaml
+from runez.render import PrettyTable
+
+from portable_python.inspector import is_dyn_lib
+from portable_python.tree_index import TreeIndex
+
+MANIFEST_TOP = 50  # Number of largest files to keep in size manifest
+
+
+class SizeReport:
+    """Sizes of all folders and file types of an installation (as scanned, or as loaded from a size manifest)"""
+
+    def __init__(self, source, total=0, count=0, folders=None, types=None, largest=None):
+        """
+        Parameters
+        ----------
+        source : pathlib.Path | str
+            Installation folder, or size manifest this report was obtained from
+        total : int
+            Total size of all files in installation
+        count : int
+            Number of files in installation
+        folders : dict[str, int] | None
+            Total size of each folder (relative to installation folder)
+        types : dict[str, int] | None
+            Total size per file type (file extension)
+        largest : dict[str, int] | None
+            Largest files in installation, with their size
+        """
+        self.source = source
+        self.total = total
+        self.count = count
+        self.folders = folders or {}
+        self.types = types or {}
+        self.largest = largest or {}
+
+    def __repr__(self):
+        return "%s (%s)" % (runez.short(self.source), runez.represented_bytesize(self.total))
+
+    @classmethod
+    def from_folder(cls, folder, index=None):
+        """
+        Parameters
+        ----------
+        folder : pathlib.Path | str
+            Installation folder to scan
+        index : portable_python.tree_index.TreeIndex | None
+            Index of 'folder', if available
+
+        Returns
+        -------
+        SizeReport
+            Size breakdown of 'folder'
+        """
+        if index is None:
+            index = TreeIndex(folder)
+
+        folders = collections.Counter()
+        types = collections.Counter()
+        files = {}
+        for entry in index.walk():
+            if entry.is_file:
+                relative_path = os.path.relpath(entry.path, index.folder)
+                files[relative_path] = entry.size
+                types[file_type(entry.path)] += entry.size
+                parent = os.path.dirname(relative_path)
+                while parent:
+                    folders[parent] += entry.size
+                    parent = os.path.dirname(parent)
+
+        largest = dict(sorted(files.items(), key=lambda x: (-x[1], x[0])))
+        return cls(folder, sum(files.values()), len(files), dict(sorted(folders.items())), dict(types.most_common()), largest)
+
+    @classmethod
+    def from_manifest(cls, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Size manifest, as written by a previous build
+
+        Returns
+        -------
+        SizeReport
+            Corresponding report
+        """
+        with open(path) as fh:
+            data = yaml.safe_load(fh) or {}
+
+        runez.abort_if(not isinstance(data, dict) or "total" not in data, "Invalid size manifest %s" % runez.red(runez.short(path)))
+        return cls(path, data["total"], data.get("count", 0), data.get("folders"), data.get("types"), data.get("largest"))
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str | None
+            Installation folder, or size manifest of a previous build
+
+        Returns
+        -------
+        SizeReport | None
+            Corresponding report, if 'path' exists
+        """
+        if path and os.path.isdir(path):
+            return cls.from_folder(path)
+
+        if path and os.path.isfile(path):
+            return cls.from_manifest(path)
+
+    def to_dict(self, top=MANIFEST_TOP):
+        """Contents of size manifest (also used as --json output)"""
+        largest = dict(list(self.largest.items())[:top])
+        return {"total": self.total, "count": self.count, "folders": self.folders, "types": self.types, "largest": largest}
+
+    def represented_manifest(self):
+        return yaml.safe_dump(self.to_dict(), width=140, sort_keys=False)
+
+    def changes(self, baseline, top=10):
+        """
+        Parameters
+        ----------
+        baseline : SizeReport
+            Report of previous build, to compare with
+        top : int
+            Max number of changed folders to report
+
+        Returns
+        -------
+        list[(str, int, int)]
+            (name, size before, size now), for the total size and the 'top' folders whose size changed the most
+        """
+        changed = []
+        for name in set(self.folders) | set(baseline.folders):
+            before = baseline.folders.get(name, 0)
+            now = self.folders.get(name, 0)
+            if before != now:
+                changed.append((name, before, now))
+
+        changed = sorted(changed, key=lambda x: (-abs(x[2] - x[1]), x[0]))[:top]
+        return [("total", baseline.total, self.total), *changed]
+
+    def budget_problem(self, budget, baseline=None):
+        """
+        Parameters
+        ----------
+        budget : dict | None
+            Configured 'size-budget', with 'total' (max size) and/or 'growth' (max growth compared to baseline) keys
+        baseline : SizeReport | None
+            Report of previous build, if available
+
+        Returns
+        -------
+        str | None
+            Description of how budget was exceeded, if it was
+        """
+        if not budget:
+            return None
+
+        runez.abort_if(not isinstance(budget, dict), "Mis-configured 'size-budget', expecting a dict with 'total' and/or 'growth'")
+        max_total = _configured_bytesize(budget, "total")
+        if max_total and self.total > max_total:
+            return "install size %s exceeds budget of %s" % (_bytesize(self.total), _bytesize(max_total))
+
+        growth = budget.get("growth")
+        if growth and baseline is not None:
+            delta = self.total - baseline.total
+            max_growth = _configured_bytesize(budget, "growth", reference=baseline.total)
+            if delta > max_growth:
+                growth = _represented_delta(delta, baseline.total)
+                return "install size grew by %s compared to %s, budget is %s" % (growth, runez.short(baseline.source), budget["growth"])
+
+    def represented(self, top=10, depth=2, baseline=None):
+        """
+        Parameters
+        ----------
+        top : int
+            Number of largest files, file types (and most changed folders) to show
+        depth : int
+            Max depth of folders to show
+        baseline : SizeReport | None
+            Report of previous build to compare with, if any
+
+        Returns
+        -------
+        str
+            Human-readable report
+        """
+        report = ["install size: %s in %s" % (runez.bold(_bytesize(self.total)), runez.plural(self.count, "file"))]
+        table = PrettyTable(["Folder", "Size", "%"])
+        table.header[1].align = table.header[2].align = "right"
+        for name, size in sorted(self.folders.items(), key=lambda x: (-x[1], x[0])):
+            if name.count("/") < depth:
+                table.add_row(name, _bytesize(size), _percentage(size, self.total))
+
+        report.append(table)
+        table = PrettyTable(["Type", "Size", "%"])
+        table.header[1].align = table.header[2].align = "right"
+        for name, size in list(self.types.items())[:top]:
+            table.add_row(name, _bytesize(size), _percentage(size, self.total))
+
+        report.append(table)
+        table = PrettyTable(["Largest files", "Size"])
+        table.header[1].align = "right"
+        for name, size in list(self.largest.items())[:top]:
+            table.add_row(name, _bytesize(size))
+
+        report.append(table)
+        if baseline is not None:
+            table = PrettyTable(["Compared to %s" % runez.short(baseline.source), "Before", "Now", "Change"])
+            table.header[1].align = table.header[2].align = table.header[3].align = "right"
+            for name, before, now in self.changes(baseline, top=top):
+                change = _represented_delta(now - before, before)
+                table.add_row(name, _bytesize(before), _bytesize(now), runez.red(change) if now > before else runez.green(change))
+
+            report.append(table)
+
+        return runez.joined(report, delimiter="\n\n")
+
+
+def file_type(path):
+    """Type of file, as shown in size report: its extension (versioned .so files count as .so)"""
+    if is_dyn_lib(path):
+        return ".dylib" if path.name.endswith(".dylib") else ".so"
+
+    if path.suffix[1:].isdigit():
+        return "(none)"  # Versioned name, such as 'bin/python3.9'
+
+    return path.suffix or "(none)"
+
+
+def _bytesize(size):
+    return runez.represented_bytesize(size) if size else "-"
+
+
+def _configured_bytesize(budget, key, reference=None):
+    """Get configured size, which can be expressed as a percentage of 'reference' (example: "5%")"""
+    value = budget.get(key)
+    if value is not None:
+        if reference is not None and str(value).endswith("%"):
+            size = runez.to_float(str(value)[:-1])
+            size = size if size is None else reference * size / 100
+
+        else:
+            size = runez.to_bytesize(value)
+
+        runez.abort_if(size is None, "Invalid 'size-budget' %s '%s'" % (key, runez.red(value)))
+        return size
+
+
+def _percentage(size, total):
+    return "%.1f%%" % (size * 100.0 / total) if total else "-"
+
+
+def _represented_delta(delta, before):
+    sign = "-" if delta < 0 else "+"
+    text = "%s%s" % (sign, runez.represented_bytesize(abs(delta)))
+    if before:
+        text += " (%s%.1f%%)" % (sign, abs(delta) * 100.0 / before)
+
+    return text
@@ -3,36 +3,57 @@ import runez
 
 class Trackable:
     tracked_category = None
+    _tracked_key = None
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if isinstance(other, Trackable):
+            return self.tracked_key == other.tracked_key
+
+        return self.tracked_key == str(other)
 
     def __hash__(self):
-        return hash(str(self))
+        return hash(self.tracked_key)
 
     def __iter__(self):
         yield self
 
+    @property
+    def tracked_key(self):
+        """str() representation, computed once (objects are compared/hashed a lot while tracking)"""
+        if self._tracked_key is None:
+            self._tracked_key = str(self)
+
+        return self._tracked_key
+
 
 class TrackedCollection:
     def __init__(self, name):
         self.name = name
-        self.items = []
+        self._items = {}  # Insertion-ordered, allows for O(1) membership checks
 
     def __repr__(self):
-        return "%s %s" % (len(self.items), self.name)
+        return "%s %s" % (len(self._items), self.name)
 
     def __bool__(self):
-        return bool(self.items)
+        return bool(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    @property
+    def items(self):
+        return list(self._items)
+
+    @items.setter
+    def items(self, items):
+        self._items = dict.fromkeys(items)
 
     def add(self, item):
-        if item not in self.items:
-            self.items.append(item)
+        self._items.setdefault(item)
 
     def represented(self, verbose=False):
-        if self.items:
-            for item in self.items:
-                yield item.represented(verbose=verbose)
+        for item in self._items:
+            yield item.represented(verbose=verbose)
 
 
 class Tracker(TrackedCollection):
@@ -47,9 +68,7 @@ class Tracker(TrackedCollection):
             self.category[x] = c
 
     def add(self, item):
-        if item not in self.items:
-            self.items.append(item)
-
+        self._items.setdefault(item)
         for trackable in item:
             if trackable.tracked_category:
                 c = self.category[trackable.tracked_category]
@@ -64,9 +83,8 @@ class Tracker(TrackedCollection):
 
     def represented(self, verbose=False):
         report = []
-        if self.items:
-            for item in self.items:
-                report.append(item.represented(verbose))
+        for item in self._items:
+            report.append(item.represented(verbose))
 
         report = runez.joined(report, delimiter="\n")
         if verbose or report:
@@ -0,0 +1,213 @@
+"""
+Single-pass index of a file tree (typically: the installation folder being finalized).
+
+Finalization steps query this index instead of walking the tree again, and let it know about what they modify
+via `TreeIndex.update()`, so the index stays accurate without re-walking everything.
+"""
+
+import bisect
+import os
+import stat
+
+import runez
+
+
+class TreeEntry:
+    """Metadata of one file, folder or symlink (symlinks are not followed)"""
+
+    __slots__ = ("_checksum", "inode", "mode", "mtime", "path", "size")
+
+    def __init__(self, path, st):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path
+            Path to file
+        st : os.stat_result
+            Result of `lstat()` on 'path'
+        """
+        self.path = path
+        self.mode = st.st_mode
+        self.size = st.st_size
+        self.inode = st.st_ino
+        self.mtime = st.st_mtime
+        self._checksum = None
+
+    def __repr__(self):
+        return str(self.path)
+
+    @property
+    def checksum(self):
+        """Checksum of file contents, computed on first use"""
+        if self._checksum is None and self.is_file:
+            self._checksum = runez.checksum(self.path)
+
+        return self._checksum
+
+    @property
+    def is_dir(self):
+        return stat.S_ISDIR(self.mode)
+
+    @property
+    def is_executable(self):
+        return self.is_file and bool(self.mode & 0o111)
+
+    @property
+    def is_file(self):
+        return stat.S_ISREG(self.mode)
+
+    @property
+    def is_symlink(self):
+        return stat.S_ISLNK(self.mode)
+
+
+class TreeIndex:
+    """Type, size, mode, mtime and inode of everything under a folder, obtained in one `os.scandir()` pass"""
+
+    def __init__(self, folder):
+        """
+        Parameters
+        ----------
+        folder : pathlib.Path | str
+            Folder to index
+        """
+        self.folder = runez.to_path(folder)
+        self._entries = {}  # type: dict[pathlib.Path, TreeEntry]
+        self._children = {}  # type: dict[pathlib.Path, list[str]]
+        self.refresh()
+
+    def __repr__(self):
+        return "%s (%s)" % (runez.short(self.folder), runez.plural(self._entries, "entry"))
+
+    def __contains__(self, path):
+        return runez.to_path(path) in self._entries
+
+    def refresh(self):
+        """Re-index the whole tree (after external tools such as 'pip' modified it)"""
+        self._entries = {}
+        self._children = {}
+        self._scan(self.folder)
+
+    def get(self, path):
+        """
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path to look up
+
+        Returns
+        -------
+        TreeEntry | None
+            Corresponding entry, if any
+        """
+        return self._entries.get(runez.to_path(path))
+
+    def children(self, folder):
+        """
+        Parameters
+        ----------
+        folder : pathlib.Path | str
+            Folder to list
+
+        Returns
+        -------
+        list[TreeEntry]
+            Direct children of 'folder', sorted by name
+        """
+        folder = runez.to_path(folder)
+        return [self._entries[folder / name] for name in self._children.get(folder, ())]
+
+    def walk(self, folder=None):
+        """
+        Parameters
+        ----------
+        folder : pathlib.Path | str | None
+            Folder to walk (default: indexed folder)
+
+        Yields
+        ------
+        TreeEntry
+            All entries under 'folder', depth-first, sorted by name (same order as a recursive `sorted(ls_dir())`)
+        """
+        for entry in self.children(folder or self.folder):
+            yield entry
+            if entry.is_dir:
+                yield from self.walk(entry.path)
+
+    def size(self, *paths):
+        """Total size of files under 'paths', same as `runez.filesize()` (symlinks are not counted)"""
+        total = 0
+        for path in runez.flattened(paths, unique=True):
+            path = runez.to_path(path)
+            entry = self.get(path)
+            if entry and entry.is_file:
+                total += entry.size
+
+            elif path == self.folder or (entry and entry.is_dir):
+                total += sum(x.size for x in self.walk(path) if x.is_file)
+
+        return total
+
+    def update(self, path):
+        """
+        Let index know that 'path' was created, modified or deleted
+
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Path that was modified (if it's a folder, its contents get re-indexed)
+        """
+        path = runez.to_path(path)
+        if path == self.folder:
+            self.refresh()
+            return
+
+        self._forget(path)
+        try:
+            st = os.lstat(path)
+
+        except OSError:
+            return
+
+        parent = path.parent
+        if parent not in self._children:
+            if parent == self.folder or self.folder in parent.parents:
+                self.update(parent)  # Parent folder was created as well
+
+            return
+
+        self._entries[path] = TreeEntry(path, st)
+        bisect.insort(self._children[parent], path.name)
+        if stat.S_ISDIR(st.st_mode):
+            self._scan(path)
+
+    def _forget(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            siblings = self._children.get(path.parent)
+            if siblings and path.name in siblings:
+                siblings.remove(path.name)
+
+            for name in self._children.pop(path, ()):
+                self._forget(path / name)
+
+    def _scan(self, folder):
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda x: x.name)
+
+        except OSError:
+            return
+
+        self._children[folder] = [x.name for x in entries]
+        for entry in entries:
+            path = folder / entry.name
+            try:
+                self._entries[path] = TreeEntry(path, entry.stat(follow_symlinks=False))
+
+            except OSError:  # pragma: no cover, file vanished while scanning
+                self._children[folder].remove(entry.name)
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                self._scan(path)
@@ -4,16 +4,15 @@ Tracking only a handful of most recent (and non-EOL) versions by design.
 Not trying to do historical stuff here, older (or EOL-ed) versions will be removed from the list without notice.
 """
 
-import logging
 import os
 import re
 from typing import ClassVar
 
 import runez
-from runez.http import RestClient
 from runez.pyenv import PythonDepot, Version
 
 from portable_python.config import Config
+from portable_python.listing_cache import ListingCache
 
 
 class VersionFamily:
@@ -76,15 +75,12 @@ class CPythonFamily(VersionFamily):
 
     min_version = "3.7"  # Earliest non-EOL known to compile well
 
-    @runez.cached_property
-    def client(self):
-        return RestClient()
-
     def get_available_versions(self):
-        """Available versions as per python.org/ftp"""
+        """Available versions as per python.org/ftp (or github tags), cached on disk (see `ListingCache`)"""
+        cache = ListingCache.from_config(PPG.config, offline=PPG.offline)
         if PPG.config.get_value("cpython-use-github"):
-            r = self.client.get("https://api.github.com/repos/python/cpython/git/matching-refs/tags/v3.", logger=logging.debug)
-            for item in r:
+            r = cache.get_json("https://api.github.com/repos/python/cpython/git/matching-refs/tags/v3.")
+            for item in r or ():
                 ref = item.get("ref")
                 if ref and ref.startswith("refs/tags/v"):
                     ref = ref[11:]
@@ -96,19 +92,25 @@ class CPythonFamily(VersionFamily):
 
         upcoming = Version("3.11")  # No need to double-check .0 releases prior to this version
         base_url = "https://www.python.org/ftp/python"
-        r = self.client.get_response(f"{base_url}/", logger=logging.debug)
+        text = cache.get_text(f"{base_url}/")
         regex = re.compile(r'"(\d+\.\d+\.\d+)/"')
-        if r.text:
-            for line in r.text.splitlines():
+        candidates = []
+        if text:
+            for line in text.splitlines():
                 line = line.strip()
                 if line:
                     m = regex.search(line)
                     if m:
                         v = Version(m.group(1))
                         if v.is_valid and v.is_final and self.min_version < v:
-                            # For .0 releases, double-check that it's not a release candidate
-                            if v < upcoming or v.patch > 0 or self.client.url_exists(f"{base_url}/{v}/Python-{v}.tar.xz"):
-                                yield v
+                            candidates.append(v)
+
+        # For .0 releases, double-check that it's not a release candidate (all checked at the same time)
+        to_check = {v: f"{base_url}/{v}/Python-{v}.tar.xz" for v in candidates if v >= upcoming and v.patch == 0}
+        existing = cache.urls_exist(list(to_check.values()))
+        for v in candidates:
+            if v not in to_check or existing.get(to_check[v]):
+                yield v
 
     def get_builder(self):
         from portable_python.cpython import Cpython
@@ -170,6 +172,17 @@ class Folders:
             return runez.to_path(path, no_spaces=True)
 
 
+class _DefaultConfig:
+    """Default config of `PPG` (and target), loaded on first access only, to keep CLI startup fast"""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        owner.grab_config()
+        return getattr(owner, self.name)
+
+
 class PPG:
     """
     Global settings for portable-python
@@ -180,14 +193,17 @@ class PPG:
         Mapping of family names to implementations
     config : portable_python.config.Config
         Global configuration
+    offline : bool
+        If True, don't query remote listings, use last known good ones (see `ListingCache`)
     target : runez.system.PlatformId
         Target platform
     """
 
     cpython = CPythonFamily()
     families: ClassVar[dict] = {"cpython": cpython}
-    config = Config()
-    target = config.target
+    config = _DefaultConfig()
+    offline = False
+    target = _DefaultConfig()
 
     _depot = None
 
@@ -1,3 +1,7 @@
+import os
+import struct
+
+import pytest
 import runez
 from runez.conftest import cli, logged, temp_folder
 from runez.http import GlobalHttpCalls
@@ -16,7 +20,87 @@ runez.log.setup(debug=True, console_format="%(levelname)s %(message)s", location
 cli.default_main = main
 
 
+@pytest.fixture(autouse=True, scope="session")
+def _isolated_user_cache(tmp_path_factory):
+    """Don't use (nor pollute) user's ~/.cache folder from tests"""
+    os.environ["XDG_CACHE_HOME"] = str(tmp_path_factory.mktemp("cache"))
+
+
 def dummy_tarball(folders, basename, content=None):
     runez.write("sample/README", content, logger=None)
     runez.compress("sample", folders.sources / basename, logger=None)
     runez.delete("sample", logger=None)
+
+
+@pytest.fixture
+def sample_elf(temp_folder):
+    """Provide a function writing minimal ELF files (tests using it run in a temp folder)"""
+    return _write_sample_elf
+
+
+@pytest.fixture
+def sample_macho(temp_folder):
+    """Provide a function writing minimal Mach-O files (tests using it run in a temp folder)"""
+    return _write_sample_macho
+
+
+def _write_sample_elf(path, rpath=None, needed=(), runpath=True, interpreter=None, soname=None, merged=None):
+    """
+    Write a minimal 64-bit little-endian ELF file with a PT_DYNAMIC segment (all vaddr-s equal file offsets)
+    'merged' is an extra DT_NEEDED entry pointing inside the rpath string (as a linker tail-merging strings would do)
+    """
+    strings = b"\0"
+    dyn = []
+    for tag, value in [(1, x) for x in needed] + [(14, soname), (29 if runpath else 15, rpath)]:
+        if value:
+            dyn.append((tag, len(strings)))
+            strings += value.encode() + b"\0"
+
+    if merged:
+        dyn.append((1, len(strings) - len(merged) - 1))
+
+    interp = (interpreter.encode() + b"\0") if interpreter else b""
+    phnum = 3 if interp else 2
+    strtab_offset = 64 + 56 * phnum
+    interp_offset = strtab_offset + len(strings)
+    dyn_offset = interp_offset + len(interp)
+    dyn_offset += -dyn_offset % 8
+    dyn += [(5, strtab_offset), (10, len(strings)), (0, 0)]
+    dynamic = b"".join(struct.pack("<qQ", *x) for x in dyn)
+    size = dyn_offset + len(dynamic)
+    header = b"\x7fELF\x02\x01\x01" + b"\0" * 9
+    header += struct.pack("<HHIQQQIHHHHHH", 3, 62, 1, 0, 64, 0, 0, 64, 56, phnum, 64, 0, 0)
+    pheaders = struct.pack("<IIQQQQQQ", 1, 5, 0, 0, 0, size, size, 0x1000)
+    pheaders += struct.pack("<IIQQQQQQ", 2, 6, dyn_offset, dyn_offset, dyn_offset, len(dynamic), len(dynamic), 8)
+    if interp:
+        pheaders += struct.pack("<IIQQQQQQ", 3, 4, interp_offset, interp_offset, interp_offset, len(interp), len(interp), 1)
+
+    content = header + pheaders + strings + interp
+    content += b"\0" * (dyn_offset - len(content)) + dynamic
+    runez.write(path, content, logger=None)
+    runez.make_executable(path, logger=None)
+
+
+def _write_sample_macho(path, dylibs=(), rpaths=(), install_name=None, fat=False):
+    """Write a minimal 64-bit x86_64 Mach-O file, wrapped in a fat header if 'fat' is True"""
+    commands = []
+    for cmd, name in [(0xD, install_name)] + [(0xC, x) for x in dylibs]:
+        if name:
+            name = name.encode() + b"\0"
+            name += b"\0" * (-(24 + len(name)) % 8)
+            commands.append(struct.pack("<IIIIII", cmd, 24 + len(name), 24, 2, 0x10203, 0x10000) + name)
+
+    for rpath in rpaths:
+        rpath = rpath.encode() + b"\0"
+        rpath += b"\0" * (-(12 + len(rpath)) % 8)
+        commands.append(struct.pack("<III", 0x8000001C, 12 + len(rpath), 12) + rpath)
+
+    filetype = 6 if install_name else 2
+    content = struct.pack("<IiiIIIII", 0xFEEDFACF, 0x01000007, 3, filetype, len(commands), sum(len(x) for x in commands), 0, 0)
+    content += b"".join(commands)
+    if fat:
+        header = struct.pack(">II", 0xCAFEBABE, 1) + struct.pack(">iiIII", 0x01000007, 3, 4096, len(content), 12)
+        content = header.ljust(4096, b"\0") + content
+
+    runez.write(path, content, logger=None)
+    runez.make_executable(path, logger=None)
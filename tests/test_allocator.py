@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+import runez
+
+from portable_python import BuildSetup
+from portable_python.external import _inspect
+from portable_python.external.xcpython import Allocator
+from portable_python.inspector import PythonInspector
+from portable_python.tree_index import TreeIndex
+from portable_python.versions import PPG
+
+
+def test_build(cli):
+    runez.write("pp.yml", "cpython-allocator: jemalloc\n", logger=None)
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.12.1", "-mnone")
+    assert cli.succeeded
+    assert "[auto-selected] Configured via 'cpython-allocator: jemalloc'" in cli.logged
+    assert "Would download https://github.com/jemalloc/jemalloc/releases/download/5.3.0/jemalloc-5.3.0.tar.bz2" in cli.logged
+    assert "make install_lib_static install_include" in cli.logged
+    assert "env LIBS=-Wl,--whole-archive build/deps/lib/libjemalloc_pic.a -Wl,--no-whole-archive -lpthread -ldl" in cli.logged
+
+    # mimalloc bundled with cpython 3.13+ is python's allocator only in free-threaded builds
+    runez.write("pp.yml", "cpython-allocator: mimalloc\nmimalloc-version: 2.1.2\n", logger=None)
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.13.1", "-mnone")
+    assert cli.succeeded
+    assert "--without-mimalloc" in cli.logged
+    assert "v2.1.2.tar.gz" in cli.logged
+    assert "lib/libmimalloc.a -Wl,--no-whole-archive -lpthread\n" in cli.logged
+
+    runez.write("pp.yml", "cpython-allocator: mimalloc\nmimalloc-version: 2.1.2\ncpython-configure: [--disable-gil]\n", logger=None)
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.13.1", "-mnone")
+    assert cli.succeeded
+    assert "--with-mimalloc" in cli.logged
+    assert "v2.1.2.tar.gz" not in cli.logged
+    assert "env LIBS=" not in cli.logged
+
+    runez.write("pp.yml", "cpython-allocator: mimalloc\nmimalloc-version: 2.1.2\n", logger=None)
+
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.12.1", "-mnone")
+    assert cli.succeeded
+    assert "--with-mimalloc" not in cli.logged
+    assert "cmake --install out" in cli.logged
+    assert "lib/libmimalloc.a -Wl,--no-whole-archive -lpthread\n" in cli.logged
+
+    with patch("portable_python.external.xcpython.runez.which", return_value=None):
+        cli.run("-tlinux-x86_64", "-c", "pp.yml", "build-report", "3.12.1", "-mnone")
+        assert cli.failed
+        assert "needs cmake" in cli.logged
+
+    cli.run("-tmacos-arm64", "-c", "pp.yml", "build-report", "3.12.1", "-mnone")
+    assert cli.failed
+    assert "can't override malloc() statically on macos" in cli.logged
+
+    runez.write("pp.yml", "cpython-allocator: tcmalloc\n", logger=None)
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.12.1", "-mnone")
+    assert cli.failed
+    assert "Unknown cpython-allocator 'tcmalloc', expecting one of: default jemalloc mimalloc" in cli.logged
+
+    # Default allocator is reported as such
+    cli.run("-tlinux-x86_64", "build-report", "3.12.1", "-mnone")
+    assert cli.succeeded
+    assert "default: pymalloc + libc malloc()" in cli.logged
+
+
+def test_unlisted(temp_folder):
+    runez.write("pp.yml", "cpython-allocator: jemalloc\n", logger=None)
+    PPG.grab_config("pp.yml", target="linux-x86_64")
+    setup = BuildSetup("3.12.1", modules="none")
+    builder = setup.python_builder
+    flags = runez.joined(builder.active_module(Allocator).linker_flags())
+    lib = builder.prefix_lib_folder
+    sys_cfg = lib / "_sysconfigdata__linux_x86_64-linux-gnu.py"
+    runez.write(sys_cfg, f"build_time_vars = {{'CONFIG_ARGS': \"'LIBS={flags}'\",\n 'LIBS': '-lcrypt -ldl  {flags}'}}\n", logger=None)
+    runez.write(lib / "config-3.12-x86_64-linux-gnu/Makefile", f"LIBS=\t\t-lcrypt {flags}\n", logger=None)
+    runez.write(builder.bin_folder / "python3.12-config", f'LIBS="-lpython3.12 -lcrypt {flags} $SYSLIBS"\n', logger=None)
+    builder.tree_index = TreeIndex(builder.install_folder)
+    builder._unlist_allocator()  # noqa: SLF001
+    assert sys_cfg.read_text() == "build_time_vars = {'CONFIG_ARGS': \"'LIBS='\",\n 'LIBS': '-lcrypt -ldl'}\n"
+    assert (lib / "config-3.12-x86_64-linux-gnu/Makefile").read_text() == "LIBS=\t\t-lcrypt\n"
+    assert (builder.bin_folder / "python3.12-config").read_text() == 'LIBS="-lpython3.12 -lcrypt $SYSLIBS"\n'
+
+
+def test_inspect(monkeypatch):
+    monkeypatch.delenv("PYTHONMALLOC", raising=False)
+    allocator = _inspect.get_allocator()
+    assert allocator["python"] in ("mimalloc", "pymalloc", "malloc")
+    assert allocator["malloc"]
+
+    monkeypatch.setenv("PYTHONMALLOC", "malloc")
+    assert _inspect.get_allocator()["python"] == "malloc"
+
+    inspector = PythonInspector("invoker", modules="zlib")
+    assert inspector.allocator == {"python": "malloc", "malloc": allocator["malloc"]}
+    assert "malloc + %s malloc()" % allocator["malloc"] in inspector.represented()
@@ -0,0 +1,81 @@
+import os
+from unittest.mock import patch
+
+import runez
+
+from portable_python import BuildSetup
+from portable_python.versions import PPG
+
+
+def test_build(cli, monkeypatch):
+    monkeypatch.setenv("LLVM_BOLT", "/opt/llvm/bin/llvm-bolt")
+    runez.write("pp.yml", "cpython-bolt: true\n", logger=None)
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.13.1", "-mnone")
+    assert cli.succeeded
+    assert "--enable-bolt LLVM_BOLT=/opt/llvm/bin/llvm-bolt" in cli.logged
+    assert "make profile-opt" not in cli.logged  # BOLT gets applied by 'make' itself, before 'make install'
+
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.11.7", "-mnone")
+    assert cli.succeeded
+    assert "Skipping BOLT: only available for cpython 3.12+ on linux" in cli.logged
+    assert "--enable-bolt" not in cli.logged
+
+    cli.run("-n", "-tmacos-arm64", "-c", "pp.yml", "build", "3.13.1", "-mnone")
+    assert cli.succeeded
+    assert "Skipping BOLT" in cli.logged
+
+    # Benchmark requires building binaries as they are before BOLT first
+    runez.write("pp.yml", "cpython-bolt: true\ncpython-bolt-benchmark: bench.py\n", logger=None)
+    cli.run("-n", "-tlinux-x86_64", "-c", "pp.yml", "build", "3.12.1", "-mnone")
+    assert cli.succeeded
+    assert "make profile-opt\n" in cli.logged
+    assert "make\nWould benchmark bench.py with binaries before and after BOLT" in cli.logged
+
+
+def test_preflight(temp_folder, monkeypatch):
+    monkeypatch.delenv("LLVM_BOLT", raising=False)
+    monkeypatch.delenv("MERGE_FDATA", raising=False)
+    monkeypatch.setattr(runez, "which", lambda x: None)
+    runez.write("pp.yml", "cpython-bolt: true\ncpython-configure: [--enable-shared]\n", logger=None)
+    PPG.grab_config("pp.yml", target="linux-x86_64")
+    setup = BuildSetup("3.13.1", modules="none")
+    bolt = setup.python_builder.bolt
+    assert str(bolt) == "BOLT python libpython3.13.so.1.0"
+    assert bolt.prebolt_rule == "build_all"
+    assert bolt.preflight_problem().startswith("llvm-bolt, merge-fdata not found")
+    assert bolt.build_information() == {"benchmark": None, "binaries": "python libpython3.13.so.1.0", "llvm-bolt": None}
+
+    # Simulate a build folder where 'make' produced the binaries
+    for name in ("python", "libpython3.13.so.1.0", "pybuilddir.txt"):
+        runez.touch(name, logger=None)
+
+    bolt.benchmark = "bench.py"
+    bolt.keep_prebolt()
+    assert runez.to_path("python.prebolt").exists()  # Next to 'pybuilddir.txt', so that it finds its stdlib
+    assert runez.to_path("prebolt/libpython3.13.so.1.0").exists()
+
+    calls = []
+
+    def fake_run(program, *args, env=None, fatal=True, **_):
+        calls.append((program, args, env, fatal))
+        return runez.program.RunResult(code=0)
+
+    monkeypatch.setenv("LD_LIBRARY_PATH", "/some/lib")
+    monkeypatch.setenv("SOME_VAR", "some-value")
+    with patch("portable_python.bolt.runez.run", side_effect=fake_run):
+        bolt.run_benchmark()
+
+    assert bolt.benchmark_result.startswith("bench.py: ")
+    assert bolt.benchmark_result.endswith("faster)")
+    assert [x[0] for x in calls] == ["./python.prebolt"] * 3 + ["./python"] * 3
+    assert all(x[1] == ("bench.py",) and not x[3] for x in calls)
+    assert all(x[2]["SOME_VAR"] == "some-value" for x in calls)  # Environment is preserved
+    assert calls[0][2]["LD_LIBRARY_PATH"] == os.pathsep.join([os.path.abspath("prebolt"), "/some/lib"])
+    assert calls[-1][2]["LD_LIBRARY_PATH"] == os.pathsep.join([os.path.abspath("."), "/some/lib"])
+
+    # A failing benchmark does not fail the build, failure is reported in build manifest
+    with patch("portable_python.bolt.runez.run", return_value=runez.program.RunResult(code=1)):
+        bolt.run_benchmark()
+
+    assert bolt.benchmark_result == "bench.py: failed with ./python.prebolt (exit code 1)"
+    assert bolt.build_information()["benchmark"] == bolt.benchmark_result
@@ -77,6 +77,9 @@ def test_finalization(cli, monkeypatch):
         assert cli.succeeded
         manifest = list(runez.readlines(f"build/ppp-marker/{f.version}/.manifest.yml"))
         assert "  some_env: some-env-value" in manifest
+        size_manifest = list(runez.readlines(f"build/ppp-marker/{f.version}/.size-report.yml"))
+        assert any(x.startswith("  lib/python3.9/_sysconfigdata__.py: ") for x in size_manifest)
+        assert "Size report:" in cli.logged
         assert "selected: bzip2" in cli.logged
         assert "Pass 1: Cleaned 1 build artifact (0 B): idle_test" in cli.logged
         assert f"PEP 668: Cleaned 2 build artifacts (0 B): pip pip{f.mm}" in cli.logged
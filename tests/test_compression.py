@@ -0,0 +1,107 @@
+import gzip
+import io
+import os
+import sys
+import tarfile
+from unittest.mock import patch
+
+import pytest
+import runez
+
+from portable_python.compression import canonical_extension, compressed_basename, Compressor, ParallelWriter
+
+
+def test_canonical_extension():
+    assert canonical_extension(None) is None
+    assert canonical_extension("foo") is None
+    assert canonical_extension("zst") == "tar.zst"
+    assert canonical_extension(".tar.zst") == "tar.zst"
+    assert canonical_extension("foo.tar.zst", short_form=True) == "zst"
+    assert canonical_extension("zip") == "zip"
+    platform = runez.system.PlatformId("linux-x86_64")
+    assert compressed_basename(platform, "cpython", "3.12.1", extension="zst") == "cpython-3.12.1-linux-x86_64.tar.zst"
+    assert compressed_basename(platform, "cpython", "3.12.1", extension="gz") == "cpython-3.12.1-linux-x86_64.tar.gz"
+
+
+def test_import_without_resource():
+    # 'resource' module is not available on Windows, it must not be needed at import time
+    script = "import sys; sys.modules['resource'] = None; import portable_python.compression"
+    r = runez.run(sys.executable, "-c", script, fatal=False, logger=None)
+    assert r.succeeded, r.full_output
+
+
+def test_parallel_writer():
+    output = io.BytesIO()
+    data = b"".join(b"line %d\n" % i for i in range(1000))
+    with ParallelWriter(output, gzip.compress, 3, chunk_size=100) as writer:
+        for i in range(0, len(data), 70):
+            writer.write(data[i : i + 70])
+
+    # Output is a concatenation of gzip members, in order
+    assert output.getvalue().count(b"\x1f\x8b\x08") > 10
+    assert gzip.decompress(output.getvalue()) == data
+
+
+def _sample_install():
+    runez.write("sample/bin/python", "#!/bin/sh\necho hello\n" * 1000, logger=None)
+    runez.write("sample/lib/foo.py", "print('foo')\n", logger=None)
+
+
+def _tarball_contents(path):
+    with tarfile.open(path) as tar:
+        return sorted(tar.getnames())
+
+
+@pytest.mark.parametrize("ext", ["bz2", "gz", "xz"])
+def test_in_process(temp_folder, ext):
+    _sample_install()
+    compressor = Compressor(ext, threads=2)
+    with patch("runez.which", return_value=None):
+        assert str(compressor) == "%s -%s, 2 threads via in-process" % (ext, compressor.level)
+        compressor.compress("sample", f"dist/sample.tar.{ext}")
+
+    assert _tarball_contents(f"dist/sample.tar.{ext}") == ["sample", "sample/bin", "sample/bin/python", "sample/lib", "sample/lib/foo.py"]
+
+    runez.decompress(f"dist/sample.tar.{ext}", "extracted", simplify=True)
+    assert list(runez.readlines("extracted/lib/foo.py")) == ["print('foo')"]
+
+
+def test_zst(cli):
+    _sample_install()
+    with patch("runez.which", return_value=None), patch("portable_python.compression._zstd_compressor", return_value=None):
+        cli.run("recompress", "sample", "zst")
+        assert cli.failed
+        assert "zst compression requires 'zstd' on PATH, or the 'zstandard' package" in cli.logged
+
+    if runez.which("zstd"):
+        runez.write("pp.yml", "compression-level:\n  zst: 3\ncompression-threads: 2\n", logger=None)
+        cli.run("-c", "pp.yml", "recompress", "sample", "zst")
+        assert cli.succeeded
+        assert "(zst -3, 2 threads via zstd)" in cli.logged
+        files = list(runez.ls_dir("dist"))
+        assert len(files) == 1
+        assert files[0].name.endswith(".tar.zst")
+
+        cli.run("-c", "pp.yml", "recompress", files[0], "gz")
+        assert cli.succeeded
+        files = [x for x in runez.ls_dir("dist") if x.name.endswith(".tar.gz")]
+        assert _tarball_contents(files[0])[-1] == "sample/lib/foo.py"
+
+
+def test_transcode(temp_folder):
+    _sample_install()
+    os.symlink("python", "sample/bin/python3")
+    os.chmod("sample/bin/python", 0o751)
+    with patch("runez.which", return_value=None), patch("portable_python.compression.CHUNK_SIZE", 1024):
+        # Multi-stream source (one stream per chunk), transcoded in-process
+        Compressor("gz", threads=2).compress("sample", "sample.tar.gz")
+        Compressor("xz", threads=2).transcode(runez.to_path("sample.tar.gz"), runez.to_path("dist/sample.tar.xz"))
+
+    Compressor("tar").transcode(runez.to_path("dist/sample.tar.xz"), runez.to_path("dist/sample.tar"))
+    for path in ("dist/sample.tar.xz", "dist/sample.tar"):
+        with tarfile.open(path) as tar:
+            assert tar.getnames() == ["sample", "sample/bin", "sample/bin/python", "sample/bin/python3", "sample/lib", "sample/lib/foo.py"]
+            assert tar.getmember("sample/bin/python3").linkname == "python"
+            assert tar.getmember("sample/bin/python").mode == 0o751
+            assert int(tar.getmember("sample/bin/python").mtime) == int(os.path.getmtime("sample/bin/python"))
+            assert tar.extractfile("sample/bin/python").read() == b"#!/bin/sh\necho hello\n" * 1000
@@ -0,0 +1,67 @@
+import runez
+
+from portable_python import cpu_level
+from portable_python.cpu_level import CPU_LEVELS, CpuLevel, installation_problem
+from portable_python.versions import PPG
+
+V3_FEATURES = "fpu cx16 lahf_lm pni popcnt sse4_1 sse4_2 ssse3 abm avx avx2 bmi1 bmi2 f16c fma movbe xsave"
+
+
+def test_build(cli):
+    cli.run("-n", "-tlinux-x86_64", "build", "3.9.7", "-mzlib", "--cpu-level", "baseline,x86-64-v3")
+    assert cli.succeeded
+    assert "Would tar build/ppp-marker/3.9.7 -> dist/cpython-3.9.7-linux-x86_64.tar.gz" in cli.logged
+    assert "Would tar build/ppp-marker/3.9.7 -> dist/cpython-3.9.7-linux-x86_64-v3.tar.gz" in cli.logged
+    assert "Platform: linux-x86_64 (cpu-level x86-64-v3)" in cli.logged
+    assert "env CFLAGS=-fPIC -march=x86-64-v3" in cli.logged  # External modules
+    assert "env CFLAGS_NODIST=-Wno-unused-command-line-argument -march=x86-64-v3" in cli.logged  # cpython itself
+    assert "env CFLAGS=-fPIC\n" in cli.logged  # Baseline build
+
+    runez.write("pp.yml", "linux:\n  aarch64:\n    cpu-level: armv8.2-a", logger=None)
+    cli.run("-n", "-tlinux-aarch64", "-c", "pp.yml", "build", "3.9.7", "-mnone")
+    assert cli.succeeded
+    assert "-> dist/cpython-3.9.7-linux-aarch64-armv8.2.tar.gz" in cli.logged
+    assert "env CFLAGS_NODIST=-Wno-unused-command-line-argument -march=armv8.2-a" in cli.logged
+
+    cli.run("-n", "-tlinux-aarch64", "build", "3.9.7", "-l", "x86-64-v3")
+    assert cli.failed
+    assert "cpu-level 'x86-64-v3' does not apply to linux-aarch64" in cli.logged
+
+    cli.run("-n", "-tlinux-x86_64", "build", "3.9.7", "-l", "foo")
+    assert cli.failed
+    assert "Unknown cpu-level 'foo', expecting one of: baseline x86-64-v2 x86-64-v3 x86-64-v4" in cli.logged
+
+
+def test_host_check(temp_folder, monkeypatch):
+    v3 = CpuLevel.from_name("x86-64-v3", target=runez.system.PlatformId("linux-x86_64"))
+    assert v3 is CPU_LEVELS["x86-64-v3"]
+    assert v3.features[:2] == ["cx16", "lahf_lm"]  # Inherited from x86-64-v2
+    assert CpuLevel.from_name("baseline") is None
+
+    monkeypatch.setattr(runez.SYS_INFO.platform_id, "arch", "x86_64")
+    monkeypatch.setattr(cpu_level, "host_cpu_features", lambda: set(V3_FEATURES.split()))
+    assert v3.host_problem() is None
+    assert (
+        CPU_LEVELS["x86-64-v4"].host_problem()
+        == "host cpu does not support x86-64-v4 (missing: avx512bw avx512cd avx512dq avx512f avx512vl)"
+    )
+    assert CPU_LEVELS["armv8.2-a"].host_problem() == "built for armv8.2-a, host is x86_64"
+
+    # Installations report the cpu-level they were built for in their manifest
+    PPG.grab_config(target="linux-x86_64")
+    runez.write("v4/.manifest.yml", "cpython:\n  cpu-level: x86-64-v4\n", logger=None)
+    runez.write("v3/.manifest.yml", "cpython:\n  cpu-level: x86-64-v3\n", logger=None)
+    runez.touch("v3/bin/python", logger=None)
+    runez.touch("v4/bin/python3.12", logger=None)
+    runez.symlink("v4/bin/python3.12", "v4/bin/python", logger=None)
+    runez.symlink("v4/bin/python", "python-v4", logger=None)
+    assert installation_problem(PPG.find_python("v3")) is None
+    assert installation_problem(PPG.find_python("v4")).startswith("host cpu does not support x86-64-v4")
+    assert installation_problem(PPG.find_python("python-v4")).startswith("host cpu does not support x86-64-v4")
+    assert installation_problem(PPG.find_python("foo")) is None
+    assert installation_problem(PPG.find_python("invoker")) is None
+
+    # x86-64-v2 implies SSE3 (named 'pni' in /proc/cpuinfo)
+    assert "pni" in CPU_LEVELS["x86-64-v2"].features
+    monkeypatch.setattr(cpu_level, "host_cpu_features", lambda: set(V3_FEATURES.split()) - {"pni"})
+    assert v3.host_problem() == "host cpu does not support x86-64-v3 (missing: pni)"
@@ -0,0 +1,165 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+
+import pytest
+import runez
+
+from portable_python.compression import Compressor
+from portable_python.delta import apply_delta, content_defined_chunks, create_delta, DELTA_FORMAT
+
+
+def _blob(seed, size):
+    """Deterministic, non-compressible sample content"""
+    blocks = (hashlib.sha256(b"%s-%d" % (seed, i)).digest() for i in range(size // 32))
+    return b"".join(blocks)
+
+
+LIB = _blob(b"lib", 256 * 1024)
+
+
+def _sample_build(folder, lib, extra=None):
+    runez.write(f"{folder}/bin/python3.9", _blob(b"python", 64 * 1024), logger=None)
+    os.chmod(f"{folder}/bin/python3.9", 0o755)
+    os.symlink("python3.9", f"{folder}/bin/python")
+    runez.write(f"{folder}/lib/libpython3.9.so", lib, logger=None)
+    runez.touch(f"{folder}/lib/python3.9/empty.py", logger=None)
+    if extra:
+        runez.write(f"{folder}/{extra}", extra, logger=None)
+
+
+def _write_tarball(path, *members):
+    """Tarball with given (TarInfo, content) members"""
+    with tarfile.open(path, "w:gz") as tar:
+        for info, content in members:
+            info.size = len(content or b"")
+            tar.addfile(info, io.BytesIO(content) if content else None)
+
+
+def _tar_info(name, kind=tarfile.REGTYPE, linkname=""):
+    info = tarfile.TarInfo(name)
+    info.type = kind
+    info.linkname = linkname
+    info.mode = 0o755 if kind == tarfile.DIRTYPE else 0o644
+    return info
+
+
+def _write_delta(path, *entries):
+    manifest = {"format": DELTA_FORMAT, "required": {}, "entries": list(entries), "stats": {"files": 0}}
+    _write_tarball(path, (_tar_info("delta.json"), json.dumps(manifest).encode()), (_tar_info("data.bin"), b""))
+
+
+def _tree_contents(folder):
+    result = {}
+    for root, dirs, files in os.walk(folder):
+        for name in dirs + files:
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, folder)
+            if os.path.islink(path):
+                result[key] = "-> %s" % os.readlink(path)
+
+            elif os.path.isfile(path):
+                result[key] = (oct(os.stat(path).st_mode), runez.checksum(path))
+
+    return result
+
+
+def test_chunks():
+    chunks = list(content_defined_chunks(LIB))
+    assert sum(x[1] for x in chunks) == len(LIB)
+    assert 10 < len(chunks) < 100
+
+    # Inserting data only affects chunks around the insertion
+    modified = LIB[:100000] + b"inserted" + LIB[100000:]
+    before = {LIB[o : o + n] for o, n in chunks}
+    after = {modified[o : o + n] for o, n in content_defined_chunks(modified)}
+    assert len(after - before) <= 2
+
+
+def test_delta(cli):
+    _sample_build("old", LIB, extra="lib/python3.9/removed.py")
+    _sample_build("new", LIB[:100000] + b"patched" + LIB[100000:], extra="lib/python3.9/added.py")
+    cli.run("delta", "old", "new", "-o", "new.delta.tar.gz")
+    assert cli.succeeded
+    assert "Delta new.delta.tar.gz: 4 files, 2 identical files" in cli.logged
+    assert os.path.getsize("new.delta.tar.gz") < len(LIB) / 4
+
+    cli.run("apply", "old", "new.delta.tar.gz", "rebuilt")
+    assert cli.succeeded
+    assert "Rebuilt rebuilt from old + new.delta.tar.gz, verified 4 files" in cli.logged
+    assert _tree_contents("rebuilt") == _tree_contents("new")
+
+    cli.run("apply", "old", "new.delta.tar.gz", "rebuilt")
+    assert cli.failed
+    assert "'rebuilt' already exists" in cli.logged
+
+    # Deltas can be computed from dist tarballs as well, and refuse to apply on a different base build
+    Compressor("xz").compress("old", "dist/old.tar.xz")
+    Compressor("gz").compress("new", "dist/new.tar.gz")
+    cli.run("delta", "dist/old.tar.xz", "dist/new.tar.gz")
+    assert cli.succeeded
+    assert "Delta new.delta.tar.gz: 4 files, 2 identical files" in cli.logged
+
+    runez.write("old/lib/libpython3.9.so", "corrupted", logger=None)
+    cli.run("apply", "old", "new.delta.tar.gz", "rebuilt2")
+    assert cli.failed
+    assert "old/lib/libpython3.9.so differs from the build this delta was made against" in cli.logged
+
+    cli.run("delta", "old", "new", "-o", "new.zip")
+    assert cli.failed
+    assert "Delta must be a tarball" in cli.logged
+
+
+def test_hardlinks(temp_folder):
+    _sample_build("old", LIB)
+    _write_tarball(
+        "new.tar.gz",
+        (_tar_info("new", tarfile.DIRTYPE), None),
+        (_tar_info("new/lib", tarfile.DIRTYPE), None),
+        (_tar_info("new/lib/libpython3.9.so"), LIB),
+        (_tar_info("new/lib/libpython3.so", tarfile.LNKTYPE, "new/lib/libpython3.9.so"), None),
+    )
+    create_delta("old", "new.tar.gz", "new.delta.tar.gz", logger=None)
+    apply_delta("old", "new.delta.tar.gz", "rebuilt", logger=None)
+    assert os.path.samefile("rebuilt/lib/libpython3.so", "rebuilt/lib/libpython3.9.so")
+    assert runez.checksum("rebuilt/lib/libpython3.so") == runez.checksum("old/lib/libpython3.9.so")
+
+    # Other special members can't be represented in a delta
+    _write_tarball("fifo.tar.gz", (_tar_info("new", tarfile.DIRTYPE), None), (_tar_info("new/fifo", tarfile.FIFOTYPE), None))
+    with pytest.raises(runez.system.AbortException, match="unsupported member type for new/fifo"):
+        create_delta("old", "fifo.tar.gz", "fifo.delta.tar.gz", logger=None)
+
+    _write_tarball("outside.tar.gz", (_tar_info("new", tarfile.DIRTYPE), None), (_tar_info("new/x", tarfile.LNKTYPE, "other/x"), None))
+    with pytest.raises(runez.system.AbortException, match="hardlink new/x points outside of new/"):
+        create_delta("old", "outside.tar.gz", "outside.delta.tar.gz", logger=None)
+
+
+def test_unsafe_delta(temp_folder):
+    runez.ensure_folder("old", logger=None)
+    file = {"type": "file", "mode": 0o644, "mtime": 0, "size": 0, "sha256": hashlib.sha256(b"").hexdigest(), "chunks": []}
+    unsafe = {
+        "unsafe path ../evil": [dict(file, path="../evil")],
+        "unsafe path /tmp/evil": [dict(file, path="/tmp/evil")],
+        "unsafe path ../../etc": [{"path": "link", "type": "symlink", "target": "../../etc"}],
+        "link is an absolute symlink": [{"path": "link", "type": "symlink", "target": "/etc"}],
+        "link/evil would be written through a symlink": [
+            {"path": "bin", "type": "dir", "mode": 0o755, "mtime": 0},
+            {"path": "link", "type": "symlink", "target": "bin"},
+            dict(file, path="link/evil"),
+        ],
+        "hardlink evil must point to a file rebuilt before it": [
+            {"path": "link", "type": "symlink", "target": "bin"},
+            {"path": "evil", "type": "hardlink", "target": "link"},
+        ],
+        "unsafe path ../old/x": [dict(file, path="x", copy="../old/x", chunks=None)],
+    }
+    for i, (message, entries) in enumerate(unsafe.items()):
+        _write_delta(f"unsafe{i}.tar.gz", *entries)
+        with pytest.raises(runez.system.AbortException, match=message):
+            apply_delta("old", f"unsafe{i}.tar.gz", f"rebuilt{i}", logger=None)
+
+    assert sorted(os.listdir(".")) == ["old"] + [f"rebuilt{i}" for i in range(len(unsafe))] + [
+        f"unsafe{i}.tar.gz" for i in range(len(unsafe))
+    ]
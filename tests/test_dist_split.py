@@ -0,0 +1,101 @@
+import os
+import tarfile
+
+import runez
+import yaml
+
+from portable_python.compression import Compressor
+from portable_python.dist_split import DistSplit
+from portable_python.versions import PPG
+
+SAMPLE_CONFIG = """
+dist-split:
+  static: libpython*.a
+  dev: include/ lib/python{mm}/config-*/ bin/python*-config
+  tk: tkinter/ idlelib/
+  ensurepip: ensurepip/
+"""
+
+
+def _tarball_contents(path):
+    with tarfile.open(path) as tar:
+        return sorted(x.name for x in tar.getmembers() if not x.isdir())
+
+
+def test_dist_split(temp_folder):
+    runez.write("pp.yml", SAMPLE_CONFIG, logger=None)
+    PPG.grab_config("pp.yml", target="linux-x86_64")
+    folders = PPG.get_folders(base=".", version="3.12.1")
+    install = runez.to_path("3.12.1").absolute()
+    for path in (
+        "bin/python3.12",
+        "bin/python3.12-config",
+        "include/python3.12/Python.h",
+        "lib/libpython3.12.a",
+        "lib/python3.12/os.py",
+        "lib/python3.12/config-3.12-x86_64-linux-gnu/Makefile",
+        "lib/python3.12/config-3.12-x86_64-linux-gnu/libpython3.12.a",
+        "lib/python3.12/ensurepip/__init__.py",
+        "lib/python3.12/tkinter/__init__.py",
+    ):
+        runez.write(install / path, path, logger=None)
+
+    os.symlink("python3.12", install / "bin/python3")
+    runez.ensure_folder(install / "lib/python3.12/site-packages", logger=None)
+
+    split = DistSplit.from_config(folders)
+    manifest = split.write(Compressor("gz"), install, runez.to_path("dist/cpython-3.12.1-linux-x86_64.tar.gz").absolute())
+    assert sorted(os.listdir("dist")) == [
+        "cpython-3.12.1-linux-x86_64-dev.tar.gz",
+        "cpython-3.12.1-linux-x86_64-ensurepip.tar.gz",
+        "cpython-3.12.1-linux-x86_64-static.tar.gz",
+        "cpython-3.12.1-linux-x86_64-tk.tar.gz",
+        "cpython-3.12.1-linux-x86_64.components.yml",
+        "cpython-3.12.1-linux-x86_64.tar.gz",
+    ]
+    assert _tarball_contents("dist/cpython-3.12.1-linux-x86_64.tar.gz") == [
+        "3.12.1/bin/python3",
+        "3.12.1/bin/python3.12",
+        "3.12.1/lib/python3.12/os.py",
+    ]
+    with tarfile.open("dist/cpython-3.12.1-linux-x86_64.tar.gz") as tar:
+        assert tar.getmember("3.12.1/lib/python3.12/site-packages").isdir()  # Empty folders are kept
+
+    # Deepest match wins: static lib in config folder goes to 'static', the rest of the config folder goes to 'dev'
+    assert _tarball_contents("dist/cpython-3.12.1-linux-x86_64-static.tar.gz") == [
+        "3.12.1/lib/libpython3.12.a",
+        "3.12.1/lib/python3.12/config-3.12-x86_64-linux-gnu/libpython3.12.a",
+    ]
+    assert _tarball_contents("dist/cpython-3.12.1-linux-x86_64-dev.tar.gz") == [
+        "3.12.1/bin/python3.12-config",
+        "3.12.1/include/python3.12/Python.h",
+        "3.12.1/lib/python3.12/config-3.12-x86_64-linux-gnu/Makefile",
+    ]
+
+    data = yaml.safe_load("\n".join(runez.readlines(manifest)))
+    assert list(data["components"]) == ["core", "static", "dev", "tk", "ensurepip"]
+    assert data["components"]["core"]["files"] == 4
+    assert data["components"]["tk"]["paths"] == ["lib/python3.12/tkinter/__init__.py"]
+    assert data["components"]["ensurepip"]["sha256"] == runez.checksum("dist/cpython-3.12.1-linux-x86_64-ensurepip.tar.gz")
+
+    # All components extracted on top of each other yield the full installation
+    for name in os.listdir("dist"):
+        if name.endswith(".tar.gz"):
+            with tarfile.open(f"dist/{name}") as tar:
+                tar.extractall("extracted")
+
+    expected = sorted(str(x.relative_to(install.parent)) for x in [install, *install.rglob("*")])
+    assert sorted(str(x.relative_to("extracted")) for x in runez.to_path("extracted").rglob("*")) == expected
+
+
+def test_dist_split_dryrun(cli):
+    runez.write("pp.yml", SAMPLE_CONFIG, logger=None)
+    cli.run("-n", "-c", "pp.yml", "-tlinux-x86_64", "build", "3.12.1", "-mnone")
+    assert cli.succeeded
+    assert "Would split " in cli.logged
+    assert "-> dist/cpython-3.12.1-linux-x86_64.tar.gz (static: libpython*.a; dev: include/" in cli.logged
+
+    runez.write("pp.yml", "dist-split:\n  core: include/\n", logger=None)
+    cli.run("-n", "-c", "pp.yml", "-tlinux-x86_64", "build", "3.12.1", "-mnone")
+    assert cli.failed
+    assert "Invalid 'dist-split' component 'core'" in cli.logged
@@ -1,11 +1,16 @@
 import builtins
 import os
+import struct
 import sys
 from unittest.mock import patch
 
 import runez
 
-from portable_python.inspector import find_libs, LibAutoCorrect, LibType, PPG, PythonInspector, SoInfo
+from portable_python.elf import ElfFile
+from portable_python.inspect_cache import InspectionCache
+from portable_python.inspector import find_libs, find_native_files, LibAutoCorrect, LibType, PPG, PythonInspector, SoInfo
+from portable_python.ldso import CACHE_MAGIC_NEW, LdSoCache, LdSoResolver
+from portable_python.macho import MachOFile
 
 
 def test_find_libs(temp_folder):
@@ -21,6 +26,40 @@ def test_find_libs(temp_folder):
     assert x == ["lib-foo.a", "lp.dylib", "lp.so", "lp.so.1.0", "python3.9/config-3.9/libpython3.9.so"]
 
 
+def test_find_native_files(sample_elf, sample_macho):
+    sample_elf("bin/python3.9")
+    runez.write("bin/pip", "#!/usr/bin/env python", logger=None)
+    runez.make_executable("bin/pip", logger=None)
+    os.symlink("python3.9", "bin/python")
+    site_packages = "lib/python3.9/site-packages"
+    sample_elf(f"{site_packages}/foo/_ext.cpython-39-x86_64-linux-gnu.so", needed=["libbar-1a2b3c.so.1"])
+    sample_elf(f"{site_packages}/foo.libs/libbar-1a2b3c.so.1")
+    sample_macho(f"{site_packages}/foo/_mac.cpython-39-darwin.so")
+    sample_elf(f"{site_packages}/foo/__pycache__/pruned.so")
+    sample_elf(f"{site_packages}/foo-1.0.dist-info/pruned.so")
+    sample_elf(f"{site_packages}/foo/data.bin")  # Not executable, and not named like a lib
+    runez.make_executable(f"{site_packages}/foo/data.bin", logger=None)
+    os.chmod(f"{site_packages}/foo/data.bin", 0o644)
+    runez.write(f"{site_packages}/foo/fake.so", "not a lib", logger=None)
+    x = [str(x) for x in find_native_files(".")]
+    assert x == [
+        "bin/python3.9",
+        f"{site_packages}/foo/_ext.cpython-39-x86_64-linux-gnu.so",
+        f"{site_packages}/foo/_mac.cpython-39-darwin.so",
+        f"{site_packages}/foo.libs/libbar-1a2b3c.so.1",
+    ]
+    assert not list(find_native_files("no-such-folder"))
+
+
+def test_deep_scan():
+    regular = PythonInspector("invoker").full_so_report
+    deep = PythonInspector("invoker", deep=True).full_so_report
+    regular_paths = [x.relative_path for x in regular.lib_tracker.items]
+    deep_paths = [x.relative_path for x in deep.lib_tracker.items]
+    assert deep_paths[: len(regular_paths)] == regular_paths
+    assert len(deep_paths) > len(regular_paths)  # At least the python exe itself is scanned in deep mode
+
+
 def test_inspect_python(temp_folder, monkeypatch):
     PPG.grab_config("foo.yml")
     inspector = PythonInspector("invoker")
@@ -46,54 +85,214 @@ def test_inspect_python(temp_folder, monkeypatch):
     assert problem.startswith("Uses system libs:")
 
 
-OTOOL_SAMPLE = """
-.../test-sample.so:
- ....../foo/bar.dylib (compatibility version 8.0.0, current version 8.4.0)
- /usr/local/opt/gdbm/lib/libgdbm_compat.4.dylib (compatibility version 5.0.0, current version 5.0.0)
- @rpath/libssl.45.dylib (compatibility version 46.0.0, current version 46.1.0)
- /usr/lib/libncurses.5.4.dylib (compatibility version 5.4.0, current version 5.4.0)
- /usr/lib/libSystem.B.dylib (compatibility version 1.0.0, current version 1281.0.0)
-"""
-
-LDD_SAMPLE = """
-    linux-vdso.so.1 => (...)
-    libpython3.6m.so.1.0 => /BASE/lib/libpython3.6m.dylib.1.0 (...)  # basename taken from left side
-    libtcl8.6.so => /usr/lib/x86_64-linux-gnu/libtcl8.6.so (...)
-    libtinfo.so.5 => not found
-    libbz2.so.1.0 => /lib/x86_64-linux-gnu/libbz2.so.1.0 (...)
-    libc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (...)
-    librt.so.1 => /lib/x86_64-linux-gnu/librt.so.1 (...)
-    /lib64/ld-linux-x86-64.so.2 (...)
-"""
+def test_import_cost():
+    inspector = PythonInspector("invoker", modules="_ctypes,zlib,foo", import_cost=True)
+    assert inspector.module_info["_ctypes"].import_time >= 0
+    assert inspector.module_info["foo"].import_cost_cells() == (None, None, None)
+    assert "import time" in inspector.represented()
+    assert "import time" not in PythonInspector("invoker", modules="zlib").represented()
+
+
+def test_parallel_scan():
+    serial = PythonInspector("invoker", jobs=1)
+    parallel = PythonInspector("invoker", jobs=4)
+    assert serial.full_so_report.jobs == 1
+    assert parallel.full_so_report.jobs == 4
+    assert str(serial.full_so_report) == str(parallel.full_so_report)
+    assert serial.represented(verbose=True) == parallel.represented(verbose=True)
+
+
+def test_streamed_records():
+    inspector = PythonInspector("invoker", jobs=1)
+    parsed = []
+    real_parsed_file = SoInfo.parsed_file
+
+    def tracked_parsed_file(path):
+        parsed.append(path)
+        return real_parsed_file(path)
+
+    with patch("portable_python.inspector.SoInfo.parsed_file", side_effect=tracked_parsed_file):
+        records = inspector.report_records()
+        assert next(records)["type"] == "python"
+        record = next(records)
+        while record["type"] == "module":
+            scanned_by_modules = len(parsed)  # Modules report on their own .so file (if any)
+            record = next(records)
+
+        assert record["type"] == "so"
+        assert len(parsed) == scanned_by_modules + 1  # First .so record is produced as soon as its file is scanned
+        remaining = list(records)
+
+    so_infos = inspector.full_so_report.lib_tracker.items
+    so_scanned = parsed[scanned_by_modules:]
+    assert len(so_infos) > 1
+    assert len(so_scanned) >= len(so_infos)  # Same lib can be reached via several paths (symlinks)
+    assert len(set(so_scanned)) == len(so_scanned)  # Records were produced as scan went, no file got scanned twice
+    assert [record] + [x for x in remaining if x["type"] == "so"] == [x.to_dict() for x in so_infos]
+    assert remaining[-1]["type"] == "so-report"
+
+
+LDD_SAMPLE = [
+    ("libpython3.6m.so.1.0", "/BASE/lib/libpython3.6m.dylib.1.0"),  # basename taken from DT_NEEDED entry
+    ("libtcl8.6.so", "/usr/lib/x86_64-linux-gnu/libtcl8.6.so"),
+    ("libtinfo.so.5", None),
+    ("libbz2.so.1.0", "/lib/x86_64-linux-gnu/libbz2.so.1.0"),
+    ("libc.so.6", "/lib/x86_64-linux-gnu/libc.so.6"),
+    ("librt.so.1", "/lib/x86_64-linux-gnu/librt.so.1"),
+    (None, "/lib64/ld-linux-x86-64.so.2"),
+]
 
 
 def test_inspect_lib(logged):
     inspector = PythonInspector("invoker")
-    with patch("runez.which", return_value="yup"):
-        not_there = SoInfo(inspector, "/dev/null/foo.platform.so")
-        assert str(not_there) == "foo*!.so"
-        assert not_there.is_failed
-        assert not_there.is_problematic
-        assert not_there.size == 0
-        assert "otool exited with code" in logged.pop()
-        assert inspector.libpython_report([not_there])  # Verify no crash, edge case testing
-
-    with patch("runez.which", return_value=None):
-        PPG.grab_config(target="macos-x86_64")
-        info1 = SoInfo(inspector, "_dbm...so")
-        assert str(info1) == "_dbm*!.so"
-        info1.parse_otool(OTOOL_SAMPLE)
-        r = info1.represented()
-        assert r == "_dbm*!.so foo/bar.dylib:8.4.0 /usr/local/opt/gdbm/lib/libgdbm_compat.4.dylib:5.0.0 ncurses:5.4.0"
-        rv = info1.represented(verbose=True)
-        assert "[base] @rpath/libssl.45.dylib 46.1.0" in rv
-
-        PPG.grab_config(target="linux-x86_64")
-        inspector.install_folder = "/BASE"
-        info2 = SoInfo(inspector, "_tkinter...so")
-        info2.parse_ldd(LDD_SAMPLE)
-        r = info2.represented()
-        assert r == "_tkinter*!.so missing: tinfo:5 libpython3.6m.so.1.0 tcl8:8.6 bz2:1.0"
+    not_there = SoInfo(inspector, "/dev/null/foo.platform.so")
+    assert str(not_there) == "foo*!.so"
+    assert not_there.is_failed
+    assert not_there.is_problematic
+    assert not_there.size == 0
+    assert "not an ELF or Mach-O file" in logged.pop()
+    assert inspector.libpython_report([not_there])  # Verify no crash, edge case testing
+
+    PPG.grab_config(target="linux-x86_64")
+    inspector.install_folder = "/BASE"
+    info = SoInfo(inspector, "_tkinter...so", listing=("elf", LDD_SAMPLE))
+    r = info.represented()
+    assert r == "_tkinter*.so missing: tinfo:5 libpython3.6m.so.1.0 tcl8:8.6 bz2:1.0"
+
+
+def _sample_ld_so_cache(path, entries):
+    """Write a new-format ld.so.cache file, with given (name, path) entries"""
+    strings = b""
+    offsets = []
+    header_size = 48 + 24 * len(entries)
+    for name, value in entries:
+        offsets.append((header_size + len(strings), header_size + len(strings) + len(name) + 1))
+        strings += name.encode() + b"\0" + value.encode() + b"\0"
+
+    content = CACHE_MAGIC_NEW + struct.pack("=IIB3xI12x", len(entries), len(strings), 0, 0)
+    content += b"".join(struct.pack("=iIIIQ", 0x303, key, value, 0, 0) for key, value in offsets)
+    runez.write(path, content + strings, logger=None)
+
+
+def test_ldso(sample_elf):
+    interpreter = "/lib64/ld-linux-x86-64.so.2"
+    sample_elf("bin/python", rpath="$ORIGIN/../lib", needed=["libfoo.so", "libc.so.6"], runpath=False, interpreter=interpreter)
+    sample_elf("lib/libfoo.so", needed=["libbar.so", "libmissing.so", "libc.so.6"])
+    sample_elf("lib/libbar.so", needed=["libbaz.so"], rpath="/no/such/folder")
+    sample_elf("other/libbaz.so", needed=["ld-linux-x86-64.so.2"])
+    sample_elf("cached/libc.so.6")
+    runez.write("other/libc.so.6", "not an ELF file", logger=None)
+    lib_folder = os.path.join(os.path.abspath("bin"), "../lib")
+    _sample_ld_so_cache("ld.so.cache", [("libc.so.6", "other/libc.so.6"), ("libc.so.6", "cached/libc.so.6")])
+    cache = LdSoCache("ld.so.cache")
+    assert str(cache) == "ld.so.cache (1 entries)"
+    assert cache.candidates("libc.so.6") == ["other/libc.so.6", "cached/libc.so.6"]
+
+    resolver = LdSoResolver(ld_library_path="::other", cache=cache)
+    assert resolver.ld_library_path == ["other"]
+    python = ElfFile("bin/python")
+    assert resolver.resolved(python) == [
+        ("libfoo.so", f"{lib_folder}/libfoo.so"),
+        ("libc.so.6", "cached/libc.so.6"),  # First cached entry is not a valid ELF file
+        ("libbar.so", f"{lib_folder}/libbar.so"),  # Found via DT_RPATH of main exe
+        ("libmissing.so", None),
+        ("libbaz.so", "other/libbaz.so"),  # Found via LD_LIBRARY_PATH
+        (None, "/lib64/ld-linux-x86-64.so.2"),
+    ]
+
+    # Libs have no PT_INTERP, the loader is still reported when needed (same as 'ldd')
+    assert resolver.resolved(ElfFile("other/libbaz.so")) == [(None, "/lib64/ld-linux-x86-64.so.2")]
+    assert resolver.resolved(ElfFile("cached/libc.so.6")) == []
+
+    # Libs without any dependencies are not considered failed
+    PPG.grab_config(target="linux-x86_64")
+    info = SoInfo(PythonInspector("invoker"), "cached/libc.so.6")
+    assert not info.is_failed
+    assert not info.lib_tracker.items
+
+    # DT_RUNPATH of main exe is not used for transitive dependencies
+    sample_elf("bin/python", rpath="$ORIGIN/../lib", needed=["libfoo.so"], runpath=True)
+    resolver = LdSoResolver(ld_library_path="", cache=LdSoCache("no-such-cache"))
+    assert resolver.resolved(ElfFile("bin/python"))[:3] == [
+        ("libfoo.so", f"{lib_folder}/libfoo.so"),
+        ("libbar.so", None),
+        ("libmissing.so", None),
+    ]
+
+    # Explicit paths in DT_NEEDED
+    sample_elf("bin/tool", needed=["${ORIGIN}/../lib/libbar.so", "/no/such/lib.so"])
+    assert resolver.resolved(ElfFile("bin/tool")) == [
+        ("${ORIGIN}/../lib/libbar.so", os.path.join(os.path.abspath("bin"), "../lib/libbar.so")),
+        ("/no/such/lib.so", None),
+        ("libbaz.so", None),
+    ]
+
+
+def test_inspection_cache(sample_elf, logged):
+    sample_elf("lib/foo.so", needed=["libfoo.so"], rpath="$ORIGIN")
+    parsed = SoInfo.parsed_file("lib/foo.so")
+    with InspectionCache("cache/inspect.sqlite") as cache:
+        assert cache.get("lib/foo.so") is None
+        cache.put("lib/foo.so", parsed)
+        cache.put("no-such-file.so", ("elf", {}))  # Ignored
+        cache.put("foo.so.txt", (None, None))  # Failed inspections are not cached
+
+    resolver = LdSoResolver(ld_library_path="", cache=LdSoCache("no-such-cache"))
+    with InspectionCache("cache/inspect.sqlite") as cache:
+        cached = cache.get("lib/foo.so")
+        assert cached == parsed
+        assert cache.get("no-such-file.so") is None
+        assert str(cache) == "cache/inspect.sqlite (1 hits, 1 misses)"
+        assert SoInfo.resolved_listing("lib/foo.so", cached, resolver=resolver) == ("elf", [("libfoo.so", None)])
+
+        # Dependencies are not cached, they're resolved again on each run
+        sample_elf("lib/libfoo.so")
+        resolver = LdSoResolver(ld_library_path="", cache=LdSoCache("no-such-cache"))
+        expected = ("elf", [("libfoo.so", os.path.join(os.path.abspath("lib"), "libfoo.so"))])
+        assert SoInfo.resolved_listing("lib/foo.so", cached, resolver=resolver) == expected
+
+        # Modified file is re-inspected
+        sample_elf("lib/foo.so", needed=["libfoo.so", "libbar.so"])
+        assert cache.get("lib/foo.so") is None
+
+        cache.put("lib/foo.so", SoInfo.parsed_file("lib/foo.so"))
+        assert cache.get("lib/foo.so")
+
+    # Entries written with another cache format are not used, even with the same portable-python version
+    with patch("portable_python.inspect_cache.CACHE_FORMAT", -1), InspectionCache("cache/inspect.sqlite") as cache:
+        assert cache.get("lib/foo.so") is None
+
+    # Unusable cache does not prevent inspection
+    runez.ensure_folder("cache/bogus.sqlite", logger=None)
+    with InspectionCache("cache/bogus.sqlite") as cache:
+        assert cache.get("lib/foo.so") is None
+        cache.put("lib/foo.so", parsed)
+        assert "Can't use inspection cache cache/bogus.sqlite" in logged.pop()
+
+
+def test_inspect_macho(sample_macho):
+    PPG.grab_config(target="macos-arm64")
+    inspector = PythonInspector("invoker")
+    dylibs = ["/usr/local/opt/gdbm/lib/libgdbm_compat.4.dylib", "@rpath/libssl.45.dylib", "/usr/lib/libSystem.B.dylib"]
+    sample_macho("_dbm.cpython-39-darwin.so", dylibs=dylibs, fat=True)
+    info = SoInfo(inspector, "_dbm.cpython-39-darwin.so")
+    assert not info.is_failed
+    assert info.represented() == "_dbm*.so /usr/local/opt/gdbm/lib/libgdbm_compat.4.dylib:1.2.3"
+    assert "[base] @rpath/libssl.45.dylib 1.2.3" in info.represented(verbose=True)
+
+    sample_macho("libfoo.dylib", install_name="@rpath/libfoo.dylib", rpaths=["@loader_path/.."])
+    macho = MachOFile.from_path("libfoo.dylib")
+    assert str(macho) == "libfoo.dylib"
+    assert macho.install_name == "@rpath/libfoo.dylib"
+    assert macho.rpaths == ["@loader_path/.."]
+    assert not macho.dylibs
+
+    # Edge cases
+    runez.write("java.class", b"\xca\xfe\xba\xbe\x00\x00\x00\x41", logger=None)
+    runez.write("truncated", b"\xcf\xfa\xed\xfe", logger=None)
+    assert MachOFile.from_path("java.class") is None
+    assert MachOFile.from_path("truncated") is None
+    assert MachOFile.from_path("no-such-file") is None
 
 
 def test_inspect_module(logged):
@@ -113,6 +312,15 @@ def test_inspect_module(logged):
     _inspect.main("sysconfig")
     assert "VERSION:" in logged.pop()
 
+    _inspect.main("zlib,foo-bar", "--import-cost")
+    output = logged.pop()
+    assert '"import_allocated":' in output
+    assert '"import_time":' in output
+    assert _inspect.measured_import_cost("foo-bar") == {}
+    assert _inspect.import_cost("os")["import_time"] >= 0
+    _inspect.main("--import-cost", "json", "traced")
+    assert '"import_allocated":' in logged.pop()
+
     assert _inspect.pymodule_version_info("key", b"1.2", None) == {"version_field": "key", "version": "1.2"}
     assert _inspect.pymodule_version_info("key", (1, 2), None) == {"version_field": "key", "version": "1.2"}
     with patch("portable_python.external._inspect.pymodule_version_info", side_effect=Exception):
@@ -127,23 +335,10 @@ def test_inspect_module(logged):
 class MockSharedExeRun:
     def __init__(self, platform, prefix):
         PPG.grab_config(target=f"{platform}-x86_64")
-        self.program_handler = getattr(self, "_%s_run" % platform)
         self.prefix = prefix
         self.called = []
 
-    def _linux_run(self, *args):
-        if args[1] == "--print-rpath":
-            return self.prefix
-
-    def _macos_run(self, program, *_):
-        if program == "otool":
-            return f"foo/bin/python:\n {self.prefix}/lib/libpython3.9.dylib (...)\n /usr/lib/... (...)"
-
     def __call__(self, *args, **_):
-        x = self.program_handler(*args)
-        if x is not None:
-            return runez.program.RunResult(code=0, output=x)
-
         with runez.Anchored(os.getcwd()):
             self.called.append(runez.quoted(*args))
             return runez.program.RunResult(code=0)
@@ -157,11 +352,13 @@ class MockSharedExeRun:
         self.mock.stop()
 
 
-def test_lib_auto_correct(temp_folder):
-    runez.touch("foo/bin/python", logger=None)
-    runez.make_executable("foo/bin/python", logger=None)
-    runez.touch("foo/lib/libpython3.9.dylib", logger=None)
-    runez.touch("foo/lib/bar/baz.dylib", logger=None)
+def test_lib_auto_correct(sample_elf, sample_macho):
+    libpython = "/3.9.6/lib/libpython3.9.dylib"
+    sample_macho("foo/bin/python", dylibs=[libpython, "/usr/lib/libSystem.B.dylib"])
+    sample_macho("foo/lib/libpython3.9.dylib", dylibs=["/usr/lib/libSystem.B.dylib"], install_name=libpython)
+    sample_macho("foo/lib/bar/baz.dylib", dylibs=[libpython], rpaths=["@loader_path/.."], install_name="@rpath/baz.dylib", fat=True)
+    runez.write("foo/bin/some-script", "#!/bin/sh\necho hello\n", logger=None)
+    runez.make_executable("foo/bin/some-script", logger=None)
     foo_path = runez.to_path("foo").absolute()
     with MockSharedExeRun("macos", "/3.9.6") as m:
         ac = LibAutoCorrect(m.prefix, foo_path)
@@ -169,30 +366,63 @@ def test_lib_auto_correct(temp_folder):
         expected = [
             "install_name_tool -add_rpath @executable_path/../lib foo/bin/python",
             "install_name_tool -change /3.9.6/lib/libpython3.9.dylib @rpath/libpython3.9.dylib foo/bin/python",
-            "install_name_tool -add_rpath @loader_path/.. foo/lib/bar/baz.dylib",
             "install_name_tool -change /3.9.6/lib/libpython3.9.dylib @rpath/libpython3.9.dylib foo/lib/bar/baz.dylib",
         ]
         assert m.called == expected
 
+    _sample_elfs(sample_elf, foo_path, "/3.9.6")
     with MockSharedExeRun("linux", "/3.9.6") as m:
         ac = LibAutoCorrect(m.prefix, foo_path)
         ac.run()
-        expected = [
-            "patchelf --set-rpath /3.9.6/lib:$ORIGIN/../lib foo/bin/python",
-            "patchelf --set-rpath /3.9.6/lib:$ORIGIN/.. foo/lib/bar/baz.dylib",
-            "patchelf --set-rpath /3.9.6/lib:$ORIGIN/. foo/lib/libpython3.9.dylib",
-        ]
-        assert m.called == expected
-
+        # Only the exe needed a longer rpath, the 2 libs got auto-corrected in place
+        assert m.called == ["patchelf --set-rpath /3.9.6/lib:$ORIGIN/../lib foo/bin/python"]
+        assert ElfFile(foo_path / "lib/bar/baz.dylib").runpath == "/3.9.6/lib:$ORIGIN/.."
+        libpython = ElfFile(foo_path / "lib/libpython3.9.dylib")
+        assert libpython.rpath is None  # DT_RPATH got turned into DT_RUNPATH, like patchelf does
+        assert libpython.runpath == "/3.9.6/lib:$ORIGIN/."
+        assert libpython.needed == ["libc.so.6"]
+
+    _sample_elfs(sample_elf, foo_path, "/ppp-marker/3.9.6")
     with MockSharedExeRun("linux", "/ppp-marker/3.9.6") as m:
         ac = LibAutoCorrect(m.prefix, foo_path, ppp_marker=m.prefix)
         ac.run()
-        expected = [
-            "patchelf --set-rpath $ORIGIN/../lib foo/bin/python",
-            "patchelf --set-rpath $ORIGIN/..:$ORIGIN/../lib foo/lib/bar/baz.dylib",
-            "patchelf --set-rpath $ORIGIN/.:$ORIGIN/../lib foo/lib/libpython3.9.dylib",
-        ]
-        assert m.called == expected
+        assert not m.called
+        assert ElfFile(foo_path / "bin/python").runpath == "$ORIGIN/../lib"
+        assert ElfFile(foo_path / "lib/bar/baz.dylib").runpath == "$ORIGIN/..:$ORIGIN/../lib"
+        assert ElfFile(foo_path / "lib/libpython3.9.dylib").runpath == "$ORIGIN/.:$ORIGIN/../lib"
+
+
+def _sample_elfs(sample_elf, folder, prefix):
+    rpath = f"{prefix}/lib:{prefix}/lib64"  # Same as what `Cpython.xenv_LDFLAGS_NODIST()` does
+    sample_elf(folder / "bin/python", rpath=rpath, interpreter="/lib64/ld-linux-x86-64.so.2")
+    sample_elf(folder / "lib/bar/baz.dylib", rpath=rpath, needed=["libpython3.9.so.1.0"])
+    sample_elf(folder / "lib/libpython3.9.dylib", rpath=rpath, needed=["libc.so.6"], runpath=False)
+
+
+def test_elf_edge_cases(sample_elf):
+    runez.write("not-elf", "#!/bin/sh\n", logger=None)
+    runez.write("truncated", b"\x7fELF", logger=None)
+    assert ElfFile.from_path("not-elf") is None
+    assert ElfFile.from_path("truncated") is None
+    assert ElfFile.from_path("no-such-file") is None
+
+    sample_elf("no-rpath", needed=["libc.so.6"], soname="libfoo.so.1")
+    elf = ElfFile.from_path("no-rpath")
+    assert str(elf) == "no-rpath"
+    assert elf.soname == "libfoo.so.1"
+    assert elf.effective_rpath is None
+    assert not elf.set_rpath("$ORIGIN")  # Nothing to rewrite in place
+
+    # A DT_NEEDED string tail-merged into the rpath string would get corrupted by an in place rewrite
+    sample_elf("merged", rpath="/prefix/lib:/prefix/libfoo.so", merged="libfoo.so")
+    elf = ElfFile("merged")
+    assert elf.needed == ["libfoo.so"]
+    assert not elf.can_set_rpath("$ORIGIN/../lib")
+    assert not elf.set_rpath("$ORIGIN/../lib")
+    assert ElfFile("merged").needed == ["libfoo.so"]
+
+    sample_elf("not-merged", rpath="/prefix/lib:/prefix/libfoo.so", needed=["libfoo.so"])
+    assert ElfFile("not-merged").set_rpath("$ORIGIN/../lib")
 
 
 def test_tool_version():
@@ -1,15 +1,33 @@
+import json
+import os
 import re
 import sys
 
+import runez
+
+from portable_python.inspector import inspection_targets
+
 
 def test_invoker(cli):
-    cli.run("-v", "inspect", "invoker", "-v", "-mall")
+    runez.write("pp.yml", "inspect-cache: inspect.sqlite", logger=None)
+    cli.run("-v", "-c", "pp.yml", "inspect", "invoker", "-v", "-mall")
 
     # Invoker may not be completely clean, but it has to have at least one OK .so usage
-    m = re.search(r"^\.so files: .+, (\d+) OK", cli.logged.stdout.contents(), re.MULTILINE)
+    output = cli.logged.stdout.contents()
+    m = re.search(r"^\.so files: .+, (\d+) OK", output, re.MULTILINE)
     assert m
     reported = int(m.group(1))
     assert reported > 0
+    assert "Inspection cache: inspect.sqlite (0 hits" in cli.logged
+
+    # Second run gets everything from cache, with same outcome
+    cli.run("-v", "-c", "pp.yml", "inspect", "invoker", "-v", "-mall")
+    assert cli.logged.stdout.contents() == output
+    assert "hits, 0 misses)" in cli.logged
+
+    cli.run("-v", "-c", "pp.yml", "inspect", "invoker", "-v", "-mall", "--no-cache")
+    assert cli.logged.stdout.contents() == output
+    assert "Inspection cache" not in cli.logged
 
 
 def test_module_invocation(cli):
@@ -20,3 +38,58 @@ def test_module_invocation(cli):
 def test_relativize(cli):
     cli.run("lib-auto-correct", sys.executable)
     assert cli.succeeded
+
+
+def test_inspect_several(cli):
+    runez.touch("apps/python3.8/bin/python3", logger=None)
+    runez.touch("apps/python3.9/bin/python3", logger=None)
+    runez.touch("apps/other/README", logger=None)
+    apps = os.path.abspath("apps")
+    expected = [f"{apps}/python3.8", f"{apps}/python3.9"]
+    assert inspection_targets(["apps"]) == expected
+    assert inspection_targets(["apps/python*", "apps/python3.8"]) == expected
+    assert inspection_targets(["apps/other", "invoker", "invoker"]) == [f"{apps}/other", "invoker"]
+    assert inspection_targets(["apps/foo*"]) == []
+
+    cli.run("inspect", "apps/foo*")
+    assert cli.failed
+    assert "No python installations found in apps/foo*" in cli.logged
+
+    cli.run("inspect", "-s", "-j2", "invoker", "apps/other")
+    assert cli.failed
+    assert "2 installations inspected, 1 problematic" in cli.logged
+    lines = [x.strip() for x in cli.logged.stdout.contents().splitlines() if x.strip()]
+    assert lines[1].startswith("invoker ")
+    assert lines[1].endswith(" OK")
+    assert lines[2].startswith("apps/other ")
+
+    cli.run("inspect", "-s", "invoker", sys.executable)
+    assert cli.succeeded
+    assert "2 installations inspected, 0 problematic" in cli.logged
+
+    cli.run("inspect", "-s", "--import-cost", "invoker", sys.executable)
+    assert cli.failed
+    assert "--verbose and --import-cost can only be used when inspecting one installation" in cli.logged
+
+
+def test_inspect_json(cli):
+    cli.run("inspect", "invoker", "--ndjson", "--no-cache")
+    records = [json.loads(x) for x in cli.logged.stdout.contents().splitlines()]
+    assert records[0]["type"] == "python"
+    assert records[-1]["type"] == "so-report"
+    modules = [x for x in records if x["type"] == "module"]
+    assert any(x["name"] == "_ctypes" and x["so"] for x in modules)
+    so_files = [x for x in records if x["type"] == "so"]
+    assert len(so_files) == records[-1]["ok"] + records[-1]["problematic"]
+
+    cli.run("inspect", "invoker", "--json", "-mzlib")
+    assert cli.succeeded
+    records = json.loads(cli.logged.stdout.contents())
+    assert [x["type"] for x in records] == ["python", "module"]
+
+    cli.run("inspect", "-s", "--json", "invoker", "apps/foo")
+    assert cli.failed  # Exit code still reflects problems found
+    assert "2 installations inspected, 1 problematic" in cli.logged.stderr
+    records = json.loads(cli.logged.stdout.contents())
+    assert [x["type"] for x in records] == ["installation", "installation"]
+    assert records[1]["problem"]
@@ -1,3 +1,5 @@
+import requests
+import runez
 from runez.http import RestClient
 
 from portable_python import BuildSetup
@@ -19,6 +21,9 @@ PYTHON_ORG_SAMPLE = """
 <a href="3.5.10/">3.5.10/</a>
 """
 
+PYTHON_312_0 = "https://www.python.org/ftp/python/3.12.0/Python-3.12.0.tar.xz"
+PYTHON_313_0 = "https://www.python.org/ftp/python/3.13.0/Python-3.13.0.tar.xz"
+
 
 @REST_CLIENT.mock(
     {
@@ -53,3 +58,63 @@ def test_list(cli, monkeypatch):
     cli.run("-c", cli.tests_path("sample-config1.yml"), "list")
     assert cli.succeeded
     assert cli.logged.stdout.contents().strip() == "cpython:\n  3.9: 3.9.7\n  3.8: 3.8.12"
+
+
+PYTHON_ORG_UPCOMING = """
+<a href="3.12.0/">3.12.0/</a>
+<a href="3.12.1/">3.12.1/</a>
+<a href="3.13.0/">3.13.0/</a>
+"""
+
+
+def test_listing_cache(cli, monkeypatch):
+    runez.write("pp.yml", "versions-cache: cache\n", logger=None)
+    monkeypatch.setattr(PPG.cpython, "_versions", None)
+    cli.run("--offline", "-c", "pp.yml", "list")
+    assert cli.failed
+    assert "No cached listing of https://www.python.org/ftp/python/, can't run offline" in cli.logged
+
+    with REST_CLIENT.mock({"https://www.python.org/ftp/python/": PYTHON_ORG_UPCOMING, PYTHON_312_0: 200}):
+        monkeypatch.setattr(PPG.cpython, "_versions", None)
+        cli.run("-c", "pp.yml", "list")
+        assert cli.succeeded
+        assert cli.logged.stdout.contents().strip() == "cpython:\n  3.12: 3.12.1"  # 3.13.0 is not released yet
+
+    # Listing and existence checks are now cached, no http calls needed
+    monkeypatch.setattr(PPG.cpython, "_versions", None)
+    cli.run("-c", "pp.yml", "list")
+    assert cli.succeeded
+    assert cli.logged.stdout.contents().strip() == "cpython:\n  3.12: 3.12.1"
+
+    # Past TTL: listing gets refreshed via conditional request, last listing is used when remote says it's not modified
+    runez.write("pp.yml", "versions-cache: cache\nversions-cache-ttl: 0\n", logger=None)
+    with REST_CLIENT.mock({"https://www.python.org/ftp/python/": (304, ""), PYTHON_313_0: 200}):
+        monkeypatch.setattr(PPG.cpython, "_versions", None)
+        cli.run("-c", "pp.yml", "list")
+        assert cli.succeeded
+        assert cli.logged.stdout.contents().strip() == "cpython:\n  3.13: 3.13.0\n  3.12: 3.12.1"
+
+    # Remote is down: last known good listing gets used
+    with REST_CLIENT.mock({"https://www.python.org/ftp/python/": 500}):
+        monkeypatch.setattr(PPG.cpython, "_versions", None)
+        cli.run("-c", "pp.yml", "list")
+        assert cli.succeeded
+        assert "Can't refresh listing of https://www.python.org/ftp/python/" in cli.logged
+        assert cli.logged.stdout.contents().strip() == "cpython:\n  3.13: 3.13.0\n  3.12: 3.12.1"
+
+    with REST_CLIENT.mock({"https://www.python.org/ftp/python/": requests.ConnectionError("no route to host")}):
+        monkeypatch.setattr(PPG.cpython, "_versions", None)
+        cli.run("-c", "pp.yml", "list")
+        assert cli.succeeded
+        assert "Can't refresh listing of https://www.python.org/ftp/python/ (no route to host)" in cli.logged
+
+    monkeypatch.setattr(PPG.cpython, "_versions", None)
+    cli.run("--offline", "-c", "pp.yml", "list")
+    assert cli.succeeded
+    assert cli.logged.stdout.contents().strip() == "cpython:\n  3.13: 3.13.0\n  3.12: 3.12.1"
+
+    runez.write("pp.yml", "versions-cache: cache\nversions-cache-ttl: soon\n", logger=None)
+    monkeypatch.setattr(PPG.cpython, "_versions", None)
+    cli.run("-c", "pp.yml", "list")
+    assert cli.failed
+    assert "Invalid 'versions-cache-ttl': soon" in cli.logged
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+import time
+from unittest.mock import patch
+
+import pytest
+import runez
+from runez.http import RestClient
+
+from portable_python.mirror import _break_stale_lock, _exclusive_lock, matrix_source_urls, SourceMirror, url_checksum
+from portable_python.versions import PPG
+
+REST_CLIENT = RestClient()
+PYTHON_URL = "https://www.python.org/ftp/python/3.12.1/Python-3.12.1.tar.xz"
+ZLIB_URL = "https://zlib.net/fossils/zlib-1.3.1.tar.gz"
+BZIP2_URL = "https://sourceware.org/pub/bzip2/bzip2-1.0.8.tar.gz"
+
+
+@REST_CLIENT.mock({PYTHON_URL: "python sources", ZLIB_URL: "zlib sources", BZIP2_URL: "bzip2 sources"})
+def test_mirror(cli):
+    cli.run("mirror", "-x3.12.1:linux-x86_64,linux-aarch64:zlib,bzip2", "-dmirror", "-j2")
+    assert cli.succeeded
+    assert "3 source tarballs in mirror (3 downloaded), index: mirror/SHA256SUMS" in cli.logged
+    assert sorted(os.listdir("mirror")) == [
+        "Python-3.12.1.tar.xz",
+        "Python-3.12.1.tar.xz.sha256",
+        "SHA256SUMS",
+        "bzip2-1.0.8.tar.gz",
+        "bzip2-1.0.8.tar.gz.sha256",
+        "zlib-1.3.1.tar.gz",
+        "zlib-1.3.1.tar.gz.sha256",
+    ]
+    index = list(runez.readlines("mirror/SHA256SUMS"))
+    assert index[0] == "%s  Python-3.12.1.tar.xz" % runez.checksum("mirror/Python-3.12.1.tar.xz")
+    assert len(index) == 3
+
+    # Already mirrored sources are verified, and not downloaded again
+    cli.run("--offline", "mirror", "-x3.12.1:linux-x86_64:zlib,bzip2", "-dmirror")
+    assert cli.succeeded
+    assert "3 source tarballs in mirror (0 downloaded)" in cli.logged
+
+    runez.write("mirror/zlib-1.3.1.tar.gz", "tampered", logger=None)
+    cli.run("mirror", "-x3.12.1:linux-x86_64:zlib", "-dmirror")
+    assert cli.failed
+    assert "Checksum mismatch for mirror/zlib-1.3.1.tar.gz" in cli.logged
+
+    # Tarballs put in mirror by hand (without sidecar) are verified and indexed as well
+    runez.delete("mirror/zlib-1.3.1.tar.gz.sha256", logger=None)
+    cli.run("--offline", "mirror", "-x3.12.1:linux-x86_64:zlib,bzip2", "-dmirror")
+    assert cli.succeeded
+    assert "%s  zlib-1.3.1.tar.gz" % runez.checksum("mirror/zlib-1.3.1.tar.gz") in runez.readlines("mirror/SHA256SUMS")
+    assert os.path.exists("mirror/zlib-1.3.1.tar.gz.sha256")
+
+    cli.run("--offline", "mirror", "-x3.12.1:linux-x86_64:openssl", "-dmirror")
+    assert cli.failed
+    assert "openssl-" in cli.logged
+    assert "is not in mirror, can't download it offline" in cli.logged
+
+
+@REST_CLIENT.mock({ZLIB_URL: "zlib sources"})
+def test_stale_lock(temp_folder, monkeypatch):
+    monkeypatch.setattr("portable_python.mirror.LOCK_POLL_INTERVAL", 0.01)
+    runez.touch("mirror/zlib-1.3.1.tar.gz.lock", logger=None)
+    old = time.time() - 7200
+    os.utime("mirror/zlib-1.3.1.tar.gz.lock", (old, old))
+    mirror = SourceMirror("mirror")
+    path = mirror.fetch(ZLIB_URL)
+    assert list(runez.readlines(path)) == ["zlib sources"]
+    assert mirror.downloaded == [path]
+    assert not os.path.exists("mirror/zlib-1.3.1.tar.gz.lock")
+    assert [x for x in os.listdir("mirror") if x.endswith(".tmp")] == []
+
+
+def test_offline_build(cli):
+    cli.run("--offline", "-n", "-tlinux-x86_64", "build", "3.12.2", "-mnone")
+    assert cli.failed
+    assert "Python-3.12.2.tar.xz is not in build/sources, can't download it offline" in cli.logged
+
+
+def test_url_checksum(temp_folder):
+    sha = hashlib.sha256(b"zlib sources").hexdigest()
+    assert url_checksum(ZLIB_URL) is None
+    assert url_checksum(f"{ZLIB_URL}#md5=123") is None
+    assert url_checksum(f"{ZLIB_URL}#sha256={sha.upper()}") == sha
+
+    mirror = SourceMirror("mirror")
+    with REST_CLIENT.mock({ZLIB_URL: "zlib sources"}):
+        path = mirror.fetch(f"{ZLIB_URL}#sha256={sha}")
+        assert list(runez.readlines(path)) == ["zlib sources"]
+        assert mirror.fetch(f"{ZLIB_URL}#sha256={sha}") == path  # Already present: verified against fragment too
+
+    with REST_CLIENT.mock({BZIP2_URL: "tampered"}):
+        with pytest.raises(runez.system.AbortException, match="sha256 differs"):
+            mirror.fetch(f"{BZIP2_URL}#sha256={sha}")
+
+        assert not os.path.exists("mirror/bzip2-1.0.8.tar.gz")  # Mismatching download is not kept
+        assert [x for x in os.listdir("mirror") if x.endswith(".tmp")] == []
+
+    with pytest.raises(runez.system.AbortException, match=re.escape("Checksum mismatch for mirror/zlib-1.3.1.tar.gz: expected bogus")):
+        mirror.fetch(f"{ZLIB_URL}#sha256=bogus")
+
+
+@REST_CLIENT.mock({ZLIB_URL: "zlib sources"})
+def test_stale_lock_removed_concurrently(temp_folder, monkeypatch):
+    monkeypatch.setattr("portable_python.mirror.LOCK_POLL_INTERVAL", 0.01)
+    runez.touch("mirror/zlib-1.3.1.tar.gz.lock", logger=None)
+    old = time.time() - 7200
+    os.utime("mirror/zlib-1.3.1.tar.gz.lock", (old, old))
+    real_rename = os.rename
+
+    def rename_twice(src, dest):
+        real_rename(src, f"{dest}.other-host")  # Another host broke the stale lock just before we did
+        os.remove(f"{dest}.other-host")
+        real_rename(src, dest)
+
+    with patch("portable_python.mirror.os.rename", side_effect=rename_twice):
+        path = SourceMirror("mirror").fetch(ZLIB_URL)
+
+    assert list(runez.readlines(path)) == ["zlib sources"]
+    assert sorted(os.listdir("mirror")) == ["zlib-1.3.1.tar.gz", "zlib-1.3.1.tar.gz.sha256"]  # No leftover lock
+
+
+def test_fresh_lock_kept(temp_folder):
+    lock = runez.to_path("zlib-1.3.1.tar.gz.lock")
+    runez.write(lock, "other-host", logger=None)
+    assert not _break_stale_lock(lock)  # Not stale: left alone
+
+    old = time.time() - 7200
+    os.utime(lock, (old, old))
+    real_rename = os.rename
+
+    def late_rename(src, dest):
+        # Another host broke the stale lock and took a fresh one, after we saw the stale one
+        os.remove(src)
+        runez.write(src, "fresh-host", logger=None)
+        real_rename(src, dest)
+
+    with patch("portable_python.mirror.os.rename", side_effect=late_rename):
+        assert _break_stale_lock(lock)
+
+    assert list(runez.readlines(lock)) == ["fresh-host"]  # Given back to its owner
+    assert os.listdir(".") == [lock.name]
+
+
+def test_lock_refresh(temp_folder, monkeypatch):
+    monkeypatch.setattr("portable_python.mirror.LOCK_REFRESH_INTERVAL", 0.01)
+    lock = runez.to_path("foo.lock")
+    old = time.time() - 7200
+    with _exclusive_lock(runez.to_path("foo")):
+        os.utime(lock, (old, old))
+        deadline = time.time() + 5
+        while lock.stat().st_mtime == old and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert lock.stat().st_mtime > old  # Held lock keeps getting refreshed, long downloads don't see it become stale
+
+    assert not lock.exists()
+
+    with _exclusive_lock(runez.to_path("foo")):
+        runez.write(lock, "other-host", logger=None)  # Lock was broken and taken by another host
+
+    assert list(runez.readlines(lock)) == ["other-host"]  # Not removed: it's not ours anymore
+
+
+def test_matrix_source_urls(temp_folder):
+    PPG.grab_config(target="linux-x86_64")
+    urls = matrix_source_urls(["3.12.1,3.11.7:linux-x86_64,linux-aarch64:zlib", "3.12.1::bzip2"])
+    assert PPG.target.platform == "linux"  # Original target is restored
+    python_url = "https://www.python.org/ftp/python/3.12.1/Python-3.12.1.tar.xz"
+    assert urls[python_url] == ["3.12.1 linux-x86_64", "3.12.1 linux-aarch64", "3.12.1 linux-x86_64"]
+    assert len([x for x in urls if "Python-3.11.7" in x]) == 1
+    zlib = [x for x in urls if "zlib" in x]
+    bzip2 = [x for x in urls if "bzip2" in x]
+    assert len(zlib) == 1
+    assert len(urls[zlib[0]]) == 4
+    assert urls[bzip2[0]] == ["3.12.1 linux-x86_64"]
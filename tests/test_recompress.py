@@ -1,6 +1,16 @@
+import json
+import os
+
 import runez
 
 
+def _fake_xz(monkeypatch, script):
+    """Put a fake 'xz' on PATH (seen by compression pool workers, whatever their start method)"""
+    runez.write("fake-bin/xz", "#!/bin/sh\n%s\n" % script, logger=None)
+    runez.make_executable("fake-bin/xz", logger=None)
+    monkeypatch.setenv("PATH", os.pathsep.join([os.path.abspath("fake-bin"), os.environ["PATH"]]))
+
+
 def test_recompress(cli):
     cli.run("-n", "recompress", "foo", "gz")
     assert cli.failed
@@ -19,6 +29,61 @@ def test_recompress(cli):
 
     cli.run("recompress", files[0], "bz2")
     assert cli.succeeded
-    assert "Tar tmp -> cpython-3.9.7-" in cli.logged
+    assert "Recompress dist/cpython-3.9.7-" in cli.logged
     files = list(runez.ls_dir("dist"))
     assert len(files) == 2
+
+
+def test_compare(cli, monkeypatch):
+    cli.run("recompress", "foo")
+    assert cli.failed
+    assert "Specify exactly one of EXT or --compare" in cli.logged
+
+    runez.write("build/3.9.7/bin/python", "#!/bin/sh\necho hello\n" * 1000, logger=None)
+    cli.run("recompress", "3.9.7", "--compare", "zip")
+    assert cli.failed
+    assert "Can't compare compression 'zip'" in cli.logged
+
+    cli.run("recompress", "3.9.7", "--compare", "xz:3-12")
+    assert cli.failed
+    assert "Invalid xz level '3-12', expecting 0-9" in cli.logged
+
+    cli.run("-n", "recompress", "3.9.7", "--compare", "all")
+    assert cli.succeeded
+    assert "Would compare 48 compressions on build/3.9.7" in cli.logged
+
+    cli.run("recompress", "3.9.7", "--compare", "gz:1-2,tar", "-j2")
+    assert cli.succeeded
+    lines = cli.logged.stdout.contents().splitlines()
+    assert "Uncompressed size:" in lines[0]
+    assert sorted(x.split("|")[1].strip() for x in lines[3:]) == ["gz -1", "gz -2", "tar"]
+    assert lines[-1].startswith("| tar ")
+
+    cli.run("recompress", "3.9.7", "gz")
+    assert cli.succeeded
+    tarball = next(runez.ls_dir("dist"))
+    cli.run("recompress", tarball, "--compare", "xz:0,bz2:1", "--json")
+    assert cli.succeeded
+    data = json.loads(cli.logged.stdout.contents())
+    assert data["size"] == 30720
+    assert sorted((x["compression"], x["level"]) for x in data["results"]) == [("bz2", 1), ("xz", 0)]
+    assert all(x["ratio"] > 10 and x["compress_speed"] and x["decompress_speed"] for x in data["results"])
+
+    # Broken output of one candidate is reported, without losing the measurements of the others
+    with monkeypatch.context() as m:
+        _fake_xz(m, "cat >/dev/null")  # Produces no output at all
+        cli.run("recompress", tarball, "--compare", "xz:0,bz2:1", "--json", "-j1")
+        assert cli.succeeded
+        data = json.loads(cli.logged.stdout.contents())
+        assert [x["compression"] for x in data["results"] if x.get("problem")] == ["xz"]
+
+    # Failing compressor (for example: out of memory at a high level) is reported as well
+    with monkeypatch.context() as m:
+        _fake_xz(m, "cat >/dev/null; exit 3")
+        cli.run("recompress", tarball, "--compare", "xz:0,bz2:1", "--json", "-j1")
+        assert cli.succeeded
+        data = json.loads(cli.logged.stdout.contents())
+        problems = {x["compression"]: x.get("problem") for x in data["results"]}
+        assert problems["xz"].endswith("xz' exited with code 3")
+        assert problems["bz2"] is None
+        assert [x["ratio"] > 10 for x in data["results"] if x["compression"] == "bz2"] == [True]
@@ -1,3 +1,4 @@
+import json
 from unittest.mock import patch
 
 
@@ -10,3 +11,15 @@ def test_scan(cli):
         assert cli.failed
         assert "needs tclsh" in cli.logged
         assert "Problematic modules:" in cli.logged
+
+    cli.run("-tmacos-x86_64", "build-report", "-mnone", "--json", "3.9.7")
+    assert cli.succeeded
+    records = json.loads(cli.logged.stdout.contents())
+    assert {x["type"] for x in records} == {"module"}
+    assert any(x["parent"] == "tkinter" for x in records)
+    assert "\x1b" not in cli.logged.stdout.contents()
+
+    cli.run("-tmacos-x86_64", "build-report", "-mnone", "--ndjson", "3.9.7")
+    assert cli.succeeded
+    lines = cli.logged.stdout.contents().splitlines()
+    assert [json.loads(x) for x in lines] == records
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tarfile
+
+import runez
+
+from portable_python.compression import Compressor, seekable_index_path
+from portable_python.seekable import SeekableArchive
+
+
+def _sample_install():
+    for i in range(20):
+        content = b"".join(hashlib.sha256(b"%d-%d" % (i, n)).hexdigest().encode() for n in range(100))
+        runez.write(f"sample/lib/python3.12/mod{i:02}.py", content, logger=None)
+
+    runez.write("sample/bin/python3.12", "#!/bin/sh\necho hello\n", logger=None)
+    os.chmod("sample/bin/python3.12", 0o755)
+    os.symlink("python3.12", "sample/bin/python3")
+
+
+def _contents(folder):
+    result = {}
+    for root, dirs, files in os.walk(folder):
+        for name in dirs + files:
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, folder)
+            if os.path.islink(path):
+                result[key] = "-> %s" % os.readlink(path)
+
+            elif os.path.isfile(path):
+                result[key] = (oct(os.stat(path).st_mode), runez.checksum(path))
+
+    return result
+
+
+def test_seekable(temp_folder):
+    _sample_install()
+    Compressor("gz", threads=2, seekable=True, frame_size=16384).compress("sample", "dist/sample.tar.gz")
+    assert seekable_index_path("dist/sample.tar.gz").exists()
+    with tarfile.open("dist/sample.tar.gz") as tar:  # Still a regular tarball for the usual tools
+        assert len(tar.getnames()) == 26
+
+    archive = SeekableArchive.from_path("dist/sample.tar.gz")
+    assert str(archive) == "dist/sample.tar.gz (26 members, 12 frames)"
+    assert archive.extract("full", threads=3) == 26
+    assert _contents("full/sample") == _contents("sample")
+
+    # Only frames holding selected member(s) get decompressed
+    assert archive.extract("partial", selection=["lib/python3.12/mod07.py"]) == 1
+    assert os.listdir("partial/sample/lib/python3.12") == ["mod07.py"]
+    assert runez.checksum("partial/sample/lib/python3.12/mod07.py") == runez.checksum("sample/lib/python3.12/mod07.py")
+    ranges = archive.selected_ranges(["sample/bin"])
+    assert len(ranges) == 1
+    assert ranges[0][2] == 3
+    assert len(archive.frame_range(*ranges[0][:2])) == 1
+
+    assert SeekableArchive.from_path("sample/bin/python3") is None
+
+
+def test_extract(cli):
+    _sample_install()
+    runez.write("pp.yml", "compression-seekable: true\ncompression-frame-size: 16 KB\n", logger=None)
+    cli.run("-c", "pp.yml", "recompress", "sample", "xz")
+    assert cli.succeeded
+    assert ", seekable 16 KB frames)" in cli.logged
+    tarball = next(x for x in runez.ls_dir("dist") if x.name.endswith(".tar.xz"))
+    assert seekable_index_path(tarball).exists()
+
+    cli.run("extract", tarball, "out", "bin", "lib/python3.12/mod19.py")
+    assert cli.succeeded
+    assert "Extracted 4 members from dist/" in cli.logged
+    assert "(2 of 12 frames)" in cli.logged
+    assert _contents("out/sample/bin") == _contents("sample/bin")
+    assert os.listdir("out/sample/lib/python3.12") == ["mod19.py"]
+
+    cli.run("extract", tarball, "out", "no-such-member")
+    assert cli.failed
+    assert "No member matching: no-such-member" in cli.logged
+
+    # Non-seekable tarballs get fully decompressed
+    Compressor("gz").compress("sample", "plain.tar.gz")
+    cli.run("extract", "plain.tar.gz", "plain", "sample/bin/python3.12")
+    assert cli.succeeded
+    assert "Extracted 1 member from plain.tar.gz -> plain (not seekable)" in cli.logged
+    assert os.listdir("plain/sample/bin") == ["python3.12"]
+
+    cli.run("extract", "plain.tar.gz", "full")
+    assert cli.succeeded
+    assert _contents("full/sample") == _contents("sample")
+
+    cli.run("extract", "no-such-file.tar.gz", "full")
+    assert cli.failed
+    assert "'no-such-file.tar.gz' does not exist" in cli.logged
+
+    runez.write("pp.yml", "compression-frame-size: lots\n", logger=None)
+    cli.run("-c", "pp.yml", "recompress", "sample", "xz")
+    assert cli.failed
+    assert "Invalid 'compression-frame-size': lots" in cli.logged
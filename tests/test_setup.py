@@ -1,3 +1,5 @@
+import os
+
 import pytest
 import runez
 
@@ -31,6 +33,42 @@ def test_diagnostics(cli):
     assert cli.succeeded
     assert "pp-dev.yml:\na: b\n\nportable-python.yml:\ninclude: +pp-dev.yml" in cli.logged.stdout
 
+    cli.run("-tmacos-arm64", "-c", cli.tests_path("sample-config1.yml"), "diagnostics", "--resolved")
+    assert cli.succeeded
+    assert "Resolved config for macos-arm64" in cli.logged.stdout
+    rows = [[x.strip() for x in line.split("|")[1:-1]] for line in cli.logged.stdout.contents().splitlines() if line.startswith("| ")]
+    rows = {k: (v, os.path.basename(source)) for k, v, source in rows}
+    assert rows["env/MACOSX_DEPLOYMENT_TARGET"] == ("12", "sample-config2.yml")  # From macos-arm64 section of sample-config2.yml
+    assert rows["ext"] == (".tar.xz", "sample-config1.yml")  # From macos section of sample-config1.yml
+    assert rows["folders/dist"] == ("dist", "default config")
+    assert rows["isolate-usr-local"] == ("auto", "sample-config1.yml")
+
+    runez.write("pp-dev.yml", "linux:\n  x86_64:\n    compression-threads: yes", logger=None)
+    cli.run("diagnostics")
+    assert cli.failed
+    assert "Invalid config pp-dev.yml: 'linux/x86_64/compression-threads' must be an integer, got: True" in cli.logged
+
+
+def test_resolved_config(temp_folder):
+    PPG.grab_config(runez.DEV.tests_path("sample-config1.yml"), target="macos-arm64")
+    config = PPG.config
+    value, source = config.get_entry("ext")
+    assert value == ".tar.xz"
+    assert str(source).endswith("sample-config1.yml")
+    assert config.get_value("folders", "logs", by_platform=False) == "{build}/logs"  # From included sample-config2.yml
+    assert config.get_value("folders", "dist", by_platform=False) == "dist"  # From default config
+    assert config.get_value("env") == {"MACOSX_DEPLOYMENT_TARGET": 12}
+    assert config.get_value("foo") is None
+
+    # Lookups are memoized, until another config gets loaded
+    table = config.table
+    assert config.get_value("ext") == ".tar.xz"
+    assert config.table is table
+    runez.write("pp.yml", "macos:\n  ext: zip", logger=None)
+    config.load("+pp.yml")
+    assert config.table is not table
+    assert config.get_value("ext") == "zip"
+
 
 def test_edge_cases(temp_folder, monkeypatch, logged):
     monkeypatch.setattr(PPG, "config", None)
@@ -56,8 +94,8 @@ def test_edge_cases(temp_folder, monkeypatch, logged):
     assert outcome.name == "failed"
     assert reason == "broken, can't compile statically with foo present"
 
-    sources = getattr(PPG.config, "_sources", None)
-    monkeypatch.setattr(sources[0], "data", {"ext": "foo"})
+    runez.write("pp.yml", "ext: foo", logger=None)
+    PPG.grab_config("pp.yml", target="linux-x86_64")
     assert not logged
     with pytest.raises(runez.system.AbortException):
         _ = BuildSetup("3.9.6")
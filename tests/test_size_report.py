@@ -0,0 +1,84 @@
+import json
+
+import runez
+
+from portable_python.size_report import file_type, SizeReport
+
+
+def _sample_install(folder, test_size=0):
+    runez.write(f"{folder}/bin/python3.9", "a" * 3072, logger=None)
+    runez.write(f"{folder}/lib/libpython3.9.so.1.0", "b" * 5120, logger=None)
+    runez.write(f"{folder}/lib/python3.9/os.py", "c" * 1024, logger=None)
+    runez.write(f"{folder}/lib/python3.9/lib-dynload/_json.cpython-39.so", "d" * 1024, logger=None)
+    if test_size:
+        runez.write(f"{folder}/lib/python3.9/test/test_os.py", "e" * test_size, logger=None)
+
+
+def test_file_type():
+    assert file_type(runez.to_path("lib/libpython3.9.so.1.0")) == ".so"
+    assert file_type(runez.to_path("lib/libpython3.9.dylib")) == ".dylib"
+    assert file_type(runez.to_path("bin/python3")) == "(none)"
+    assert file_type(runez.to_path("bin/python3.10")) == "(none)"
+    assert file_type(runez.to_path("os.py")) == ".py"
+
+
+def test_size_report(cli):
+    _sample_install("v1")
+    report = SizeReport.from_folder("v1")
+    assert report.total == 10240
+    assert report.count == 4
+    assert report.folders == {"bin": 3072, "lib": 7168, "lib/python3.9": 2048, "lib/python3.9/lib-dynload": 1024}
+    assert report.types == {".so": 6144, "(none)": 3072, ".py": 1024}
+    assert list(report.largest)[:2] == ["lib/libpython3.9.so.1.0", "bin/python3.9"]
+
+    # Manifest round-trips
+    runez.write("v1.yml", report.represented_manifest(), logger=None)
+    loaded = SizeReport.from_path("v1.yml")
+    assert loaded.to_dict() == report.to_dict()
+    assert SizeReport.from_path("no-such-file") is None
+
+    cli.run("size-report", "v1", "-n2")
+    assert cli.succeeded
+    assert "install size: 10 KB in 4 files" in cli.logged
+    assert "lib/libpython3.9.so.1.0" in cli.logged
+    assert "lib/python3.9/os.py" not in cli.logged  # Only top 2 largest files shown
+
+    # A test suite that escaped clean-up shows up in comparison with previous build
+    _sample_install("v2", test_size=2048)
+    cli.run("size-report", "v2", "--compare", "v1.yml")
+    assert cli.succeeded
+    lines = cli.logged.stdout.contents().splitlines()
+    assert any("lib/python3.9/test " in x and "+2 KB" in x for x in lines)
+    assert any("total " in x and "+2 KB (+20.0%)" in x for x in lines)
+
+    cli.run("size-report", "v2", "--compare", "v1", "--json")
+    assert cli.succeeded
+    data = json.loads(cli.logged.stdout.contents())
+    assert data["total"] == 12288
+    assert data["changes"][0] == {"name": "total", "before": 10240, "now": 12288}
+
+    cli.run("size-report", "v2", "--compare", "no-such-file")
+    assert cli.failed
+    assert "'no-such-file' does not exist" in cli.logged
+
+    # Configured budget
+    runez.write("pp.yml", "size-budget:\n  total: 11 KB\n", logger=None)
+    cli.run("-c", "pp.yml", "size-report", "v1")
+    assert cli.succeeded
+
+    cli.run("-c", "pp.yml", "size-report", "v2")
+    assert cli.failed
+    assert "Size budget exceeded: install size 12 KB exceeds budget of 11 KB" in cli.logged
+
+    runez.write("pp.yml", "size-budget:\n  growth: 10%\n  baseline: v1.yml\n", logger=None)
+    cli.run("-c", "pp.yml", "size-report", "v1")
+    assert cli.succeeded
+
+    cli.run("-c", "pp.yml", "size-report", "v2")
+    assert cli.failed
+    assert "install size grew by +2 KB (+20.0%) compared to v1.yml, budget is 10%" in cli.logged
+
+    runez.write("pp.yml", "size-budget:\n  growth: lots\n  baseline: v1.yml\n", logger=None)
+    cli.run("-c", "pp.yml", "size-report", "v2")
+    assert cli.failed
+    assert "Invalid 'size-budget' growth 'lots'" in cli.logged
@@ -0,0 +1,68 @@
+import json
+import subprocess
+import sys
+
+import runez
+
+from portable_python.versions import PPG
+
+from .test_list import PYTHON_ORG_SAMPLE, REST_CLIENT
+
+IMPORT_BUDGET = 260  # Max number of modules loaded by a quick command (~225 with python 3.11)
+
+# Heavy subsystems that quick commands such as 'list' or '--version' must not load
+HEAVY_MODULES = (
+    "multiprocessing",
+    "portable_python.cpython",
+    "portable_python.delta",
+    "portable_python.dist_split",
+    "portable_python.inspector",
+    "portable_python.mirror",
+    "portable_python.seekable",
+    "portable_python.size_report",
+    "runez.render",
+    "sqlite3",
+)
+
+RUN_CLI = """
+import atexit, json, sys
+atexit.register(lambda: json.dump(sorted(sys.modules), open("modules.json", "w")))
+from portable_python.__main__ import main
+sys.argv[1:] = %s
+main()
+"""
+
+
+def loaded_modules(*args):
+    """Modules loaded by a fresh 'portable-python' process running with 'args'"""
+    r = subprocess.run([sys.executable, "-c", RUN_CLI % list(args)], capture_output=True, text=True, check=False)
+    assert r.returncode == 0, r.stderr
+    with open("modules.json") as fh:
+        return json.load(fh)
+
+
+def assert_light(modules, *heavy):
+    assert len(modules) <= IMPORT_BUDGET
+    assert not [x for x in HEAVY_MODULES + heavy if x in modules]
+
+
+def test_startup(cli, monkeypatch):
+    modules = loaded_modules("--version")
+    assert_light(modules, "yaml")  # No config gets parsed
+    assert "portable_python.cli" in modules
+
+    runez.write("pp.yml", "versions-cache: cache\n", logger=None)
+    with REST_CLIENT.mock({"https://www.python.org/ftp/python/": PYTHON_ORG_SAMPLE}):
+        monkeypatch.setattr(PPG.cpython, "_versions", None)
+        cli.run("-c", "pp.yml", "list")
+        assert cli.succeeded
+
+    # Use cached listing from above, to verify what 'list' imports without hitting the network
+    modules = loaded_modules("--offline", "-c", "pp.yml", "list")
+    assert_light(modules)
+    assert "portable_python.listing_cache" in modules
+
+    # yaml is imported only when a build manifest actually needs to be read
+    script = "import sys; import portable_python.inspector; assert 'yaml' not in sys.modules"
+    r = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=False)
+    assert r.returncode == 0, r.stderr
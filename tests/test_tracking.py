@@ -0,0 +1,55 @@
+import enum
+
+from portable_python.tracking import Trackable, Tracker
+
+
+class SampleType(enum.Enum):
+    base = ""
+    other = "brown"
+
+
+class SampleLib(Trackable):
+    repr_calls = 0
+
+    def __init__(self, name, category=SampleType.other):
+        self.name = name
+        self.tracked_category = category
+
+    def __repr__(self):
+        SampleLib.repr_calls += 1
+        return self.name
+
+    def represented(self, verbose=False):
+        return self.name
+
+
+class SampleUser(SampleLib):
+    def __init__(self, name, *libs):
+        super().__init__(name, category=None)
+        self.libs = libs
+
+    def __iter__(self):
+        yield self
+        yield from self.libs
+
+
+def test_tracker():
+    libs = [SampleLib("lib%s" % i, SampleType.base if i % 2 else SampleType.other) for i in range(100)]
+    tracker = Tracker(SampleType)
+    for i in range(200):
+        tracker.add(SampleUser("user%s" % (i % 50), libs[i % 100], libs[(i * 7) % 100]))
+
+    assert str(tracker) == "50 sample"
+    assert str(tracker.category[SampleType.base]) == "50 base sample"
+    assert tracker.items[:3] == ["user0", "user1", "user2"]  # Insertion order is preserved
+    assert [str(x) for x in tracker.category[SampleType.other].items[:3]] == ["lib0", "lib2", "lib14"]
+    assert len(tracker.users[libs[0]]) == 1
+
+    # Representation is computed once per object, regardless of how many times it gets compared
+    assert SampleLib.repr_calls < 500
+    assert SampleLib("lib0") == libs[0]
+    assert libs[0] == "lib0"
+
+    tracker.items = []
+    assert not tracker
+    assert tracker.represented() == ""
@@ -0,0 +1,59 @@
+import os
+
+import runez
+
+from portable_python.inspector import find_libs
+from portable_python.tree_index import TreeIndex
+
+
+def test_tree_index(temp_folder):
+    runez.write("bin/python3.9", "a" * 100, logger=None)
+    runez.make_executable("bin/python3.9", logger=None)
+    os.symlink("python3.9", "bin/python")
+    runez.write("lib/python3.9/config-3.9/libpython3.9.a", "b" * 50, logger=None)
+    runez.touch("lib/python3.9/lib-dynload/_foo.so", logger=None)
+    runez.touch("lib/libpython3.9.so", logger=None)
+
+    index = TreeIndex(".")
+    assert str(index) == ". (10 entries)"
+    walked = [str(x) for x in index.walk()]
+    assert walked == [
+        "bin",
+        "bin/python",
+        "bin/python3.9",
+        "lib",
+        "lib/libpython3.9.so",
+        "lib/python3.9",
+        "lib/python3.9/config-3.9",
+        "lib/python3.9/config-3.9/libpython3.9.a",
+        "lib/python3.9/lib-dynload",
+        "lib/python3.9/lib-dynload/_foo.so",
+    ]
+    assert index.get("bin/python").is_symlink
+    assert not index.get("bin/python").is_executable
+    assert index.get("bin/python3.9").is_executable
+    assert index.size(".") == runez.filesize(".") == 150
+    assert index.size("bin", "lib/python3.9") == 150
+    assert index.size("no-such-file") == 0
+    assert sorted(str(x) for x in find_libs("lib", index=index)) == sorted(str(x) for x in find_libs("lib"))
+
+    # Checksum is computed on demand only
+    entry = index.get("bin/python3.9")
+    assert entry.checksum == runez.checksum("bin/python3.9")
+    assert index.get("bin").checksum is None
+
+    # Index is kept up-to-date with modifications reported via update()
+    runez.write("bin/python3.9", "c" * 10, logger=None)
+    runez.write("share/man/python.1", "d" * 5, logger=None)
+    runez.delete("lib/python3.9", logger=None)
+    index.update("bin/python3.9")
+    index.update("share/man/python.1")
+    index.update("lib/python3.9")
+    assert index.get("bin/python3.9").size == 10
+    assert "share/man" in index
+    assert "lib/python3.9/lib-dynload/_foo.so" not in index
+    assert [str(x) for x in index.children("lib")] == ["lib/libpython3.9.so"]
+    assert index.size(".") == runez.filesize(".") == 15
+
+    index.update(".")
+    assert len(list(index.walk())) == 8